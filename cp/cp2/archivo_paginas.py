@@ -0,0 +1,81 @@
+import gzip
+import time
+
+# --- Archivo de páginas HTML crudas (formato tipo WARC) ---
+# Un único archivo .gz con un registro por URL descargada. Cada registro es un miembro gzip
+# independiente (como los .warc.gz), así se puede agregar al final en cada ejecución y un corte
+# a mitad de escritura solo pierde el último registro. Formato de cada registro:
+#
+#   REGISTRO-PAGINA/1.0
+#   URL: https://codigo-postal.co/argentina/buenos-aires/
+#   Tipo: provincia            (provincias | provincia | localidad)
+#   Provincia: Buenos Aires
+#   Localidad:
+#   Fecha: 1718000000.0
+#   Content-Length: 12345
+#   <línea vacía>
+#   <HTML en UTF-8, exactamente Content-Length bytes>
+#   <línea vacía>
+#
+# Lo escribe el scraper v2 (--archivo-html) y lo lee parsear_archivo_paginas.py.
+
+VERSION_REGISTRO = "REGISTRO-PAGINA/1.0"
+
+class EscritorArchivoPaginas:
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.archivo = open(ruta, 'ab')
+        self.registros = 0
+
+    def escribir(self, url, tipo, html, provincia="", localidad=""):
+        cuerpo = html.encode('utf-8')
+        encabezado = (
+            f"{VERSION_REGISTRO}\r\n"
+            f"URL: {url}\r\n"
+            f"Tipo: {tipo}\r\n"
+            f"Provincia: {provincia}\r\n"
+            f"Localidad: {localidad}\r\n"
+            f"Fecha: {time.time()}\r\n"
+            f"Content-Length: {len(cuerpo)}\r\n"
+            "\r\n"
+        ).encode('utf-8')
+        self.archivo.write(gzip.compress(encabezado + cuerpo + b"\r\n\r\n"))
+        self.archivo.flush()
+        self.registros += 1
+
+    def cerrar(self):
+        self.archivo.close()
+
+def leer_registros(ruta):
+    """Genera un dict por registro: url, tipo, provincia, localidad, fecha, html."""
+    try:
+        yield from _leer_registros(ruta)
+    except EOFError:
+        print(f"ADVERTENCIA: El último registro de {ruta} está incompleto (¿corte durante la escritura?). Se omite.")
+
+def _leer_registros(ruta):
+    with gzip.open(ruta, 'rb') as f: # gzip lee los miembros concatenados como un solo flujo
+        while True:
+            linea = f.readline()
+            if not linea:
+                return
+            if linea.strip() == b"":
+                continue
+            if linea.decode('utf-8').strip() != VERSION_REGISTRO:
+                raise ValueError(f"Registro inválido en {ruta}: {linea[:80]!r}")
+            campos = {}
+            while True:
+                linea = f.readline().decode('utf-8').rstrip("\r\n")
+                if not linea:
+                    break
+                clave, _, valor = linea.partition(": ")
+                campos[clave] = valor
+            html = f.read(int(campos["Content-Length"])).decode('utf-8')
+            yield {
+                'url': campos["URL"],
+                'tipo': campos["Tipo"],
+                'provincia': campos.get("Provincia", ""),
+                'localidad': campos.get("Localidad", ""),
+                'fecha': float(campos.get("Fecha", 0)),
+                'html': html,
+            }
@@ -0,0 +1,83 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from deduplicar_tabla_final import COLS_PARA_AGRUPAR
+from esquemas import leer_con_esquema, memoria_mb
+from motor_dedup import POLITICAS, deduplicar_por_grupos
+
+# --- Benchmark de la deduplicación: sort_values + drop_duplicates (original) vs. motor_dedup ---
+# Arma tablas sintéticas de 1x, 10x y 100x a partir de tabla_final_cruces_exitosos.csv: cada réplica renombra
+# las localidades (nuevos grupos) y corre los id_loca; las filas se mezclan y un 1% pierde id_loca o cpa.
+# Verifica que el resultado con la política 'min_id' sea idéntico al original (filas, orden e índice).
+# Por defecto la tabla base se lee con su esquema (nombres categóricos, como en pipeline_cp.py); con --texto,
+# con dtype=str como los scripts sueltos de antes.
+# Uso: python benchmark_dedup.py [--escalas 1 10 100] [--texto]
+
+ARCHIVO_POR_DEFECTO = 'tabla_final_cruces_exitosos.csv'
+PROPORCION_NULOS = 0.01
+
+def deduplicar_original(df):
+    """Lo que hacía deduplicar_tabla_final.py: ordenar toda la tabla y quedarse con la primera fila de cada grupo."""
+    df_sorted = df.sort_values(by=COLS_PARA_AGRUPAR + ['id_loca'], ascending=True, na_position='last')
+    return df_sorted.drop_duplicates(subset=COLS_PARA_AGRUPAR, keep='first')
+
+def tabla_sintetica(base, escala, semilla=0):
+    """'escala' réplicas de la tabla base, con nombres de localidad e id_loca distintos en cada una."""
+    generador = np.random.default_rng(semilla)
+    n = len(base)
+    replica = np.repeat(np.arange(escala), n)
+    filas = np.tile(np.arange(n), escala)
+
+    columnas = {}
+    for col in base.columns:
+        columnas[col] = base[col].take(filas).to_numpy() if base[col].dtype == object else base[col].take(filas).array
+    # Nombres de localidad: categóricas con escala x (nombres distintos), sin volver a crear los textos por fila
+    codigos, nombres = pd.factorize(base['nom_loca'])
+    categorias = [f"{nombre} #{r}" if r else nombre for r in range(escala) for nombre in nombres]
+    nom_loca = pd.Categorical.from_codes(codigos[filas] + replica * len(nombres), categories=categorias)
+    columnas['nom_loca'] = nom_loca.reorder_categories(sorted(categorias)) # Como las de read_csv: en orden alfabético
+    id_loca = base['id_loca'].to_numpy(dtype='float64')[filas] + replica * 10**6
+    columnas['id_loca'] = pd.array(id_loca, dtype='Int32')
+    df = pd.DataFrame(columnas)
+
+    mezcla = generador.permutation(len(df))
+    df = df.iloc[mezcla].reset_index(drop=True)
+    for col in ('id_loca', 'cpa'):
+        df.loc[generador.random(len(df)) < PROPORCION_NULOS, col] = pd.NA if col == 'id_loca' else np.nan
+    return df
+
+def medir(descripcion, funcion, filas):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    segundos = time.perf_counter() - inicio
+    print(f"  {descripcion:<40} {segundos:8.3f} s  {filas / segundos:12,.0f} filas/s")
+    return resultado, segundos
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la deduplicación por grupos.")
+    parser.add_argument('archivo', nargs='?', default=ARCHIVO_POR_DEFECTO)
+    parser.add_argument('--escalas', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--texto', action='store_true', help="Leer la tabla base con dtype=str (nombres como texto).")
+    args = parser.parse_args()
+
+    base = leer_con_esquema(args.archivo, 'tabla_cp')
+    if args.texto:
+        base = base.astype({col: object for col in base.columns if col != 'id_loca'})
+    for escala in args.escalas:
+        df = tabla_sintetica(base, escala)
+        print(f"Escala {escala}x: {len(df):,} filas ({memoria_mb(df):.0f} MB en memoria)")
+        antes, t_antes = medir("sort_values + drop_duplicates (original)", lambda: deduplicar_original(df), len(df))
+        (despues, _), t_despues = medir("motor_dedup 'min_id'", lambda: deduplicar_por_grupos(df, COLS_PARA_AGRUPAR, 'id_loca'), len(df))
+        for politica in POLITICAS[1:]:
+            medir(f"motor_dedup '{politica}'", lambda: deduplicar_por_grupos(df, COLS_PARA_AGRUPAR, 'id_loca', politica), len(df))
+        iguales = antes.equals(despues) and antes.index.equals(despues.index)
+        print(f"  Resultado idéntico al original: {'SÍ' if iguales else 'NO'} ({len(despues):,} grupos) | "
+              f"Aceleración: {t_antes / t_despues:.1f}x\n")
+        if not iguales:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import os
+import tempfile
+import time
+
+from formato_columnar import escribir_tabla, leer_tabla
+
+# --- Benchmark CSV vs. Parquet vs. Arrow IPC sobre los archivos de datos existentes ---
+# Para cada archivo: tamaño en disco y tiempo de carga en cada formato, y verificación de que la lectura
+# columnar (convertida a texto) da exactamente lo mismo que pd.read_csv(dtype=str).
+# Uso: python benchmark_formatos.py [archivo.csv ...]
+
+ARCHIVOS_POR_DEFECTO = [
+    '../../todos_los_codigos_postales.csv',
+    'todos_los_cp_scraped_combinado.csv',
+    'tabla_final_cruces_exitosos.csv',
+    'tabla_final_corregida_n.csv',
+    'loca.csv',
+    'localidades.csv',
+]
+REPETICIONES = 5
+
+def detectar_separador(ruta):
+    with open(ruta, encoding='utf-8') as f:
+        encabezado = f.readline()
+    return ';' if encabezado.count(';') >= encabezado.count(',') else ','
+
+def mejor_tiempo(funcion):
+    mejor = float('inf')
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara tamaño y tiempo de carga de CSV, Parquet y Arrow IPC.")
+    parser.add_argument('archivos', nargs='*', default=ARCHIVOS_POR_DEFECTO)
+    args = parser.parse_args()
+
+    print(f"{'archivo':<42} {'formato':<8} {'tamaño':>10} {'carga (s)':>10} {'vs CSV':>8}")
+    with tempfile.TemporaryDirectory() as directorio:
+        for ruta in args.archivos:
+            if not os.path.exists(ruta):
+                print(f"{os.path.basename(ruta):<42} (no existe, se omite)")
+                continue
+            sep = detectar_separador(ruta)
+            t_csv, df_csv = mejor_tiempo(lambda: leer_tabla(ruta, sep=sep))
+            nombre = os.path.basename(ruta)
+            print(f"{nombre:<42} {'csv':<8} {os.path.getsize(ruta) / 1e6:>8.2f}MB {t_csv:>10.4f} {'':>8}")
+            for formato in ('parquet', 'arrow'):
+                destino = os.path.join(directorio, f"{os.path.splitext(nombre)[0]}.{formato}")
+                escribir_tabla(df_csv, destino)
+                t_formato, df_formato = mejor_tiempo(lambda: leer_tabla(destino))
+                t_tipado, _ = mejor_tiempo(lambda: leer_tabla(destino, como_texto_plano=False))
+                identico = df_formato.equals(df_csv)
+                print(f"{'':<42} {formato:<8} {os.path.getsize(destino) / 1e6:>8.2f}MB {t_formato:>10.4f} "
+                      f"{t_csv / t_formato:>7.1f}x  (tipado: {t_tipado:.4f} s, {t_csv / t_tipado:.0f}x)"
+                      f"{'' if identico else '  ¡DISTINTO AL CSV!'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import os
+import re
+import time
+
+import pandas as pd
+from unidecode import unidecode
+
+import normalizacion
+
+# --- Benchmark de normalize_name: versión fila por fila original vs. normalizacion.normalizar_serie ---
+# Normaliza las columnas de nombres de todos_los_cp_scraped_combinado.csv de las dos formas,
+# verifica que el resultado sea idéntico y muestra filas/segundo de cada una.
+# Uso: python benchmark_normalizacion.py [--procesos 4]
+
+ARCHIVO_POR_DEFECTO = 'todos_los_cp_scraped_combinado.csv'
+COLUMNAS = ['Provincia_Navegacion', 'Provincia_Tabla', 'Localidad_Especifica_Tabla']
+
+def normalize_name_original(name):
+    """Copia textual de la función que tenían limpiar_datos_scraped.py y cruzar_con_maestros_v3.py."""
+    if pd.isna(name):
+        return ""
+    name_str = str(name).lower().strip()
+    name_str = name_str.replace('a+-', 'ñ')
+    name_str = re.sub(r'\s*\(.*\)\s*', '', name_str).strip()
+    name_str = unidecode(name_str)
+    name_str = re.sub(r'\s+', ' ', name_str).strip()
+    return name_str
+
+def clean_locality_name_original(name):
+    """Copia textual de la función que tenía consolidar_todo.py."""
+    if pd.isna(name):
+        return ""
+    name = str(name).lower().strip()
+    name = re.sub(r'\s*\(.*\)\s*', '', name).strip()
+    name = re.sub(r'\s+', ' ', name).strip()
+    return name
+
+def medir(descripcion, funcion, filas):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    segundos = time.perf_counter() - inicio
+    print(f"  {descripcion:<45} {segundos:8.3f} s  {filas / segundos:12,.0f} filas/s")
+    return resultado, segundos
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la normalización de nombres.")
+    parser.add_argument('archivo', nargs='?', default=ARCHIVO_POR_DEFECTO)
+    parser.add_argument('--procesos', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.archivo, delimiter=';', dtype=str, encoding='utf-8')
+    columnas = [c for c in COLUMNAS if c in df.columns]
+    filas = len(df) * len(columnas)
+    unicos = sum(df[c].nunique() for c in columnas)
+    print(f"'{args.archivo}': {len(df)} filas x {len(columnas)} columnas = {filas} nombres ({unicos} distintos por columna)\n")
+
+    for descripcion, original, nueva in [
+        ('normalize_name', normalize_name_original, normalizacion.normalize_name),
+        ('clean_locality_name', clean_locality_name_original, normalizacion.clean_locality_name),
+    ]:
+        print(f"{descripcion}:")
+        antes, t_antes = medir("Series.apply fila por fila (original)", lambda: [df[c].apply(original) for c in columnas], filas)
+        normalizacion._normalizar.cache_clear()
+        normalizacion._limpiar_localidad.cache_clear()
+        despues, t_despues = medir("normalizar_serie (caché fría)", lambda: [normalizacion.normalizar_serie(df[c], nueva) for c in columnas], filas)
+        medir("normalizar_serie (caché caliente)", lambda: [normalizacion.normalizar_serie(df[c], nueva) for c in columnas], filas)
+        if args.procesos > 1:
+            normalizacion._normalizar.cache_clear()
+            normalizacion._limpiar_localidad.cache_clear()
+            medir(f"normalizar_serie (procesos={args.procesos})",
+                  lambda: [normalizacion.normalizar_serie(df[c], nueva, args.procesos) for c in columnas], filas)
+        iguales = all(a.equals(d) for a, d in zip(antes, despues))
+        print(f"  Resultado idéntico al original: {'SÍ' if iguales else 'NO'} | Aceleración: {t_antes / t_despues:.1f}x\n")
+        if not iguales:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import gzip
+import hashlib
+import os
+import sqlite3
+import time
+
+# --- Caché HTTP en disco para el scraper de códigos postales ---
+# Cada respuesta se guarda comprimida (gzip) y direccionada por contenido: el nombre del archivo
+# es el sha256 del HTML, así dos URLs con la misma página comparten un único objeto.
+# Un índice SQLite relaciona cada URL con su objeto y con los validadores HTTP (ETag / Last-Modified)
+# para poder revalidar con GET condicionales (If-None-Match / If-Modified-Since -> 304).
+#
+# Estructura:
+#   cache_http/indice.sqlite
+#   cache_http/objetos/ab/ab12...ef.html.gz
+
+DIRECTORIO_CACHE = "cache_http"
+
+class RespuestaCacheada:
+    """Imita lo que usan los scrapers de requests.Response (.text y .status_code)."""
+
+    def __init__(self, text, status_code=200):
+        self.text = text
+        self.status_code = status_code
+
+class CacheHTTP:
+    def __init__(self, directorio=DIRECTORIO_CACHE):
+        self.directorio = directorio
+        self.directorio_objetos = os.path.join(directorio, "objetos")
+        os.makedirs(self.directorio_objetos, exist_ok=True)
+        self.conexion = sqlite3.connect(os.path.join(directorio, "indice.sqlite"))
+        self.conexion.execute("""
+            CREATE TABLE IF NOT EXISTS respuestas (
+                url TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fecha_descarga REAL NOT NULL,
+                fecha_validacion REAL NOT NULL
+            )
+        """)
+        self.conexion.commit()
+        self.aciertos = 0
+        self.revalidadas = 0
+        self.descargadas = 0
+        self.faltantes = 0
+
+    def _ruta_objeto(self, sha256):
+        return os.path.join(self.directorio_objetos, sha256[:2], f"{sha256}.html.gz")
+
+    def buscar(self, url):
+        """Devuelve (sha256, etag, last_modified) de la URL, o None si no está en caché."""
+        return self.conexion.execute(
+            "SELECT sha256, etag, last_modified FROM respuestas WHERE url = ?", (url,)
+        ).fetchone()
+
+    def leer(self, url):
+        """Devuelve el HTML guardado para la URL, o None si no está en caché."""
+        entrada = self.buscar(url)
+        if not entrada:
+            self.faltantes += 1
+            return None
+        ruta = self._ruta_objeto(entrada[0])
+        if not os.path.exists(ruta):
+            self.faltantes += 1
+            return None
+        with gzip.open(ruta, 'rt', encoding='utf-8') as f:
+            self.aciertos += 1
+            return f.read()
+
+    def encabezados_condicionales(self, url):
+        entrada = self.buscar(url)
+        if not entrada or not os.path.exists(self._ruta_objeto(entrada[0])):
+            return {}
+        _, etag, last_modified = entrada
+        encabezados = {}
+        if etag:
+            encabezados["If-None-Match"] = etag
+        if last_modified:
+            encabezados["If-Modified-Since"] = last_modified
+        return encabezados
+
+    def marcar_revalidada(self, url):
+        """La URL respondió 304: el objeto guardado sigue vigente."""
+        self.conexion.execute("UPDATE respuestas SET fecha_validacion = ? WHERE url = ?", (time.time(), url))
+        self.conexion.commit()
+        self.revalidadas += 1
+
+    def guardar(self, url, texto, etag=None, last_modified=None):
+        datos = texto.encode('utf-8')
+        sha256 = hashlib.sha256(datos).hexdigest()
+        ruta = self._ruta_objeto(sha256)
+        if not os.path.exists(ruta):
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            ruta_temporal = ruta + ".tmp"
+            with gzip.open(ruta_temporal, 'wb') as f:
+                f.write(datos)
+            os.replace(ruta_temporal, ruta) # Nunca queda un objeto a medio escribir
+        ahora = time.time()
+        self.conexion.execute(
+            "INSERT OR REPLACE INTO respuestas (url, sha256, etag, last_modified, fecha_descarga, fecha_validacion) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (url, sha256, etag, last_modified, ahora, ahora)
+        )
+        self.conexion.commit()
+        self.descargadas += 1
+        return sha256
+
+    def resumen(self):
+        return (f"Caché HTTP: {self.descargadas} descargadas, {self.revalidadas} revalidadas (304), "
+                f"{self.aciertos} leídas de caché, {self.faltantes} faltantes")
+
+    def cerrar(self):
+        self.conexion.close()
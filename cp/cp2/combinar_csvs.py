@@ -1,70 +1,212 @@
-import pandas as pd
-import os
+import argparse
+import csv
 import glob # Para encontrar archivos que coincidan con un patrón
+import hashlib
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+
+# --- Combinación en streaming de los CSV por provincia ---
+# Antes se cargaba cada datos_por_provincia/*.csv en un DataFrame, se concatenaba todo en memoria y la
+# deduplicación global quedaba comentada. Ahora:
+#   - los archivos se leen con el módulo csv en hilos lectores (hasta --paralelo a la vez), en bloques de
+#     FILAS_POR_BLOQUE filas que pasan por colas acotadas: en memoria hay a lo sumo unos pocos bloques por lector;
+#   - el archivo combinado se escribe a medida que llegan los bloques, en el orden de los archivos
+#     (alfabético sin distinguir mayúsculas, como lo listaba Windows al armar el combinado original);
+#   - la deduplicación global por COLUMNAS_DEDUP usa ConjuntoEnDisco: un set en memoria que, al llenarse,
+#     se vuelca a una tabla SQLite temporal, así la memoria no crece con la cantidad de filas.
+# Si los archivos no tienen todos las mismas columnas, la salida usa la unión (en orden de aparición), como pd.concat.
+# Uso: python combinar_csvs.py [--paralelo 4] [--sin-dedup]
 
 # Nombre del directorio donde están los CSVs individuales de las provincias
-INPUT_DIRECTORY = "datos_por_provincia" 
+INPUT_DIRECTORY = "datos_por_provincia"
 # Nombre del archivo CSV combinado que se generará
 COMBINED_OUTPUT_FILE = "todos_los_cp_scraped_combinado.csv"
 
-def combinar_csvs_de_directorio(directorio_entrada, archivo_salida):
+COLUMNAS_DEDUP = ['Provincia_Tabla', 'Localidad_Especifica_Tabla', 'CP_Tabla', 'CPA_Tabla']
+FILAS_POR_BLOQUE = 5000
+BLOQUES_EN_COLA = 4 # Por lector
+LECTORES = 4
+CLAVES_EN_MEMORIA = 1_000_000 # Claves de deduplicación antes de volcarlas a disco
+FIN = None # Marca de fin de archivo en la cola de un lector
+
+class ConjuntoEnDisco:
     """
-    Lee todos los archivos CSV de un directorio, los combina y guarda el resultado.
+    Conjunto de claves para deduplicar con memoria acotada. Guarda un hash de 16 bytes por clave en un set;
+    cuando pasa de 'limite' claves, las vuelca a una tabla SQLite (clave primaria) en un archivo temporal.
     """
-    # Patrón para encontrar todos los archivos CSV en el directorio de entrada
-    patron_csv = os.path.join(directorio_entrada, "*.csv")
-    lista_archivos_csv = glob.glob(patron_csv)
 
+    def __init__(self, limite=CLAVES_EN_MEMORIA, directorio=None):
+        self.limite = limite
+        self.directorio = directorio
+        self.en_memoria = set()
+        self.conexion = None
+        self.volcados = 0
+
+    @staticmethod
+    def _hash(clave):
+        return hashlib.blake2b('\x1f'.join(clave).encode('utf-8'), digest_size=16).digest()
+
+    def _volcar(self):
+        if self.conexion is None:
+            descriptor, self.ruta = tempfile.mkstemp(prefix='dedup_', suffix='.sqlite', dir=self.directorio)
+            os.close(descriptor)
+            self.conexion = sqlite3.connect(self.ruta)
+            self.conexion.execute("PRAGMA journal_mode=OFF")
+            self.conexion.execute("PRAGMA synchronous=OFF")
+            self.conexion.execute("CREATE TABLE claves (hash BLOB PRIMARY KEY) WITHOUT ROWID")
+        self.conexion.executemany("INSERT OR IGNORE INTO claves VALUES (?)", ((h,) for h in self.en_memoria))
+        self.conexion.commit()
+        self.en_memoria.clear()
+        self.volcados += 1
+
+    def agregar(self, clave):
+        """True si la clave es nueva (y la guarda); False si ya estaba."""
+        h = self._hash(clave)
+        if h in self.en_memoria:
+            return False
+        if self.conexion is not None and self.conexion.execute("SELECT 1 FROM claves WHERE hash = ?", (h,)).fetchone():
+            return False
+        self.en_memoria.add(h)
+        if len(self.en_memoria) >= self.limite:
+            self._volcar()
+        return True
+
+    def cerrar(self):
+        if self.conexion is not None:
+            self.conexion.close()
+            os.remove(self.ruta)
+            self.conexion = None
+
+def archivos_de_provincia(directorio_entrada):
+    """Los CSV del directorio en orden alfabético sin distinguir mayúsculas (el orden del combinado original)."""
+    return sorted(glob.glob(os.path.join(directorio_entrada, "*.csv")), key=str.upper)
+
+def leer_encabezado(ruta):
+    with open(ruta, newline='', encoding='utf-8') as f:
+        return next(csv.reader(f, delimiter=';'), None)
+
+def _lector(ruta, cola):
+    """Lee 'ruta' en bloques de filas y los pone en 'cola' (se bloquea si la cola está llena)."""
+    try:
+        with open(ruta, newline='', encoding='utf-8') as f:
+            filas = csv.reader(f, delimiter=';')
+            next(filas, None) # Encabezado (ya leído por leer_encabezado)
+            bloque = []
+            for fila in filas:
+                if fila: # Las líneas vacías las saltea también read_csv
+                    bloque.append(fila)
+                if len(bloque) >= FILAS_POR_BLOQUE:
+                    cola.put(bloque)
+                    bloque = []
+            if bloque:
+                cola.put(bloque)
+    except Exception as e: # El error se informa en el hilo que escribe
+        cola.put(e)
+    cola.put(FIN)
+
+def _bloques_en_orden(archivos, paralelo):
+    """(archivo, bloque) en el orden de 'archivos', con hasta 'paralelo' archivos leyéndose por adelantado."""
+    colas = {}
+    siguiente = 0
+    def lanzar():
+        nonlocal siguiente
+        while siguiente < len(archivos) and len(colas) < paralelo:
+            cola = queue.Queue(maxsize=BLOQUES_EN_COLA)
+            threading.Thread(target=_lector, args=(archivos[siguiente], cola), daemon=True).start()
+            colas[siguiente] = cola
+            siguiente += 1
+    for i, ruta in enumerate(archivos):
+        lanzar()
+        cola = colas[i]
+        while (bloque := cola.get()) is not FIN:
+            yield ruta, bloque
+        del colas[i]
+
+def combinar_csvs_de_directorio(directorio_entrada, archivo_salida, paralelo=LECTORES, deduplicar=True):
+    """
+    Combina todos los CSV de un directorio en 'archivo_salida', escribiendo a medida que se leen,
+    y (salvo deduplicar=False) descarta las filas repetidas según COLUMNAS_DEDUP.
+    """
+    lista_archivos_csv = archivos_de_provincia(directorio_entrada)
     if not lista_archivos_csv:
         print(f"No se encontraron archivos CSV en el directorio '{directorio_entrada}'.")
         return
 
     print(f"Se encontraron {len(lista_archivos_csv)} archivos CSV para combinar.")
 
-    lista_de_dataframes = []
+    # Encabezados primero (una línea por archivo) para saber las columnas de la salida
+    encabezados = {}
     for nombre_archivo in lista_archivos_csv:
         try:
-            print(f"  Cargando {nombre_archivo}...")
-            # Asumimos que todos los CSVs de provincia se guardaron con delimitador ';' y encoding 'utf-8'
-            df_prov = pd.read_csv(nombre_archivo, delimiter=';', dtype=str, encoding='utf-8')
-            lista_de_dataframes.append(df_prov)
-        except pd.errors.EmptyDataError:
+            encabezado = leer_encabezado(nombre_archivo)
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"  ERROR al leer {nombre_archivo}: {e}")
+            continue
+        if not encabezado:
             print(f"  ADVERTENCIA: El archivo {nombre_archivo} está vacío y será omitido.")
-        except Exception as e:
-            print(f"  ERROR al cargar {nombre_archivo}: {e}")
-            
-    if not lista_de_dataframes:
+            continue
+        encabezados[nombre_archivo] = encabezado
+    if not encabezados:
         print("No se pudieron cargar datos de ningún archivo CSV.")
         return
+    columnas = list(dict.fromkeys(col for encabezado in encabezados.values() for col in encabezado))
+    # Para cada archivo, la posición de cada columna de salida en sus filas (None si no la tiene)
+    posiciones = {ruta: [encabezado.index(col) if col in encabezado else None for col in columnas]
+                  for ruta, encabezado in encabezados.items()}
+    mismas_columnas = {ruta: encabezado == columnas for ruta, encabezado in encabezados.items()}
 
-    print("\nCombinando DataFrames...")
-    df_combinado = pd.concat(lista_de_dataframes, ignore_index=True)
-    
-    print(f"Total de filas en el DataFrame combinado: {len(df_combinado)}")
-    print("Primeras filas del DataFrame combinado:")
-    print(df_combinado.head())
-
-    # Opcional: Realizar una deduplicación global aquí si lo deseas,
-    # basado en las columnas que definen una entrada única (ej. Prov_Tabla, Loc_Tabla, CP, CPA)
-    # print("\nRealizando deduplicación global...")
-    # cols_para_deduplicar = ['Provincia_Tabla', 'Localidad_Especifica_Tabla', 'CP_Tabla', 'CPA_Tabla']
-    # # Asegurarse que todas las columnas para deduplicar existan
-    # cols_existentes_para_deduplicar = [col for col in cols_para_deduplicar if col in df_combinado.columns]
-    # if len(cols_existentes_para_deduplicar) == len(cols_para_deduplicar):
-    #     df_combinado_deduplicado = df_combinado.drop_duplicates(subset=cols_existentes_para_deduplicar, keep='first')
-    #     print(f"Filas después de la deduplicación global: {len(df_combinado_deduplicado)}")
-    # else:
-    #     print("Faltan columnas necesarias para la deduplicación global, se omite este paso.")
-    #     df_combinado_deduplicado = df_combinado # Usar el combinado sin deduplicar globalmente por ahora
-
-    # df_combinado_a_guardar = df_combinado_deduplicado # o df_combinado si no se deduplicó
-    df_combinado_a_guardar = df_combinado # Por ahora guardamos sin deduplicación global aquí.
+    indices_dedup = [columnas.index(col) for col in COLUMNAS_DEDUP if col in columnas]
+    if deduplicar and len(indices_dedup) < len(COLUMNAS_DEDUP):
+        print("Faltan columnas necesarias para la deduplicación global, se omite este paso.")
+        deduplicar = False
+    vistos = ConjuntoEnDisco(directorio=os.path.dirname(os.path.abspath(archivo_salida))) if deduplicar else None
 
+    temporal = archivo_salida + '.tmp'
+    filas_leidas = filas_escritas = 0
+    archivo_actual = None
     try:
-        df_combinado_a_guardar.to_csv(archivo_salida, index=False, sep=';', encoding='utf-8')
-        print(f"\n¡Archivos combinados! Resultado guardado en: '{archivo_salida}'")
+        with open(temporal, 'w', newline='', encoding='utf-8') as salida:
+            escritor = csv.writer(salida, delimiter=';', lineterminator='\n')
+            escritor.writerow(columnas)
+            for nombre_archivo, bloque in _bloques_en_orden(list(encabezados), paralelo):
+                if nombre_archivo != archivo_actual:
+                    print(f"  Combinando {nombre_archivo}...")
+                    archivo_actual = nombre_archivo
+                if isinstance(bloque, Exception):
+                    print(f"  ERROR al cargar {nombre_archivo}: {bloque}")
+                    continue
+                if not mismas_columnas[nombre_archivo]:
+                    lugar = posiciones[nombre_archivo]
+                    bloque = [[fila[p] if p is not None and p < len(fila) else '' for p in lugar] for fila in bloque]
+                filas_leidas += len(bloque)
+                if vistos is not None:
+                    bloque = [fila for fila in bloque if vistos.agregar([fila[i] if i < len(fila) else '' for i in indices_dedup])]
+                escritor.writerows(bloque)
+                filas_escritas += len(bloque)
+        os.replace(temporal, archivo_salida)
     except Exception as e:
         print(f"ERROR al guardar el archivo combinado: {e}")
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        return
+    finally:
+        if vistos is not None:
+            vistos.cerrar()
+
+    print(f"\nTotal de filas leídas: {filas_leidas}")
+    if deduplicar:
+        print(f"Filas después de la deduplicación global por {COLUMNAS_DEDUP}: {filas_escritas} "
+              f"({filas_leidas - filas_escritas} repetidas; volcados a disco: {vistos.volcados})")
+    print(f"\n¡Archivos combinados! Resultado guardado en: '{archivo_salida}'")
 
 if __name__ == "__main__":
-    combinar_csvs_de_directorio(INPUT_DIRECTORY, COMBINED_OUTPUT_FILE)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Combina los CSV por provincia en un solo archivo, en streaming.")
+    parser.add_argument('--entrada', default=INPUT_DIRECTORY)
+    parser.add_argument('--salida', default=COMBINED_OUTPUT_FILE)
+    parser.add_argument('--paralelo', type=int, default=LECTORES, help="Archivos que se leen a la vez.")
+    parser.add_argument('--sin-dedup', action='store_true', help="No descartar filas repetidas (como el combinado original).")
+    args = parser.parse_args()
+    combinar_csvs_de_directorio(args.entrada, args.salida, args.paralelo, not args.sin_dedup)
@@ -1,5 +1,4 @@
 import pandas as pd
-import re # Para expresiones regulares (limpieza de nombres)
 
 # --- Configuración de Nombres de Archivo ---
 # Modifica estos nombres si tus archivos se llaman diferente o están en otra carpeta.
@@ -10,60 +9,108 @@ LOCALIDADES_CP_FILE = 'localidades.csv' # Este es el archivo que ya tenías con
 
 OUTPUT_FILE = 'datos_consolidados_final_diagnostico.csv' # Cambiado para indicar que es para diagnóstico
 
-# --- Función Auxiliar para Limpiar Nombres de Localidad ---
-def clean_locality_name(name):
-    if pd.isna(name): # Manejar valores nulos
-        return ""
-    name = str(name).lower().strip()
-    # Eliminar contenido entre paréntesis y los paréntesis mismos
-    name = re.sub(r'\s*\(.*\)\s*', '', name).strip()
-    # Opcional: para una limpieza más profunda, se podría usar unidecode para quitar tildes
-    # from unidecode import unidecode
-    # name = unidecode(name)
-    name = re.sub(r'\s+', ' ', name).strip() # Normalizar múltiples espacios a uno solo
-    return name
+# --- Limpieza de nombres de localidad (compartida con los demás scripts, ver normalizacion.py) ---
+from normalizacion import clean_locality_name, normalizar_serie
+# Tipos de cada tabla (IDs enteros compactos, nombres categóricos), ver esquemas.py
+from esquemas import leer_con_esquema
+
+# --- Cruce por bloques de provincia ---
+# El cruce P-D-L -> fuente de CP era solo por nombre de localidad limpio: los nombres repetidos en todo el país
+# ("san martin", "25 de mayo", ...) se multiplicaban contra todas las provincias. Ahora el cruce es por
+# (provincia, nombre) y solo las localidades que no encuentran CP en su provincia se cruzan por nombre solo.
+# localidades.csv numera las provincias a su manera (idProvincia), así que la equivalencia con id_prov se deduce
+# de los nombres de localidad que existen en una sola provincia del P-D-L.
+BLOQUE_PROVINCIA = 'provincia'
+BLOQUE_SOLO_NOMBRE = 'solo_nombre'
+COLUMNAS_FUENTE_CP = ['nom_loca_cleaned_cp', 'id_cp_val_source', 'cp_val_source', 'id_prov_cp_source_original', 'id_prov_cp_source_numeric']
+
+def equivalencia_id_provincia(df_pdl, df_cp_source):
+    """idProvincia (localidades.csv) -> id_prov (provincias.csv), por mayoría entre nombres de una sola provincia."""
+    provincias_por_nombre = df_pdl.groupby('nom_loca_cleaned_pdl', observed=True)['id_prov_val'].nunique()
+    nombres_unicos = provincias_por_nombre.index[provincias_por_nombre == 1]
+    df_unicos = df_pdl.loc[df_pdl['nom_loca_cleaned_pdl'].isin(nombres_unicos), ['nom_loca_cleaned_pdl', 'id_prov_val']].drop_duplicates()
+    votos = pd.merge(df_cp_source[['nom_loca_cleaned_cp', 'id_prov_cp_source_numeric']].dropna(), df_unicos,
+                     left_on='nom_loca_cleaned_cp', right_on='nom_loca_cleaned_pdl')
+    conteo = votos.groupby(['id_prov_cp_source_numeric', 'id_prov_val']).size()
+    ganador = conteo.groupby(level=0).idxmax().map(lambda par: par[1])
+    participacion = conteo.groupby(level=0).max() / conteo.groupby(level=0).sum()
+    return ganador, participacion
+
+def cruce_por_bloques(df_pdl, df_cp_source):
+    """
+    Merge P-D-L -> fuente de CP por (id_prov, nombre limpio); las filas sin CP en su provincia se cruzan por nombre solo.
+    Devuelve el merge (en el orden de df_pdl, con la columna 'bloque_cruce') y el reporte de multiplicación por bloque.
+    """
+    equivalencia, participacion = equivalencia_id_provincia(df_pdl, df_cp_source)
+    print("  Equivalencia idProvincia (localidades.csv) -> id_prov (coincidencia entre nombres de una sola provincia):")
+    print("    " + ", ".join(f"{int(k)}->{int(v)} ({participacion[k]:.0%})" for k, v in equivalencia.items()))
+
+    df_pdl = df_pdl.assign(_fila=range(len(df_pdl)))
+    df_fuente = df_cp_source[COLUMNAS_FUENTE_CP].copy()
+    df_fuente['id_prov_bloque'] = df_fuente['id_prov_cp_source_numeric'].map(equivalencia).astype(df_pdl['id_prov_val'].dtype)
+
+    # 1. Bloque de la provincia
+    df_en_provincia = pd.merge(df_pdl, df_fuente, left_on=['id_prov_val', 'nom_loca_cleaned_pdl'],
+                               right_on=['id_prov_bloque', 'nom_loca_cleaned_cp'], how='inner')
+    df_en_provincia['bloque_cruce'] = BLOQUE_PROVINCIA
+
+    # 2. Las que no tienen CP en su provincia: por nombre solo, como antes (y sin CP si tampoco así aparece)
+    df_restantes = df_pdl[~df_pdl['_fila'].isin(df_en_provincia['_fila'])]
+    df_por_nombre = pd.merge(df_restantes, df_fuente, left_on='nom_loca_cleaned_pdl', right_on='nom_loca_cleaned_cp', how='left')
+    df_por_nombre['bloque_cruce'] = df_por_nombre['cp_val_source'].notna().map({True: BLOQUE_SOLO_NOMBRE, False: None})
+
+    df_merged = pd.concat([df_en_provincia, df_por_nombre], ignore_index=True)
+    df_merged = df_merged.sort_values('_fila', kind='stable').drop(columns=['_fila', 'id_prov_bloque']).reset_index(drop=True)
+    return df_merged, reporte_por_bloque(df_pdl, df_fuente, df_merged)
+
+def reporte_por_bloque(df_pdl, df_fuente, df_merged):
+    """Por provincia: filas P-D-L, filas que daba el cruce solo por nombre (calculadas, sin armarlo) y filas ahora."""
+    filas_pdl = df_pdl.groupby('id_prov_val', observed=True).size()
+    # Cruce solo por nombre: cada fila P-D-L se multiplica por la cantidad de filas de la fuente con su nombre (mínimo 1)
+    por_nombre = df_fuente['nom_loca_cleaned_cp'].value_counts()
+    multiplicador = df_pdl['nom_loca_cleaned_pdl'].map(por_nombre).fillna(1).clip(lower=1)
+    filas_antes = multiplicador.groupby(df_pdl['id_prov_val']).sum()
+    filas_ahora = df_merged.groupby('id_prov_val', observed=True).size()
+    reporte = pd.DataFrame({'filas_pdl': filas_pdl, 'filas_solo_nombre': filas_antes, 'filas_por_bloque': filas_ahora}).fillna(0).astype(int)
+    reporte['factor_antes'] = (reporte['filas_solo_nombre'] / reporte['filas_pdl']).round(2)
+    reporte['factor_ahora'] = (reporte['filas_por_bloque'] / reporte['filas_pdl']).round(2)
+    total = reporte[['filas_pdl', 'filas_solo_nombre', 'filas_por_bloque']].sum()
+    reporte.loc['TOTAL'] = [*total, round(total['filas_solo_nombre'] / total['filas_pdl'], 2),
+                            round(total['filas_por_bloque'] / total['filas_pdl'], 2)]
+    reporte[['filas_pdl', 'filas_solo_nombre', 'filas_por_bloque']] = reporte[['filas_pdl', 'filas_solo_nombre', 'filas_por_bloque']].astype(int)
+    reporte.index.name = 'id_prov'
+    return reporte
 
 print("Iniciando el proceso de consolidación de 4 archivos (con diagnóstico de id_prov de CP)...")
 
 try:
     # --- 1. Cargar provincias.csv ---
     print(f"\nCargando '{PROVINCIAS_FILE}'...")
-    df_provincias = pd.read_csv(PROVINCIAS_FILE, delimiter=',', header=0, dtype=str)
+    df_provincias = leer_con_esquema(PROVINCIAS_FILE, 'provincias')
     df_provincias.rename(columns={'id_prov': 'id_prov_val', 'nom_prov': 'nom_prov_val'}, inplace=True)
-    df_provincias['id_prov_val'] = pd.to_numeric(df_provincias['id_prov_val'], errors='coerce')
     df_provincias.dropna(subset=['id_prov_val'], inplace=True)
-    df_provincias['id_prov_val'] = df_provincias['id_prov_val'].astype(int)
     print(f"  '{PROVINCIAS_FILE}' cargado: {len(df_provincias)} filas. Columnas: {df_provincias.columns.tolist()}")
     print(df_provincias.head(2))
 
     # --- 2. Cargar deptos.csv ---
     print(f"\nCargando '{DEPTOS_FILE}'...")
-    df_deptos = pd.read_csv(DEPTOS_FILE, delimiter=',', header=0, dtype=str)
+    df_deptos = leer_con_esquema(DEPTOS_FILE, 'deptos')
     df_deptos.rename(columns={'id_depto': 'id_depto_val', 'id_prov': 'id_prov_val', 'nom_depto': 'nom_depto_val'}, inplace=True)
-    df_deptos['id_depto_val'] = pd.to_numeric(df_deptos['id_depto_val'], errors='coerce')
-    df_deptos['id_prov_val'] = pd.to_numeric(df_deptos['id_prov_val'], errors='coerce')
     df_deptos.dropna(subset=['id_depto_val', 'id_prov_val'], inplace=True)
-    df_deptos['id_depto_val'] = df_deptos['id_depto_val'].astype(int)
-    df_deptos['id_prov_val'] = df_deptos['id_prov_val'].astype(int)
     print(f"  '{DEPTOS_FILE}' cargado: {len(df_deptos)} filas. Columnas: {df_deptos.columns.tolist()}")
     print(df_deptos.head(2))
 
     # --- 3. Cargar loca.csv ---
     print(f"\nCargando '{LOCA_FILE}'...")
-    df_loca = pd.read_csv(LOCA_FILE, delimiter=',', header=0, dtype=str)
-    df_loca = df_loca[['id_loca', 'id_depto', 'nom_loca']] # Seleccionar solo las columnas necesarias
+    df_loca = leer_con_esquema(LOCA_FILE, 'loca', usecols=['id_loca', 'id_depto', 'nom_loca']) # Solo las columnas necesarias
     df_loca.rename(columns={'id_loca': 'id_loca_val', 'id_depto': 'id_depto_val', 'nom_loca': 'nom_loca_pdl_original'}, inplace=True)
-    df_loca['id_loca_val'] = pd.to_numeric(df_loca['id_loca_val'], errors='coerce')
-    df_loca['id_depto_val'] = pd.to_numeric(df_loca['id_depto_val'], errors='coerce')
     df_loca.dropna(subset=['id_loca_val', 'id_depto_val'], inplace=True)
-    df_loca['id_loca_val'] = df_loca['id_loca_val'].astype(int)
-    df_loca['id_depto_val'] = df_loca['id_depto_val'].astype(int)
     print(f"  '{LOCA_FILE}' cargado: {len(df_loca)} filas. Columnas: {df_loca.columns.tolist()}")
     print(df_loca.head(2))
 
     # --- 4. Cargar localidades.csv (fuente de CP) ---
     print(f"\nCargando '{LOCALIDADES_CP_FILE}'...")
-    df_cp_source = pd.read_csv(LOCALIDADES_CP_FILE, delimiter=';', header=0, dtype=str)
+    df_cp_source = leer_con_esquema(LOCALIDADES_CP_FILE, 'localidades')
     # Renombramos y CONSERVAMOS id_prov de este archivo para diagnóstico
     df_cp_source.rename(columns={
         'id_cp': 'id_cp_val_source',
@@ -91,23 +138,20 @@ try:
 
     # --- Consolidación Parte 2: Preparar nombres y Unir con datos de CP ---
     print("\nLimpiando nombres de localidad para el cruce...")
-    df_pdl['nom_loca_cleaned_pdl'] = df_pdl['nom_loca_pdl_original'].apply(clean_locality_name)
-    df_cp_source['nom_loca_cleaned_cp'] = df_cp_source['nom_loca_cp_original'].apply(clean_locality_name)
+    df_pdl['nom_loca_cleaned_pdl'] = normalizar_serie(df_pdl['nom_loca_pdl_original'], clean_locality_name)
+    df_cp_source['nom_loca_cleaned_cp'] = normalizar_serie(df_cp_source['nom_loca_cp_original'], clean_locality_name)
 
     print("  Ejemplos de nombres limpios de P-D-L (original de loca.csv):")
     print(df_pdl[['nom_loca_pdl_original', 'nom_loca_cleaned_pdl']].head(3))
     print("  Ejemplos de nombres limpios de la fuente de CP (localidades.csv):")
     print(df_cp_source[['nom_loca_cp_original', 'nom_loca_cleaned_cp', 'id_prov_cp_source_original']].head(3))
     
-    print("\nRealizando merge: P-D-L -> Fuente de CP (sobre nombres de localidad limpios)...")
-    df_final_merged = pd.merge(
-        df_pdl,
-        df_cp_source[['nom_loca_cleaned_cp', 'id_cp_val_source', 'cp_val_source', 'id_prov_cp_source_original', 'id_prov_cp_source_numeric']], # Traer las columnas de id_prov de la fuente de CP
-        left_on='nom_loca_cleaned_pdl',
-        right_on='nom_loca_cleaned_cp',
-        how='left'
-    )
+    print("\nRealizando merge: P-D-L -> Fuente de CP (por provincia y nombre de localidad limpio)...")
+    df_final_merged, df_reporte_bloques = cruce_por_bloques(df_pdl, df_cp_source)
     print(f"  Resultado del merge final: {len(df_final_merged)} filas.")
+    print(f"  Cruces por bloque: {df_final_merged['bloque_cruce'].value_counts(dropna=False).to_dict()}")
+    print("\n  Multiplicación de filas por provincia (factor = filas de salida / filas P-D-L):")
+    print(df_reporte_bloques.to_string())
     print(df_final_merged.head())
 
     # --- Preparar Archivo de Salida ---
@@ -125,7 +169,7 @@ try:
     })
 
     # Seleccionar y ordenar las columnas finales
-    columnas_final_deseadas = ['id_prov', 'nom_prov', 'id_depto', 'nom_depto', 'id_loca', 'nom_loca', 'id_cp', 'cp', 'cp_id_prov_csv_original', 'cp_id_prov_csv_num']
+    columnas_final_deseadas = ['id_prov', 'nom_prov', 'id_depto', 'nom_depto', 'id_loca', 'nom_loca', 'id_cp', 'cp', 'cp_id_prov_csv_original', 'cp_id_prov_csv_num', 'bloque_cruce']
     
     # Asegurarse de que todas las columnas deseadas existan en df_output
     # Especialmente las que vienen del merge (id_cp, cp, y las de diagnóstico de id_prov del CP)
@@ -0,0 +1,289 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Construcción incremental de los datos de CP ---
+# Grafo declarativo de etapas: cada una declara su script (y los módulos que importa), sus entradas y sus salidas.
+# Las dependencias salen solas: una etapa depende de la que produce alguna de sus entradas.
+# Cada etapa se identifica por un hash de (código + contenido de sus entradas):
+#   - si el hash coincide con el de la última corrida y las salidas están intactas, la etapa se saltea;
+#   - si el hash ya se vio antes (ej. se volvió a una versión anterior de deptos.csv), las salidas
+#     se restauran de la caché sin ejecutar nada;
+#   - si no, se ejecuta el script y sus salidas se guardan en la caché.
+# Para no leer todos los archivos en cada corrida, el hash de cada archivo se recalcula solo si cambió
+# su tamaño o su fecha de modificación, así una reconstrucción sin cambios tarda milisegundos.
+# Las etapas que no dependen entre sí (ej. consolidar_todo y la cadena de limpieza) corren en paralelo.
+# Uso:
+#   python construir_pipeline.py              # reconstruye lo necesario
+#   python construir_pipeline.py --plan       # muestra qué se ejecutaría y por qué
+#   python construir_pipeline.py --forzar cruzar_con_maestros_v3
+
+DIRECTORIO_BASE = os.path.dirname(os.path.abspath(__file__))
+DIRECTORIO_CACHE = '.cache_construccion'
+ARCHIVO_ESTADO = 'estado.json'
+
+class Etapa:
+    def __init__(self, nombre, script, entradas, salidas, codigo=(), argumentos=()):
+        self.nombre = nombre
+        self.script = script
+        self.argumentos = list(argumentos) # Argumentos de línea de comandos del script, si los necesita
+        self.entradas = list(entradas) # Pueden ser patrones glob
+        self.salidas = list(salidas)
+        self.codigo = [script] + list(codigo) # Si cambia cualquiera de estos archivos, la etapa se vuelve a ejecutar
+
+    def archivos_de_entrada(self):
+        archivos = []
+        for patron in self.entradas:
+            if glob.has_magic(patron):
+                archivos.extend(sorted(glob.glob(patron)))
+            else:
+                archivos.append(patron)
+        return archivos
+
+# normalize_name y el CPA viven en el paquete establecimientos (los comparte la app)
+NORMALIZACION = ['normalizacion.py', os.path.join('..', '..', 'establecimientos', 'normalizacion.py')]
+CPA = os.path.join('..', '..', 'establecimientos', 'cpa.py')
+GAZETTEER = ['gazetteer.py', os.path.join('..', '..', 'establecimientos', 'gazetteer.py')]
+
+ETAPAS = [
+    Etapa('combinar_csvs', 'combinar_csvs.py',
+          entradas=['datos_por_provincia/*.csv'],
+          salidas=['todos_los_cp_scraped_combinado.csv']),
+    # Maestro P-D-L compilado: cruzar_con_maestros_v3 lo usa en lugar de armarlo desde los CSV
+    Etapa('gazetteer', 'gazetteer.py', argumentos=['compilar'], codigo=[*NORMALIZACION, *GAZETTEER],
+          entradas=['provincias.csv', 'deptos.csv', 'loca.csv'],
+          salidas=['gazetteer_pdl.bin']),
+    Etapa('limpiar_datos_scraped', 'limpiar_datos_scraped.py', codigo=[*NORMALIZACION, 'reglas_prov_loc.py'],
+          entradas=['todos_los_cp_scraped_combinado.csv', 'provincias.csv'],
+          salidas=['datos_scraped_limpios_corregidos_con_id_cp.csv']),
+    Etapa('cruzar_con_maestros_v3', 'cruzar_con_maestros_v3.py', codigo=[*NORMALIZACION, 'esquemas.py', *GAZETTEER],
+          entradas=['datos_scraped_limpios_corregidos_con_id_cp.csv', 'provincias.csv', 'deptos.csv', 'loca.csv', 'gazetteer_pdl.bin'],
+          salidas=['tabla_final_cruces_exitosos.csv', 'scraped_cp_sin_match_en_maestro.csv']),
+    Etapa('deduplicar_tabla_final', 'deduplicar_tabla_final.py', codigo=['esquemas.py', 'motor_dedup.py'],
+          entradas=['tabla_final_cruces_exitosos.csv'],
+          salidas=['tabla_final_deduplicada_por_id_loca.csv']),
+    Etapa('corregir_n_final', 'corregir_n_final.py', codigo=['esquemas.py'],
+          entradas=['tabla_final_deduplicada_por_id_loca.csv'],
+          salidas=['tabla_final_corregida_n.csv']),
+    # Reporte de calidad de la tabla final; acá no corta la construcción (la compuerta es para la importación)
+    Etapa('validar_tabla_cp', 'validar_tabla_cp.py', argumentos=['--solo-reporte'],
+          codigo=['esquemas.py', 'corregir_n_final.py', 'cruzar_con_maestros_v3.py', *NORMALIZACION, CPA],
+          entradas=['tabla_final_corregida_n.csv', 'provincias.csv', 'deptos.csv', 'loca.csv'],
+          salidas=['validacion_tabla_cp.csv', 'validacion_tabla_cp_muestras.csv']),
+    # Revisión aproximada de lo que no cruzó: no alimenta a la deduplicación (para eso, pipeline_cp.py --difuso)
+    Etapa('emparejador_difuso', 'emparejador_difuso.py', codigo=['cruzar_con_maestros_v3.py', *NORMALIZACION, 'esquemas.py', *GAZETTEER],
+          entradas=['scraped_cp_sin_match_en_maestro.csv', 'provincias.csv', 'deptos.csv', 'loca.csv', 'gazetteer_pdl.bin'],
+          salidas=['scraped_cp_candidatos_difusos.csv', 'tabla_final_cruces_difusos.csv', 'scraped_cp_sin_match_tras_difuso.csv']),
+    # Diagnóstico P-D-L + localidades.csv: no depende de la cadena de arriba, corre en paralelo con ella
+    Etapa('consolidar_todo', 'consolidar_todo.py', codigo=[*NORMALIZACION, 'esquemas.py'],
+          entradas=['provincias.csv', 'deptos.csv', 'loca.csv', 'localidades.csv'],
+          salidas=['datos_consolidados_final_diagnostico.csv']),
+]
+
+# --- Hashes de archivos con caché por (tamaño, mtime) ---
+class EstadoConstruccion:
+    def __init__(self, directorio_cache):
+        self.directorio_cache = directorio_cache
+        self.ruta = os.path.join(directorio_cache, ARCHIVO_ESTADO)
+        datos = {}
+        if os.path.exists(self.ruta):
+            with open(self.ruta, encoding='utf-8') as f:
+                datos = json.load(f)
+        self.archivos = datos.get('archivos', {}) # ruta -> [tamaño, mtime_ns, sha256]
+        self.etapas = datos.get('etapas', {})     # nombre -> {'clave': ..., 'salidas': {ruta: sha256}}
+        self.historial = datos.get('historial', {}) # clave -> {ruta: sha256} (para restaurar sin ejecutar)
+
+    def hash_archivo(self, ruta):
+        """sha256 del contenido, o None si no existe. Solo se lee el archivo si cambió su tamaño o su mtime."""
+        try:
+            st = os.stat(ruta)
+        except FileNotFoundError:
+            return None
+        conocido = self.archivos.get(ruta)
+        if conocido and conocido[0] == st.st_size and conocido[1] == st.st_mtime_ns:
+            return conocido[2]
+        sha = hashlib.sha256()
+        with open(ruta, 'rb') as f:
+            for bloque in iter(lambda: f.read(1 << 20), b''):
+                sha.update(bloque)
+        self.archivos[ruta] = [st.st_size, st.st_mtime_ns, sha.hexdigest()]
+        return sha.hexdigest()
+
+    def clave_de_etapa(self, etapa):
+        """Hash de (código de la etapa + contenido de sus entradas). None si falta alguna entrada."""
+        sha = hashlib.sha256(etapa.nombre.encode('utf-8'))
+        for ruta in etapa.codigo + etapa.archivos_de_entrada():
+            contenido = self.hash_archivo(ruta)
+            if contenido is None:
+                return None
+            sha.update(f"\0{ruta}\0{contenido}".encode('utf-8'))
+        return sha.hexdigest()
+
+    def salidas_intactas(self, salidas_registradas):
+        return all(self.hash_archivo(ruta) == sha for ruta, sha in salidas_registradas.items())
+
+    # --- Caché de salidas (direccionada por contenido) ---
+    def ruta_objeto(self, sha):
+        return os.path.join(self.directorio_cache, 'objetos', sha[:2], sha)
+
+    def guardar_salidas(self, etapa, clave):
+        salidas = {}
+        for ruta in etapa.salidas:
+            sha = self.hash_archivo(ruta)
+            destino = self.ruta_objeto(sha)
+            if not os.path.exists(destino):
+                os.makedirs(os.path.dirname(destino), exist_ok=True)
+                shutil.copyfile(ruta, destino)
+            salidas[ruta] = sha
+        self.etapas[etapa.nombre] = {'clave': clave, 'salidas': salidas}
+        self.historial[clave] = salidas
+
+    def restaurar_salidas(self, etapa, clave):
+        salidas = self.historial[clave]
+        if not all(os.path.exists(self.ruta_objeto(sha)) for sha in salidas.values()):
+            return False
+        for ruta, sha in salidas.items():
+            if self.hash_archivo(ruta) != sha:
+                shutil.copyfile(self.ruta_objeto(sha), ruta)
+        self.etapas[etapa.nombre] = {'clave': clave, 'salidas': salidas}
+        return True
+
+    def guardar(self):
+        os.makedirs(self.directorio_cache, exist_ok=True)
+        ruta_temporal = self.ruta + '.tmp'
+        with open(ruta_temporal, 'w', encoding='utf-8') as f:
+            json.dump({'archivos': self.archivos, 'etapas': self.etapas, 'historial': self.historial}, f)
+        os.replace(ruta_temporal, self.ruta)
+
+# --- Grafo ---
+def niveles(etapas):
+    """Orden topológico por niveles: las etapas de un mismo nivel no dependen entre sí."""
+    productor = {salida: e.nombre for e in etapas for salida in e.salidas}
+    dependencias = {
+        e.nombre: {productor[ruta] for ruta in e.entradas if ruta in productor and productor[ruta] != e.nombre}
+        for e in etapas
+    }
+    por_nombre = {e.nombre: e for e in etapas}
+    resultado, hechas = [], set()
+    while len(hechas) < len(etapas):
+        nivel = [n for n in dependencias if n not in hechas and dependencias[n] <= hechas]
+        if not nivel:
+            raise ValueError(f"Dependencia circular entre las etapas: {sorted(set(dependencias) - hechas)}")
+        resultado.append([por_nombre[n] for n in nivel])
+        hechas.update(nivel)
+    return resultado, dependencias
+
+def decidir(etapa, estado, forzadas):
+    """('saltear' | 'restaurar' | 'ejecutar' | 'falta_entrada', clave, motivo)."""
+    clave = estado.clave_de_etapa(etapa)
+    if clave is None:
+        faltantes = [r for r in etapa.codigo + etapa.archivos_de_entrada() if not os.path.exists(r)]
+        return 'falta_entrada', None, f"faltan {faltantes}"
+    if etapa.nombre in forzadas:
+        return 'ejecutar', clave, "forzada"
+    anterior = estado.etapas.get(etapa.nombre)
+    if anterior and anterior['clave'] == clave:
+        if estado.salidas_intactas(anterior['salidas']):
+            return 'saltear', clave, "sin cambios"
+        motivo = "salidas modificadas o borradas"
+    else:
+        motivo = "cambió el código o alguna entrada" if anterior else "nunca se ejecutó"
+    if clave in estado.historial:
+        return 'restaurar', clave, motivo + " (resultado ya en caché)"
+    return 'ejecutar', clave, motivo
+
+def ejecutar_script(etapa):
+    inicio = time.perf_counter()
+    marcas = {ruta: os.stat(ruta).st_mtime_ns if os.path.exists(ruta) else None for ruta in etapa.salidas}
+    proceso = subprocess.run([sys.executable, etapa.script, *etapa.argumentos], capture_output=True, text=True, encoding='utf-8', errors='replace')
+    # Los scripts atrapan sus errores y terminan con código 0, así que además se verifica que hayan escrito sus salidas
+    sin_escribir = [r for r in etapa.salidas if not os.path.exists(r) or os.stat(r).st_mtime_ns == marcas[r]]
+    error = None
+    if proceso.returncode != 0 or sin_escribir:
+        error = f"código {proceso.returncode}, salidas sin escribir: {sin_escribir}\n{proceso.stdout[-2000:]}{proceso.stderr[-2000:]}"
+    return time.perf_counter() - inicio, error
+
+def construir(etapas, estado, forzadas, paralelo, solo_plan):
+    lista_niveles, dependencias = niveles(etapas)
+    fallidas = set()
+    ejecutadas = 0
+    for nivel in lista_niveles:
+        a_ejecutar = []
+        for etapa in nivel:
+            if dependencias[etapa.nombre] & fallidas:
+                print(f"  [omitida]   {etapa.nombre}: falló una etapa anterior")
+                fallidas.add(etapa.nombre)
+                continue
+            accion, clave, motivo = decidir(etapa, estado, forzadas)
+            if accion == 'saltear':
+                print(f"  [al día]    {etapa.nombre}")
+            elif accion == 'falta_entrada':
+                print(f"  [ERROR]     {etapa.nombre}: {motivo}")
+                fallidas.add(etapa.nombre)
+            elif accion == 'restaurar' and not solo_plan and estado.restaurar_salidas(etapa, clave):
+                print(f"  [caché]     {etapa.nombre}: {motivo}")
+            else:
+                print(f"  [{'ejecutar' if solo_plan else 'ejecutando'}] {etapa.nombre}: {motivo}")
+                a_ejecutar.append(etapa)
+        if solo_plan or not a_ejecutar:
+            continue
+        with ThreadPoolExecutor(max_workers=paralelo) as executor:
+            resultados = list(executor.map(ejecutar_script, a_ejecutar))
+        for etapa, (segundos, error) in zip(a_ejecutar, resultados):
+            if error:
+                print(f"  [FALLÓ]     {etapa.nombre} ({segundos:.2f} s): {error}")
+                fallidas.add(etapa.nombre)
+            else:
+                print(f"  [listo]     {etapa.nombre} ({segundos:.2f} s)")
+                # La clave se recalcula: si la etapa tocó alguna de sus propias entradas, queda registrada la versión final
+                estado.guardar_salidas(etapa, estado.clave_de_etapa(etapa))
+                ejecutadas += 1
+        if not solo_plan:
+            estado.guardar() # Después de cada nivel, así un corte no pierde lo ya construido
+    return ejecutadas, fallidas
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruye solo las etapas del pipeline de CP cuyas entradas o código cambiaron.")
+    parser.add_argument('--plan', action='store_true', help="Mostrar qué se ejecutaría y por qué, sin ejecutar.")
+    parser.add_argument('--forzar', nargs='*', default=[], metavar='ETAPA', help="Ejecutar estas etapas aunque estén al día (sin nombres: todas).")
+    parser.add_argument('--etapas', nargs='*', metavar='ETAPA', help="Construir solo estas etapas (y las que necesiten).")
+    parser.add_argument('--paralelo', type=int, default=os.cpu_count(), help="Máximo de etapas independientes en paralelo.")
+    parser.add_argument('--cache', default=DIRECTORIO_CACHE)
+    args = parser.parse_args()
+
+    os.chdir(DIRECTORIO_BASE) # Los scripts usan rutas relativas a su carpeta
+    nombres = {e.nombre for e in ETAPAS}
+    for nombre in (args.forzar or []) + (args.etapas or []):
+        if nombre not in nombres:
+            raise SystemExit(f"ERROR: Etapa desconocida '{nombre}'. Etapas: {', '.join(e.nombre for e in ETAPAS)}")
+
+    etapas = ETAPAS
+    if args.etapas:
+        _, dependencias = niveles(ETAPAS)
+        elegidas, pendientes = set(), list(args.etapas)
+        while pendientes:
+            nombre = pendientes.pop()
+            if nombre not in elegidas:
+                elegidas.add(nombre)
+                pendientes.extend(dependencias[nombre])
+        etapas = [e for e in ETAPAS if e.nombre in elegidas]
+    forzadas = set(args.forzar) if args.forzar else (nombres if '--forzar' in sys.argv else set())
+
+    inicio = time.perf_counter()
+    estado = EstadoConstruccion(args.cache)
+    ejecutadas, fallidas = construir(etapas, estado, forzadas, args.paralelo, args.plan)
+    if not args.plan:
+        estado.guardar()
+    print(f"\n{ejecutadas} etapas ejecutadas, {len(fallidas)} con error, en {(time.perf_counter() - inicio) * 1000:.0f} ms.")
+    if fallidas:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
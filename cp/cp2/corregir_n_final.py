@@ -1,8 +1,11 @@
 import pandas as pd
 
+from formato_columnar import con_extension, escribir_tabla, formato_de_linea_de_comandos
+from esquemas import leer_con_esquema
+
 # --- Configuración de Archivos ---
 # Este es el archivo que generó 'deduplicar_tabla_final.py'
-INPUT_FILE = 'tabla_final_deduplicada_por_id_loca.csv' 
+INPUT_FILE = 'tabla_final_deduplicada_por_id_loca.csv'
 # Nombre para el archivo con los nombres corregidos
 OUTPUT_FILE = 'tabla_final_corregida_n.csv'
 
@@ -15,52 +18,59 @@ def corregir_caracter_n(texto):
         return texto_corregido
     return texto
 
-print(f"Iniciando corrección de caracteres especiales para '{INPUT_FILE}'...")
-
-try:
-    # --- 1. Cargar el archivo ---
-    print(f"Cargando '{INPUT_FILE}'...")
-    df = pd.read_csv(INPUT_FILE, delimiter=';', dtype=str, encoding='utf-8')
-    print(f"  Filas cargadas: {len(df)}")
-    if df.empty:
-        print("El archivo de entrada está vacío. No hay nada que procesar.")
-        exit()
-
-    print("  Columnas cargadas:", df.columns.tolist())
-    print("Primeras filas ANTES de la corrección:")
-    print(df[['nom_prov', 'nom_loca']].head())
-
-
+def corregir(df):
+    """Aplica corregir_caracter_n a 'nom_prov' y 'nom_loca'."""
     # --- 2. Aplicar la corrección a las columnas de nombres ---
     # Las columnas relevantes son 'nom_prov' y 'nom_loca'
     if 'nom_prov' in df.columns:
-        df['nom_prov'] = df['nom_prov'].apply(corregir_caracter_n)
+        df['nom_prov'] = df['nom_prov'].map(corregir_caracter_n) # En una categórica, una vez por nombre distinto
         print("  Corrección de 'a+-' aplicada a 'nom_prov'.")
     else:
         print("ADVERTENCIA: Columna 'nom_prov' no encontrada.")
-        
+
     if 'nom_loca' in df.columns:
-        df['nom_loca'] = df['nom_loca'].apply(corregir_caracter_n)
+        df['nom_loca'] = df['nom_loca'].map(corregir_caracter_n)
         print("  Corrección de 'a+-' aplicada a 'nom_loca'.")
     else:
         print("ADVERTENCIA: Columna 'nom_loca' no encontrada.")
+    return df
+
+if __name__ == "__main__":
+    formato = formato_de_linea_de_comandos("Corrección de la ñ en la tabla final.")
+    INPUT_FILE, OUTPUT_FILE = con_extension(INPUT_FILE, formato), con_extension(OUTPUT_FILE, formato)
+    print(f"Iniciando corrección de caracteres especiales para '{INPUT_FILE}'...")
+
+    try:
+        # --- 1. Cargar el archivo ---
+        print(f"Cargando '{INPUT_FILE}'...")
+        df = leer_con_esquema(INPUT_FILE, 'tabla_cp')
+        print(f"  Filas cargadas: {len(df)}")
+        if df.empty:
+            print("El archivo de entrada está vacío. No hay nada que procesar.")
+            exit()
+
+        print("  Columnas cargadas:", df.columns.tolist())
+        print("Primeras filas ANTES de la corrección:")
+        print(df[['nom_prov', 'nom_loca']].head())
+
+        df = corregir(df)
 
-    print("\nPrimeras filas DESPUÉS de la corrección (si hubo cambios):")
-    print(df[['nom_prov', 'nom_loca']].head()) # Mostrar las mismas columnas para comparar
+        print("\nPrimeras filas DESPUÉS de la corrección (si hubo cambios):")
+        print(df[['nom_prov', 'nom_loca']].head()) # Mostrar las mismas columnas para comparar
 
-    # --- 3. Guardar el resultado ---
-    df.to_csv(OUTPUT_FILE, index=False, sep=';', encoding='utf-8')
-    print(f"\n¡Proceso de corrección completado! Archivo guardado en: '{OUTPUT_FILE}'")
-    print(f"Este archivo '{OUTPUT_FILE}' es el que deberías usar para la importación a Django.")
+        # --- 3. Guardar el resultado ---
+        escribir_tabla(df, OUTPUT_FILE)
+        print(f"\n¡Proceso de corrección completado! Archivo guardado en: '{OUTPUT_FILE}'")
+        print(f"Este archivo '{OUTPUT_FILE}' es el que deberías usar para la importación a Django.")
 
-except FileNotFoundError:
-    print(f"ERROR CRÍTICO: No se encontró el archivo de entrada '{INPUT_FILE}'.")
-    print("Asegúrate de que el archivo exista en la misma carpeta que este script, o ajusta la ruta.")
-except pd.errors.EmptyDataError:
-    print(f"ERROR CRÍTICO: El archivo de entrada '{INPUT_FILE}' está vacío.")
-except KeyError as e:
-    print(f"ERROR CRÍTICO: Una columna esperada ('nom_prov' o 'nom_loca') no se encontró: {e}.")
-except Exception as e:
-    print(f"\nOcurrió un error inesperado durante el proceso: {e}")
-    import traceback
-    traceback.print_exc()
\ No newline at end of file
+    except FileNotFoundError:
+        print(f"ERROR CRÍTICO: No se encontró el archivo de entrada '{INPUT_FILE}'.")
+        print("Asegúrate de que el archivo exista en la misma carpeta que este script, o ajusta la ruta.")
+    except pd.errors.EmptyDataError:
+        print(f"ERROR CRÍTICO: El archivo de entrada '{INPUT_FILE}' está vacío.")
+    except KeyError as e:
+        print(f"ERROR CRÍTICO: Una columna esperada ('nom_prov' o 'nom_loca') no se encontró: {e}.")
+    except Exception as e:
+        print(f"\nOcurrió un error inesperado durante el proceso: {e}")
+        import traceback
+        traceback.print_exc()
@@ -0,0 +1,45 @@
+import argparse
+import csv
+import time
+
+import normalizacion # noqa: F401 (agrega la raíz del repositorio a sys.path)
+from establecimientos.cpa import TABLA_POR_DEFECTO, IndiceCPA
+
+# --- CPA (Código Postal Argentino) desde la línea de comandos ---
+# La decodificación y el índice están en establecimientos/cpa.py (los usa también la app); acá solo la consulta
+# contra la tabla de CP y la medición de velocidad.
+# Uso: python cpa.py B1636AAA [x5000abc ...] [--tabla tabla_final_corregida_n.csv] [--medir]
+
+def main():
+    parser = argparse.ArgumentParser(description="Decodifica CPA y busca sus localidades en la tabla de CP.")
+    parser.add_argument('cpas', nargs='*')
+    parser.add_argument('--tabla', default=TABLA_POR_DEFECTO)
+    parser.add_argument('--medir', action='store_true', help="Resolver todos los CPA de la tabla y medir la velocidad.")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    indice = IndiceCPA.desde_tabla_cp(args.tabla)
+    print(f"Índice armado desde '{args.tabla}' en {(time.perf_counter() - inicio) * 1000:.0f} ms "
+          f"({len(indice)} CPA, {len(indice.por_cp)} pares provincia-CP, {len(indice.nombres)} localidades)")
+
+    for texto in args.cpas:
+        resolucion = indice.resolver(texto)
+        if resolucion is None:
+            print(f"\n{texto}: no es un CPA válido")
+            continue
+        cpa = resolucion.cpa
+        origen = "CPA conocido" if resolucion.exacto else "CPA no figura en la tabla; localidades con ese CP"
+        print(f"\n{texto} -> {cpa.codigo}: provincia {cpa.provincia}, CP {cpa.cp}, manzana {cpa.sufijo}")
+        print(f"  {origen}: " + (", ".join(f"{indice.nombres.get(i, i)} ({i})" for i in resolucion.localidades[:10]) or "ninguna"))
+
+    if args.medir:
+        with open(args.tabla, newline='', encoding='utf-8') as f:
+            textos = [fila['cpa'] for fila in csv.DictReader(f, delimiter=';')]
+        inicio = time.perf_counter()
+        resoluciones = indice.resolver_lote(textos)
+        segundos = time.perf_counter() - inicio
+        validos = sum(r is not None for r in resoluciones)
+        print(f"\n{len(textos)} CPA resueltos en {segundos * 1000:.0f} ms ({len(textos) / segundos:,.0f} por segundo; {validos} válidos)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import asyncio
+import os
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+import scraping_codigos_postales_v2 as scraper
+from metricas_crawler import METRICAS, estado_de_error
+
+# --- Modo async del scraper v2 ---
+# Mismo recorrido que scraping_codigos_postales_v2.main() (provincias -> localidades -> tabla de CP),
+# pero con varias peticiones en vuelo a la vez sobre un pool de conexiones keep-alive.
+# En lugar de las pausas fijas (SLEEP_TIME_PROV / SLEEP_TIME_LOC) se usa un token bucket por host,
+# así que el sitio nunca recibe más de 'rps' peticiones por segundo.
+# Uso: python scraping_codigos_postales_v2.py --modo async --concurrencia 8 --rps 4
+
+# --- Rate limit por host ---
+class TokenBucket:
+    """Token bucket simple: 'tasa' tokens por segundo, hasta 'capacidad' acumulados."""
+
+    def __init__(self, tasa, capacidad=None):
+        self.tasa = tasa
+        self.capacidad = capacidad if capacidad is not None else max(1.0, tasa)
+        self.tokens = self.capacidad
+        self.ultima_recarga = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def adquirir(self):
+        async with self._lock: # Un solo pedido a la vez calcula la espera, así el orden es justo
+            while True:
+                ahora = time.monotonic()
+                self.tokens = min(self.capacidad, self.tokens + (ahora - self.ultima_recarga) * self.tasa)
+                self.ultima_recarga = ahora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                espera = (1 - self.tokens) / self.tasa
+                await asyncio.sleep(espera)
+                METRICAS.registrar_pausa('rate_limit', espera)
+
+class LimitadorPorHost:
+    def __init__(self, tasa):
+        self.tasa = tasa
+        self.buckets = {}
+
+    async def esperar_turno(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.tasa)
+        await self.buckets[host].adquirir()
+
+class CrawlerAsync:
+    def __init__(self, session, concurrencia, rps):
+        self.session = session
+        self.semaforo = asyncio.Semaphore(concurrencia)
+        self.limitador = LimitadorPorHost(rps)
+
+    # --- Equivalente async de make_request (devuelve el HTML o None) ---
+    async def make_request(self, url, current_retry=0):
+        print(f"    Intentando acceder (intento {current_retry + 1}/{scraper.MAX_RETRIES}): {url}")
+        cache = scraper.CACHE
+        try:
+            async with self.semaforo:
+                await self.limitador.esperar_turno(url)
+                headers = cache.encabezados_condicionales(url) if cache else None
+                inicio_peticion = time.monotonic()
+                async with self.session.get(url, headers=headers) as response:
+                    cuerpo = await response.read()
+                    METRICAS.registrar_peticion(time.monotonic() - inicio_peticion, response.status, len(cuerpo))
+                    if response.status == 304 and cache:
+                        cache.marcar_revalidada(url)
+                        METRICAS.registrar_pagina_desde_cache()
+                        return cache.leer(url)
+                    response.raise_for_status()
+                    texto = await response.text()
+                    if cache:
+                        cache.guardar(url, texto, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+                    return texto
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"    ERROR en intento {current_retry + 1} para {url}: {e!r}")
+            if current_retry < scraper.MAX_RETRIES - 1:
+                METRICAS.registrar_reintento(estado_de_error(e))
+                retry_delay = 5 * (current_retry + 1)
+                print(f"    Reintentando en {retry_delay} segundos...")
+                await asyncio.sleep(retry_delay) # Fuera del semáforo: no bloquea a las demás peticiones
+                METRICAS.registrar_pausa('backoff_reintento', retry_delay)
+                return await self.make_request(url, current_retry + 1)
+            else:
+                METRICAS.registrar_fallo(estado_de_error(e))
+                print(f"    Todos los {scraper.MAX_RETRIES} intentos fallaron para {url}.")
+                return None
+
+    @METRICAS.cronometrar('obtener_provincias')
+    async def obtener_provincias(self):
+        url = f"{scraper.BASE_URL}/argentina/"
+        print(f"\nObteniendo lista de provincias desde: {url}")
+        html = await self.make_request(url)
+        if not html:
+            return []
+        scraper.archivar_pagina(url, 'provincias', html)
+        return scraper.parsear_provincias(html)
+
+    @METRICAS.cronometrar('obtener_localidades')
+    async def obtener_localidades(self, provincia_url, provincia_nombre):
+        print(f"  Obteniendo links de localidad para {provincia_nombre} desde: {provincia_url}")
+        html = await self.make_request(provincia_url)
+        if not html:
+            return []
+        scraper.archivar_pagina(provincia_url, 'provincia', html, provincia_nombre)
+        return scraper.parsear_localidades(html, provincia_nombre)
+
+    @METRICAS.cronometrar('obtener_cp_y_cpa_de_tabla')
+    async def obtener_cp_y_cpa_de_tabla(self, localidad_url_navegada, nombre_provincia_navegada, nombre_localidad_navegada):
+        filas_de_tabla = scraper.filas_retomadas_del_journal(localidad_url_navegada)
+        if filas_de_tabla is not None:
+            return filas_de_tabla
+        print(f"    Obteniendo CP/CPA para '{nombre_localidad_navegada}' ({nombre_provincia_navegada}) desde: {localidad_url_navegada}")
+        html = await self.make_request(localidad_url_navegada)
+        if not html:
+            print(f"      No se pudo obtener la página de CP para {localidad_url_navegada} después de reintentos.")
+            return None
+        scraper.archivar_pagina(localidad_url_navegada, 'localidad', html, nombre_provincia_navegada, nombre_localidad_navegada)
+        if scraper.SOLO_DESCARGAR:
+            return [] # Se parsea después, desde el archivo de páginas
+        filas_de_tabla = scraper.parsear_cp_y_cpa_de_tabla(html, localidad_url_navegada)
+        # Se registra apenas se descarga, sin esperar a que se guarde la provincia
+        scraper.registrar_en_journal(localidad_url_navegada, nombre_provincia_navegada, nombre_localidad_navegada, filas_de_tabla)
+        return filas_de_tabla
+
+    async def descargar_provincia(self, provincia_nombre, provincia_url):
+        """Devuelve [(localidad_nav_nombre, localidad_nav_url, filas_de_tabla), ...] en el orden de la página de provincia."""
+        localidades_nav = await self.obtener_localidades(provincia_url, provincia_nombre)
+        tablas = await asyncio.gather(*[
+            self.obtener_cp_y_cpa_de_tabla(localidad_nav_url, provincia_nombre, localidad_nav_nombre)
+            for localidad_nav_nombre, localidad_nav_url in localidades_nav
+        ])
+        return [(nombre, url, filas) for (nombre, url), filas in zip(localidades_nav, tablas)]
+
+def crear_sesion(concurrencia):
+    timeout = aiohttp.ClientTimeout(total=scraper.REQUEST_TIMEOUT)
+    # Pool de conexiones keep-alive: como mucho 'concurrencia' sockets abiertos contra el sitio
+    connector = aiohttp.TCPConnector(limit=concurrencia, limit_per_host=concurrencia, keepalive_timeout=60)
+    return aiohttp.ClientSession(headers=scraper.HEADERS, timeout=timeout, connector=connector)
+
+async def crawl(concurrencia, rps):
+    if not os.path.exists(scraper.OUTPUT_DIRECTORY):
+        os.makedirs(scraper.OUTPUT_DIRECTORY)
+        print(f"Directorio de salida creado: {scraper.OUTPUT_DIRECTORY}")
+
+    async with crear_sesion(concurrencia) as session:
+        crawler = CrawlerAsync(session, concurrencia, rps)
+
+        provincias = await crawler.obtener_provincias()
+        print(f"\nTotal de provincias para chequear/procesar: {len(provincias)}")
+        if not provincias:
+            print("No se pudieron obtener las provincias. Terminando script.")
+            return
+
+        pendientes = []
+        for provincia_nombre, provincia_url in provincias:
+            ruta_archivo_provincia = scraper.ruta_csv_provincia(provincia_nombre)
+            if os.path.exists(ruta_archivo_provincia):
+                print(f"\nArchivo {ruta_archivo_provincia} ya existe. Saltando provincia: {provincia_nombre}.")
+                continue
+            tarea = asyncio.ensure_future(crawler.descargar_provincia(provincia_nombre, provincia_url))
+            pendientes.append((provincia_nombre, ruta_archivo_provincia, tarea))
+
+        # Las provincias se descargan en paralelo, pero se deduplican y guardan en el orden original,
+        # así el contenido de cada CSV es el mismo que produce el modo secuencial.
+        seen_data_tuples_this_run = set()
+        for provincia_nombre, ruta_archivo_provincia, tarea in pendientes:
+            resultados = await tarea
+            if scraper.SOLO_DESCARGAR:
+                print(f"  Páginas de {provincia_nombre} archivadas (los CSV se generan con parsear_archivo_paginas.py).")
+                continue
+            datos_para_esta_provincia = []
+            for localidad_nav_nombre, localidad_nav_url, filas_de_tabla in resultados:
+                scraper.emitir_filas_localidad(
+                    localidad_nav_url, filas_de_tabla, provincia_nombre, localidad_nav_nombre,
+                    seen_data_tuples_this_run, datos_para_esta_provincia
+                )
+            if datos_para_esta_provincia:
+                scraper.guardar_csv_provincia(ruta_archivo_provincia, datos_para_esta_provincia)
+                print(f"  Datos de {provincia_nombre} ({len(datos_para_esta_provincia)} filas) guardados en {ruta_archivo_provincia}")
+            else:
+                print(f"  No se guardaron datos para {provincia_nombre} (no se encontró información nueva de CP/CPA o localidades).")
+
+def main_async(args):
+    print(f"Iniciando scraping en modo async (concurrencia={args.concurrencia}, {args.rps} req/s por host)...")
+    scraper.configurar(args)
+    inicio = time.monotonic()
+    asyncio.run(crawl(args.concurrencia, args.rps))
+    print(f"\n--- Scraping async completado en {time.monotonic() - inicio:.1f} s ---")
+    print(f"Los archivos CSV individuales están en la carpeta: {scraper.OUTPUT_DIRECTORY}")
+    if scraper.CACHE:
+        print(scraper.CACHE.resumen())
+    if scraper.JOURNAL:
+        print(scraper.JOURNAL.resumen())
+    scraper.guardar_metricas(args)
@@ -1,10 +1,9 @@
+import numpy as np
 import pandas as pd
-import re
 import os # Necesario para el nuevo script
-from unidecode import unidecode
 
 # --- Configuración de Archivos ---
-SCRAPED_CLEAN_FILE = 'datos_scraped_limpios_corregidos_con_id_cp.csv' 
+SCRAPED_CLEAN_FILE = 'datos_scraped_limpios_corregidos_con_id_cp.csv'
 PROVINCIAS_MASTER_FILE = 'provincias.csv'
 DEPTOS_MASTER_FILE = 'deptos.csv'
 LOCA_MASTER_FILE = 'loca.csv'
@@ -13,146 +12,181 @@ LOCA_MASTER_FILE = 'loca.csv'
 MATCHED_OUTPUT_FILE = 'tabla_final_cruces_exitosos.csv'
 UNMATCHED_OUTPUT_FILE = 'scraped_cp_sin_match_en_maestro.csv'
 
-from unidecode import unidecode # Asegúrate de que esta importación esté al inicio de ambos scripts
-
-def normalize_name(name):
-    if pd.isna(name): 
-        return ""
-    name_str = str(name).lower().strip()
-    # Paso 1: Corregir patrones específicos como 'a+-' a 'ñ'
-    name_str = name_str.replace('a+-', 'ñ') 
-    # Aquí podrías añadir más reemplazos si encuentras otros patrones (ej. para Á, É, etc.)
-    
-    # Paso 2: Eliminar contenido entre paréntesis
-    name_str = re.sub(r'\s*\(.*\)\s*', '', name_str).strip()
-    
-    # Paso 3: Aplicar unidecode para quitar tildes estándar (ñ -> n, á -> a, etc.)
-    name_str = unidecode(name_str) 
-    
-    # Paso 4: Normalizar múltiples espacios
-    name_str = re.sub(r'\s+', ' ', name_str).strip()
-    return name_str
-
-print("Iniciando el proceso de cruce final con datos maestros (v3, salidas separadas)...")
-
-try:
-    print(f"\nCargando datos scrapeados y limpios: '{SCRAPED_CLEAN_FILE}'...")
-    df_scraped = pd.read_csv(SCRAPED_CLEAN_FILE, delimiter=';', dtype=str, encoding='utf-8')
-    print(f"  Filas cargadas de datos scrapeados: {len(df_scraped)}")
-    if df_scraped.empty:
-        print("El archivo de datos scrapeados y limpios está vacío.")
-        exit()
-    # Se espera que df_scraped tenga: 'nom_prov', 'nom_loca', 'cp', 'cpa' (y 'id_cp_fuente' si se incluyó)
-    # Renombramos las columnas de df_scraped que se usarán para el cruce para evitar sufijos de Pandas
-    df_scraped.rename(columns={'nom_prov': 'scraped_nom_prov_norm', 
-                               'nom_loca': 'scraped_nom_loca_norm'}, inplace=True)
-
-    print(f"\nCargando archivo maestro de provincias: '{PROVINCIAS_MASTER_FILE}'...")
-    df_provincias_master = pd.read_csv(PROVINCIAS_MASTER_FILE, delimiter=',', header=0, dtype=str)
+# --- Normalización de nombres (compartida con los demás scripts, ver normalizacion.py) ---
+from normalizacion import normalizar_serie
+# Tipos de cada tabla maestra (IDs enteros compactos, nombres categóricos), ver esquemas.py
+from esquemas import ESQUEMAS, leer_con_esquema
+# Maestro P-D-L precompilado (python gazetteer.py compilar), ver gazetteer.py
+import gazetteer
+from formato_columnar import con_extension, escribir_tabla, formato_de_linea_de_comandos, leer_tabla
+
+def maestro_pdl_desde_gazetteer(gaz):
+    """El mismo DataFrame que arma cargar_maestro_pdl() desde los CSV, leído de los arreglos del gazetteer."""
+    loca_depto = np.frombuffer(gaz.arreglo('loca_depto'), dtype=np.int32)
+    loca_prov = np.frombuffer(gaz.arreglo('depto_prov'), dtype=np.int32)[loca_depto]
+    por_localidad = {'prov': loca_prov, 'depto': loca_depto, 'loca': slice(None)}
+
+    def ids(nivel, tabla, columna):
+        valores = np.frombuffer(gaz.arreglo(f'{nivel}_id'), dtype=np.int32)[por_localidad[nivel]].copy() # No depender del mmap
+        return pd.array(valores, dtype=ESQUEMAS[tabla]['columnas'][columna])
+
+    def textos(columna, nivel):
+        return np.array(gaz.textos(columna), dtype=object)[por_localidad[nivel]]
+
+    return pd.DataFrame({
+        'master_id_prov': ids('prov', 'provincias', 'id_prov'),
+        'master_nom_prov': pd.Categorical(textos('prov_nombre', 'prov')),
+        'master_nom_prov_norm': textos('prov_norm', 'prov'),
+        'master_id_depto': ids('depto', 'deptos', 'id_depto'),
+        'master_nom_depto': pd.Categorical(textos('depto_nombre', 'depto')),
+        'master_id_loca': ids('loca', 'loca', 'id_loca'),
+        'master_nom_loca': pd.Categorical(textos('loca_nombre', 'loca')),
+        'master_nom_loca_norm': textos('loca_norm', 'loca'),
+    })
+
+def cargar_maestro_pdl(provincias_file=PROVINCIAS_MASTER_FILE, deptos_file=DEPTOS_MASTER_FILE, loca_file=LOCA_MASTER_FILE,
+                       gazetteer_file=gazetteer.ARCHIVO_GAZETTEER):
+    """
+    Une provincias, departamentos y localidades maestros en un solo DataFrame P-D-L con nombres normalizados.
+    Si el gazetteer compilado existe y corresponde a estos mismos CSV, se lee de ahí (sin merges ni normalización).
+    """
+    gaz = gazetteer.abrir_si_vigente(gazetteer_file, [provincias_file, deptos_file, loca_file]) if gazetteer_file else None
+    if gaz is not None:
+        print(f"\nCargando maestro P-D-L desde el gazetteer compilado '{gazetteer_file}'...")
+        df_master_pdl = maestro_pdl_desde_gazetteer(gaz)
+        print(f"  DataFrame maestro P-D-L cargado. Filas: {len(df_master_pdl)}")
+        return df_master_pdl
+
+    print(f"\nCargando archivo maestro de provincias: '{provincias_file}'...")
+    df_provincias_master = leer_con_esquema(provincias_file, 'provincias')
     df_provincias_master.rename(columns={'id_prov': 'master_id_prov', 'nom_prov': 'master_nom_prov'}, inplace=True)
-    df_provincias_master['master_id_prov'] = pd.to_numeric(df_provincias_master['master_id_prov'], errors='coerce').astype('Int64')
-    df_provincias_master['master_nom_prov_norm'] = df_provincias_master['master_nom_prov'].apply(normalize_name)
+    df_provincias_master['master_nom_prov_norm'] = normalizar_serie(df_provincias_master['master_nom_prov'])
     df_provincias_master.dropna(subset=['master_id_prov', 'master_nom_prov_norm'], inplace=True)
 
-    print(f"\nCargando archivo maestro de departamentos: '{DEPTOS_MASTER_FILE}'...")
-    df_deptos_master = pd.read_csv(DEPTOS_MASTER_FILE, delimiter=',', header=0, dtype=str)
+    print(f"\nCargando archivo maestro de departamentos: '{deptos_file}'...")
+    df_deptos_master = leer_con_esquema(deptos_file, 'deptos')
     df_deptos_master.rename(columns={'id_depto': 'master_id_depto', 'id_prov': 'master_id_prov', 'nom_depto': 'master_nom_depto'}, inplace=True)
-    df_deptos_master['master_id_depto'] = pd.to_numeric(df_deptos_master['master_id_depto'], errors='coerce').astype('Int64')
-    df_deptos_master['master_id_prov'] = pd.to_numeric(df_deptos_master['master_id_prov'], errors='coerce').astype('Int64')
     df_deptos_master.dropna(subset=['master_id_depto', 'master_id_prov'], inplace=True)
 
-    print(f"\nCargando archivo maestro de localidades: '{LOCA_MASTER_FILE}'...")
-    df_loca_master = pd.read_csv(LOCA_MASTER_FILE, delimiter=',', header=0, dtype=str)
-    df_loca_master = df_loca_master[['id_loca', 'id_depto', 'nom_loca']]
+    print(f"\nCargando archivo maestro de localidades: '{loca_file}'...")
+    df_loca_master = leer_con_esquema(loca_file, 'loca', usecols=['id_loca', 'id_depto', 'nom_loca'])
     df_loca_master.rename(columns={'id_loca': 'master_id_loca', 'id_depto': 'master_id_depto', 'nom_loca': 'master_nom_loca'}, inplace=True)
-    df_loca_master['master_id_loca'] = pd.to_numeric(df_loca_master['master_id_loca'], errors='coerce').astype('Int64')
-    df_loca_master['master_id_depto'] = pd.to_numeric(df_loca_master['master_id_depto'], errors='coerce').astype('Int64')
-    df_loca_master['master_nom_loca_norm'] = df_loca_master['master_nom_loca'].apply(normalize_name)
+    df_loca_master['master_nom_loca_norm'] = normalizar_serie(df_loca_master['master_nom_loca'])
     df_loca_master.dropna(subset=['master_id_loca', 'master_id_depto', 'master_nom_loca_norm'], inplace=True)
 
     print("\nConstruyendo DataFrame maestro P-D-L...")
     df_master_pd = pd.merge(df_provincias_master, df_deptos_master, on='master_id_prov', how='inner')
     df_master_pdl = pd.merge(df_master_pd, df_loca_master, on='master_id_depto', how='inner')
     print(f"  DataFrame maestro P-D-L construido. Filas: {len(df_master_pdl)}")
-    
+    return df_master_pdl
+
+def cruzar(df_scraped, df_master_pdl):
+    """Devuelve (cruces exitosos, scrapeados sin match); cualquiera de los dos es None si no tiene filas."""
+    # Se espera que df_scraped tenga: 'nom_prov', 'nom_loca', 'cp', 'cpa' (y 'id_cp_fuente' si se incluyó)
+    # El merge se hace solo con las claves y la posición de cada fila (no con todas las columnas de las dos tablas) y
+    # las columnas de salida se toman una sola vez por posición: el pico de memoria del cruce es mucho menor.
     print("\nCruzando datos scrapeados limpios con el DataFrame maestro P-D-L...")
-    # indicator=True nos dirá qué filas tuvieron match
-    df_merged_all = pd.merge(
-        df_scraped,
-        df_master_pdl,
-        left_on=['scraped_nom_prov_norm', 'scraped_nom_loca_norm'],
-        right_on=['master_nom_prov_norm', 'master_nom_loca_norm'],
-        how='left', # Mantener todos los datos scrapeados
-        indicator=True # Añade una columna '_merge' que indica si el match fue 'left_only', 'right_only', or 'both'
-    )
-    print(f"  Filas totales después del cruce (antes de separar): {len(df_merged_all)}")
+    claves_scraped = pd.DataFrame({'prov': df_scraped['nom_prov'].to_numpy(), 'loca': df_scraped['nom_loca'].to_numpy(),
+                                   'fila_scraped': np.arange(len(df_scraped))})
+    claves_maestro = pd.DataFrame({'prov': df_master_pdl['master_nom_prov_norm'].to_numpy(),
+                                   'loca': df_master_pdl['master_nom_loca_norm'].to_numpy(),
+                                   'fila_maestro': np.arange(len(df_master_pdl))})
+    # how='left' mantiene todos los datos scrapeados (y su orden); una fila puede cruzar con varias localidades
+    pares = pd.merge(claves_scraped, claves_maestro, on=['prov', 'loca'], how='left')
+    del claves_scraped, claves_maestro
+    print(f"  Filas totales después del cruce (antes de separar): {len(pares)}")
 
     # --- Separar Matched y Unmatched ---
-    df_matched = df_merged_all[df_merged_all['_merge'] == 'both'].copy()
-    df_unmatched = df_merged_all[df_merged_all['_merge'] == 'left_only'].copy()
-    
-    print(f"\nFilas con match encontradas: {len(df_matched)}")
-    print(f"Filas sin match (solo en datos scrapeados): {len(df_unmatched)}")
-
-    # --- Procesar y Guardar Filas CON MATCH ---
-    if not df_matched.empty:
-        df_output_matched = pd.DataFrame()
-        df_output_matched['id_prov'] = df_matched['master_id_prov']
-        df_output_matched['nom_prov'] = df_matched['master_nom_prov']
-        df_output_matched['id_depto'] = df_matched['master_id_depto']
-        df_output_matched['nom_depto'] = df_matched['master_nom_depto']
-        df_output_matched['id_loca'] = df_matched['master_id_loca']
-        df_output_matched['nom_loca'] = df_matched['master_nom_loca']
-        df_output_matched['cp'] = df_matched['cp']
-        df_output_matched['cpa'] = df_matched['cpa']
-        if 'id_cp_fuente' in df_matched.columns:
-             df_output_matched['id_cp_fuente'] = df_matched['id_cp_fuente']
+    con_match = pares['fila_maestro'].notna().to_numpy()
+    filas_scraped = pares['fila_scraped'].to_numpy()
+    filas_maestro = pares['fila_maestro'].to_numpy()[con_match].astype(np.intp)
+    indice_matched, indice_unmatched = np.flatnonzero(con_match), np.flatnonzero(~con_match)
+    filas_matched, filas_unmatched = filas_scraped[con_match], filas_scraped[~con_match]
+    del pares
+
+    print(f"\nFilas con match encontradas: {len(filas_matched)}")
+    print(f"Filas sin match (solo en datos scrapeados): {len(filas_unmatched)}")
+
+    def columna(df, nombre, filas, indice):
+        """La columna 'nombre' de df en esas posiciones (conserva el tipo: enteros, categóricas), con el índice del cruce."""
+        return pd.Series(df[nombre].array.take(filas), index=indice)
+
+    # --- Procesar Filas CON MATCH ---
+    df_output_matched = None
+    if len(filas_matched):
+        df_output_matched = pd.DataFrame({
+            'id_prov': columna(df_master_pdl, 'master_id_prov', filas_maestro, indice_matched),
+            'nom_prov': columna(df_master_pdl, 'master_nom_prov', filas_maestro, indice_matched),
+            'id_depto': columna(df_master_pdl, 'master_id_depto', filas_maestro, indice_matched),
+            'nom_depto': columna(df_master_pdl, 'master_nom_depto', filas_maestro, indice_matched),
+            'id_loca': columna(df_master_pdl, 'master_id_loca', filas_maestro, indice_matched),
+            'nom_loca': columna(df_master_pdl, 'master_nom_loca', filas_maestro, indice_matched),
+            'cp': columna(df_scraped, 'cp', filas_matched, indice_matched),
+            'cpa': columna(df_scraped, 'cpa', filas_matched, indice_matched),
+        })
+        if 'id_cp_fuente' in df_scraped.columns:
+            df_output_matched['id_cp_fuente'] = columna(df_scraped, 'id_cp_fuente', filas_matched, indice_matched)
 
         print(f"\nPrevisualización del archivo de cruces exitosos (primeras 5 filas):")
         print(df_output_matched.head())
-        df_output_matched.to_csv(MATCHED_OUTPUT_FILE, index=False, sep=';', encoding='utf-8')
-        print(f"  Archivo de cruces exitosos guardado en: '{MATCHED_OUTPUT_FILE}'")
-        print(f"  Columnas: {df_output_matched.columns.tolist()}")
-    else:
-        print("No se encontraron cruces exitosos para guardar.")
-
-    # --- Procesar y Guardar Filas SIN MATCH ---
-    if not df_unmatched.empty:
-        # Para las no coincidentes, queremos las columnas scrapeadas originales (ya renombradas con _scraped_norm)
-        # y su cp/cpa.
-        cols_for_unmatched_output = ['scraped_nom_prov_norm', 'scraped_nom_loca_norm', 'cp', 'cpa']
-        if 'id_cp_fuente' in df_unmatched.columns: # si esta columna existe en el df_scraped
-            cols_for_unmatched_output.append('id_cp_fuente')
-        
-        # Asegurarse de que las columnas existan antes de seleccionarlas
-        actual_cols_for_unmatched = [col for col in cols_for_unmatched_output if col in df_unmatched.columns]
-        df_output_unmatched = df_unmatched[actual_cols_for_unmatched].copy()
-        
-        # Renombrar para más claridad en el archivo de no-matches
-        df_output_unmatched.rename(columns={
-            'scraped_nom_prov_norm': 'nom_prov_scraped_no_match',
-            'scraped_nom_loca_norm': 'nom_loca_scraped_no_match',
-            # cp y cpa ya tienen nombres simples
-        }, inplace=True)
+
+    # --- Procesar Filas SIN MATCH ---
+    df_output_unmatched = None
+    if len(filas_unmatched):
+        # Para las no coincidentes, las columnas scrapeadas originales (nombres ya normalizados) y su cp/cpa
+        columnas_unmatched = {'nom_prov': 'nom_prov_scraped_no_match', 'nom_loca': 'nom_loca_scraped_no_match',
+                              'cp': 'cp', 'cpa': 'cpa', 'id_cp_fuente': 'id_cp_fuente'}
+        df_output_unmatched = pd.DataFrame({nuevo: columna(df_scraped, col, filas_unmatched, indice_unmatched)
+                                            for col, nuevo in columnas_unmatched.items() if col in df_scraped.columns})
 
         print(f"\nPrevisualización del archivo de CP scrapeados sin match en maestros (primeras 5 filas):")
         print(df_output_unmatched.head())
-        df_output_unmatched.to_csv(UNMATCHED_OUTPUT_FILE, index=False, sep=';', encoding='utf-8')
-        print(f"  Archivo de CP scrapeados sin match guardado en: '{UNMATCHED_OUTPUT_FILE}'")
-        print(f"  Columnas: {df_output_unmatched.columns.tolist()}")
-    else:
-        print("No se encontraron datos scrapeados sin match para guardar.")
-
-    print(f"\n¡Proceso de cruce final completado!")
-
-except FileNotFoundError as e:
-    print(f"\nERROR CRÍTICO: No se encontró el archivo: {e.filename}")
-    print("Asegúrate de que todos los archivos CSV de entrada estén en la misma carpeta que este script, o ajusta las rutas.")
-except pd.errors.EmptyDataError as e:
-    print(f"\nERROR CRÍTICO: Uno de los archivos CSV está vacío o mal formateado: {e}")
-except KeyError as e:
-    print(f"\nERROR CRÍTICO: Una columna esperada no se encontró. Verifica los encabezados de tus CSVs: {e}")
-except Exception as e:
-    print(f"\nOcurrió un error inesperado durante el proceso: {e}")
-    import traceback
-    traceback.print_exc()
\ No newline at end of file
+
+    return df_output_matched, df_output_unmatched
+
+if __name__ == "__main__":
+    formato = formato_de_linea_de_comandos("Cruce de los datos limpios con los maestros de provincias, departamentos y localidades.")
+    SCRAPED_CLEAN_FILE = con_extension(SCRAPED_CLEAN_FILE, formato)
+    MATCHED_OUTPUT_FILE = con_extension(MATCHED_OUTPUT_FILE, formato)
+    print("Iniciando el proceso de cruce final con datos maestros (v3, salidas separadas)...")
+
+    try:
+        print(f"\nCargando datos scrapeados y limpios: '{SCRAPED_CLEAN_FILE}'...")
+        df_scraped = leer_tabla(SCRAPED_CLEAN_FILE)
+        print(f"  Filas cargadas de datos scrapeados: {len(df_scraped)}")
+        if df_scraped.empty:
+            print("El archivo de datos scrapeados y limpios está vacío.")
+            exit()
+
+        df_master_pdl = cargar_maestro_pdl()
+        df_output_matched, df_output_unmatched = cruzar(df_scraped, df_master_pdl)
+
+        # --- Guardar Filas CON MATCH ---
+        if df_output_matched is not None:
+            escribir_tabla(df_output_matched, MATCHED_OUTPUT_FILE)
+            print(f"  Archivo de cruces exitosos guardado en: '{MATCHED_OUTPUT_FILE}'")
+            print(f"  Columnas: {df_output_matched.columns.tolist()}")
+        else:
+            print("No se encontraron cruces exitosos para guardar.")
+
+        # --- Guardar Filas SIN MATCH ---
+        if df_output_unmatched is not None:
+            df_output_unmatched.to_csv(UNMATCHED_OUTPUT_FILE, index=False, sep=';', encoding='utf-8')
+            print(f"  Archivo de CP scrapeados sin match guardado en: '{UNMATCHED_OUTPUT_FILE}'")
+            print(f"  Columnas: {df_output_unmatched.columns.tolist()}")
+        else:
+            print("No se encontraron datos scrapeados sin match para guardar.")
+
+        print(f"\n¡Proceso de cruce final completado!")
+
+    except FileNotFoundError as e:
+        print(f"\nERROR CRÍTICO: No se encontró el archivo: {e.filename}")
+        print("Asegúrate de que todos los archivos CSV de entrada estén en la misma carpeta que este script, o ajusta las rutas.")
+    except pd.errors.EmptyDataError as e:
+        print(f"\nERROR CRÍTICO: Uno de los archivos CSV está vacío o mal formateado: {e}")
+    except KeyError as e:
+        print(f"\nERROR CRÍTICO: Una columna esperada no se encontró. Verifica los encabezados de tus CSVs: {e}")
+    except Exception as e:
+        print(f"\nOcurrió un error inesperado durante el proceso: {e}")
+        import traceback
+        traceback.print_exc()
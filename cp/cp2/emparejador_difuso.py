@@ -0,0 +1,160 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import cruzar_con_maestros_v3
+
+# --- Emparejamiento aproximado de las localidades sin match ---
+# cruzar_con_maestros_v3.py cruza por nombre normalizado exacto; lo que no cruza queda en
+# scraped_cp_sin_match_en_maestro.csv. Acá cada una de esas filas se busca en un índice de trigramas de
+# caracteres de los nombres de localidad maestros (loca.csv), uno por provincia:
+#   - el índice invertido (trigrama -> localidades que lo contienen) da, con un bincount, cuántos trigramas
+#     comparte la consulta con cada candidata; solo se miran las localidades que comparten alguno;
+#   - el puntaje es el coeficiente de Dice entre los conjuntos de trigramas (1.0 = mismo nombre);
+#   - se guardan los TOP_K mejores candidatos de cada fila y se acepta el primero si su puntaje supera
+#     UMBRAL_ACEPTACION y le saca al menos MARGEN_MINIMO al siguiente (si no, queda para revisión manual). Para
+#     decidir se buscan siempre al menos dos candidatos, aunque con --top-k 1 se guarde uno solo.
+# Si la provincia scrapeada no existe en el maestro, se busca en el índice de todo el país.
+# Las filas aceptadas se cruzan con el maestro con cruzar(), así salen con el mismo formato que los cruces exactos.
+# Los tres archivos de salida se escriben siempre (sin filas, solo el encabezado), así no queda el de una corrida anterior.
+# Uso: python emparejador_difuso.py [--umbral 0.8] [--top-k 3]
+
+UNMATCHED_INPUT_FILE = cruzar_con_maestros_v3.UNMATCHED_OUTPUT_FILE
+CANDIDATOS_OUTPUT_FILE = 'scraped_cp_candidatos_difusos.csv'
+ACEPTADOS_OUTPUT_FILE = 'tabla_final_cruces_difusos.csv'
+RESTANTES_OUTPUT_FILE = 'scraped_cp_sin_match_tras_difuso.csv'
+
+TOP_K = 3
+UMBRAL_ACEPTACION = 0.8
+MARGEN_MINIMO = 0.05
+AMBITO_PAIS = '(todo el país)'
+COLUMNAS_CANDIDATOS = ['fila', 'nom_prov', 'nom_loca', 'ambito', 'rango', 'candidato', 'puntaje', 'aceptado']
+COLUMNAS_ACEPTADOS = ['id_prov', 'nom_prov', 'id_depto', 'nom_depto', 'id_loca', 'nom_loca', 'cp', 'cpa'] # Las de cruzar()
+
+def forma_de_busqueda(nombre):
+    """El scraping dejó la ñ como 'a+-' ('caa+-ada'); en el maestro ya es 'n' ('canada')."""
+    return nombre.replace('a+-', 'n')
+
+def trigramas(nombre):
+    relleno = f"  {nombre} " # Los espacios marcan el comienzo y el final de la palabra
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+class IndiceTrigramas:
+    """Índice invertido trigrama -> posiciones de los nombres que lo contienen."""
+
+    def __init__(self, nombres):
+        self.nombres = list(nombres)
+        self.tamanos = np.empty(len(self.nombres), dtype=np.int32)
+        listas = {}
+        for posicion, nombre in enumerate(self.nombres):
+            conjunto = trigramas(nombre)
+            self.tamanos[posicion] = len(conjunto)
+            for trigrama in conjunto:
+                listas.setdefault(trigrama, []).append(posicion)
+        self.listas = {trigrama: np.array(posiciones, dtype=np.int32) for trigrama, posiciones in listas.items()}
+
+    def buscar(self, consulta, k=TOP_K):
+        """Los k nombres más parecidos a 'consulta', como lista de (nombre, puntaje Dice)."""
+        conjunto = trigramas(consulta)
+        listas = [self.listas[t] for t in conjunto if t in self.listas]
+        if not listas:
+            return []
+        comunes = np.bincount(np.concatenate(listas), minlength=len(self.nombres))
+        candidatos = np.flatnonzero(comunes)
+        puntajes = 2 * comunes[candidatos] / (len(conjunto) + self.tamanos[candidatos])
+        mejores = np.argsort(-puntajes, kind='stable')[:k]
+        return [(self.nombres[candidatos[i]], float(puntajes[i])) for i in mejores]
+
+class EmparejadorDifuso:
+    """Un IndiceTrigramas por provincia (nombres normalizados del maestro P-D-L) y uno de todo el país."""
+
+    def __init__(self, df_master_pdl):
+        self.por_provincia = {
+            provincia: IndiceTrigramas(grupo.unique())
+            for provincia, grupo in df_master_pdl.groupby('master_nom_prov_norm', observed=True)['master_nom_loca_norm']
+        }
+        self.pais = IndiceTrigramas(df_master_pdl['master_nom_loca_norm'].unique())
+
+    def candidatos(self, provincia, localidad, k=TOP_K):
+        """(ámbito de búsqueda, [(nombre maestro, puntaje), ...])."""
+        indice = self.por_provincia.get(provincia)
+        if indice is None:
+            return AMBITO_PAIS, self.pais.buscar(forma_de_busqueda(localidad), k)
+        return provincia, indice.buscar(forma_de_busqueda(localidad), k)
+
+def es_aceptable(lista, umbral=UMBRAL_ACEPTACION, margen=MARGEN_MINIMO):
+    """'lista' son al menos los dos mejores candidatos de la búsqueda: si tiene uno solo, no hay otro con quien dudar."""
+    if not lista or lista[0][1] < umbral:
+        return False
+    return len(lista) == 1 or lista[0][1] - lista[1][1] >= margen
+
+def emparejar(df_sin_match, df_master_pdl, umbral=UMBRAL_ACEPTACION, k=TOP_K):
+    """
+    Recibe las filas sin match (columnas nom_prov_scraped_no_match, nom_loca_scraped_no_match, cp, cpa, ...).
+    Devuelve (candidatos: una fila por candidato, cruces aceptados con el formato de cruzar(), filas que siguen sin match).
+    """
+    inicio = time.perf_counter()
+    emparejador = EmparejadorDifuso(df_master_pdl)
+    print(f"  Índices de trigramas armados en {(time.perf_counter() - inicio) * 1000:.0f} ms "
+          f"({len(emparejador.por_provincia)} provincias, {len(emparejador.pais.nombres)} nombres distintos)")
+    filas_candidatos, aceptados = [], []
+    inicio = time.perf_counter()
+    for posicion, (provincia, localidad) in enumerate(zip(df_sin_match['nom_prov_scraped_no_match'].fillna(''),
+                                                           df_sin_match['nom_loca_scraped_no_match'].fillna(''))):
+        # El margen se mide contra el segundo candidato aunque k sea 1
+        ambito, lista = emparejador.candidatos(provincia, localidad, max(k, 2))
+        aceptado = es_aceptable(lista, umbral)
+        for rango, (nombre, puntaje) in enumerate(lista[:k], start=1):
+            filas_candidatos.append({'fila': posicion, 'nom_prov': provincia, 'nom_loca': localidad, 'ambito': ambito,
+                                     'rango': rango, 'candidato': nombre, 'puntaje': round(puntaje, 4),
+                                     'aceptado': aceptado and rango == 1})
+        aceptados.append(lista[0][0] if aceptado else None)
+    segundos = time.perf_counter() - inicio
+    print(f"  {len(df_sin_match)} búsquedas en {segundos * 1000:.0f} ms "
+          f"({segundos * 1000 / max(len(df_sin_match), 1):.2f} ms por fila)")
+
+    df_candidatos = pd.DataFrame(filas_candidatos, columns=COLUMNAS_CANDIDATOS)
+    es_aceptada = pd.Series([nombre is not None for nombre in aceptados], index=df_sin_match.index)
+    df_restantes = df_sin_match[~es_aceptada]
+
+    # Las aceptadas vuelven a cruzar() con el nombre maestro en lugar del scrapeado
+    df_para_cruzar = df_sin_match[es_aceptada].rename(columns={'nom_prov_scraped_no_match': 'nom_prov',
+                                                               'nom_loca_scraped_no_match': 'nom_loca'})
+    df_para_cruzar['nom_loca'] = [nombre for nombre in aceptados if nombre is not None]
+    df_aceptados = None
+    if not df_para_cruzar.empty:
+        df_aceptados, _ = cruzar_con_maestros_v3.cruzar(df_para_cruzar, df_master_pdl)
+    return df_candidatos, df_aceptados, df_restantes
+
+def main():
+    parser = argparse.ArgumentParser(description="Busca por aproximación las localidades scrapeadas que no cruzaron con el maestro.")
+    parser.add_argument('--entrada', default=UNMATCHED_INPUT_FILE)
+    parser.add_argument('--umbral', type=float, default=UMBRAL_ACEPTACION, help="Puntaje mínimo (0-1) para aceptar el mejor candidato.")
+    parser.add_argument('--top-k', type=int, default=TOP_K, help="Candidatos a guardar por fila.")
+    args = parser.parse_args()
+
+    print(f"Cargando filas sin match: '{args.entrada}'...")
+    df_sin_match = pd.read_csv(args.entrada, delimiter=';', dtype=str, encoding='utf-8')
+    print(f"  Filas cargadas: {len(df_sin_match)}")
+    if df_sin_match.empty:
+        print("No hay filas sin match: los archivos de salida quedan solo con el encabezado.")
+        df_candidatos, df_aceptados, df_restantes = pd.DataFrame(columns=COLUMNAS_CANDIDATOS), None, df_sin_match
+    else:
+        df_master_pdl = cruzar_con_maestros_v3.cargar_maestro_pdl()
+        print(f"\nBuscando candidatos (top {args.top_k}, umbral {args.umbral})...")
+        df_candidatos, df_aceptados, df_restantes = emparejar(df_sin_match, df_master_pdl, args.umbral, args.top_k)
+    if df_aceptados is None: # Sin aceptadas, solo el encabezado (y no el archivo de la corrida anterior)
+        df_aceptados = pd.DataFrame(columns=COLUMNAS_ACEPTADOS + [c for c in ['id_cp_fuente'] if c in df_sin_match.columns])
+
+    df_candidatos.to_csv(CANDIDATOS_OUTPUT_FILE, index=False, sep=';', encoding='utf-8')
+    df_restantes.to_csv(RESTANTES_OUTPUT_FILE, index=False, sep=';', encoding='utf-8')
+    df_aceptados.to_csv(ACEPTADOS_OUTPUT_FILE, index=False, sep=';', encoding='utf-8')
+    aceptadas = len(df_sin_match) - len(df_restantes)
+    print(f"\nAceptadas automáticamente: {aceptadas} de {len(df_sin_match)} filas "
+          f"({len(df_aceptados)} filas de cruce en '{ACEPTADOS_OUTPUT_FILE}')")
+    print(f"Siguen sin match: {len(df_restantes)} (en '{RESTANTES_OUTPUT_FILE}'); candidatos para revisar en '{CANDIDATOS_OUTPUT_FILE}'")
+
+if __name__ == "__main__":
+    main()
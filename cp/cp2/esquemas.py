@@ -0,0 +1,134 @@
+import argparse
+import os
+import warnings
+from collections import defaultdict
+
+import pandas as pd
+
+from formato_columnar import como_texto, es_columnar, leer_tabla
+
+# --- Esquemas tipados de las tablas del pipeline de CP ---
+# Antes todo se cargaba con dtype=str (un objeto Python por celda) y los IDs se convertían con
+# pd.to_numeric(...).astype('Int64') y de vuelta con astype(str).replace('nan', '').
+# Acá cada tabla declara el tipo de cada columna una sola vez:
+#   - IDs: enteros nullable del tamaño justo (Int8 para provincias, Int16 para departamentos, Int32 para el resto),
+#     con margen para un padrón nacional 10 veces más grande;
+#   - nombres: categóricas (cada nombre distinto se guarda una vez, las filas guardan un código);
+#   - códigos postales y CPA: texto (no son números: se comparan y se escriben tal cual).
+# Las columnas que no figuran en el esquema se leen como texto.
+# leer_con_esquema() también lee .parquet/.arrow (ver formato_columnar.py), con los mismos tipos.
+# Uso: python esquemas.py  -> compara la memoria de cada tabla con dtype=str y con su esquema
+
+NOMBRE = 'category'
+TEXTO = object
+
+ESQUEMAS = {
+    'provincias': {
+        'separador': ',',
+        'columnas': {'id_prov': 'Int8', 'nom_prov': NOMBRE},
+    },
+    'deptos': {
+        'separador': ',',
+        'columnas': {'id_depto': 'Int16', 'id_prov': 'Int8', 'nom_depto': NOMBRE},
+    },
+    'loca': {
+        'separador': ',',
+        'columnas': {'id_loca': 'Int32', 'id_depto': 'Int16', 'nom_loca': NOMBRE, 'id_cpa': 'Int32', 'id_cp_1974': 'Int32'},
+    },
+    # Fuente de CP de consolidar_todo.py. idProvincia queda como texto: se conserva el valor original para diagnóstico.
+    'localidades': {
+        'separador': ';',
+        'columnas': {'id_cp': 'Int32', 'cp': NOMBRE, 'nom_loca': NOMBRE, 'idProvincia': TEXTO},
+    },
+    # Salida del scraping (combinar_csvs.py)
+    'scraped': {
+        'separador': ';',
+        'columnas': {
+            'Provincia_Navegacion': NOMBRE, 'Localidad_Agrupadora_Link': NOMBRE, 'Provincia_Tabla': NOMBRE,
+            'Localidad_Especifica_Tabla': NOMBRE, 'CP_Tabla': TEXTO, 'CPA_Tabla': TEXTO, 'CodTel_Tabla': TEXTO,
+        },
+    },
+    # Tablas de CP ya cruzadas (tabla_final_cruces_exitosos.csv, deduplicada y corregida)
+    'tabla_cp': {
+        'separador': ';',
+        'columnas': {
+            'id_prov': 'Int8', 'nom_prov': NOMBRE, 'id_depto': 'Int16', 'nom_depto': NOMBRE,
+            'id_loca': 'Int32', 'nom_loca': NOMBRE, 'cp': TEXTO, 'cpa': TEXTO, 'id_cp_fuente': TEXTO,
+        },
+    },
+}
+
+def es_entero(tipo):
+    return isinstance(tipo, str) and tipo.startswith('Int')
+
+def a_entero(serie, tipo):
+    """Texto -> entero nullable; lo que no es número queda como <NA> (como pd.to_numeric(errors='coerce'))."""
+    return pd.to_numeric(serie, errors='coerce').astype(tipo)
+
+def tipar(df, tabla):
+    """Aplica el esquema de 'tabla' a un DataFrame ya cargado (por ejemplo, uno leído con dtype=str)."""
+    columnas = ESQUEMAS[tabla]['columnas']
+    for col, tipo in columnas.items():
+        if col not in df.columns or df[col].dtype == tipo:
+            continue
+        df[col] = a_entero(df[col], tipo) if es_entero(tipo) else df[col].astype(tipo)
+    return df
+
+def leer_con_esquema(ruta, tabla, usecols=None):
+    """
+    Lee un CSV del pipeline (o su versión .parquet/.arrow) directamente con los tipos de su esquema
+    (las demás columnas, como texto).
+    Si alguna columna de ID trae valores no numéricos, se avisa y esos valores quedan como <NA>
+    (lo mismo que hacían los scripts originales con pd.to_numeric(errors='coerce')).
+    """
+    esquema = ESQUEMAS[tabla]
+    if es_columnar(ruta):
+        df = leer_tabla(ruta, como_texto_plano=False)
+        if usecols is not None:
+            df = df[usecols]
+        # Texto como lo daría read_csv(dtype=str) (ej. id_cp_fuente se guarda como entero en el columnar)
+        texto = [col for col in df.columns if esquema['columnas'].get(col, TEXTO) is TEXTO]
+        df[texto] = como_texto(df[texto])
+        return tipar(df, tabla)
+    tipos = defaultdict(lambda: str, {col: (str if tipo is TEXTO else tipo) for col, tipo in esquema['columnas'].items()})
+    try:
+        df = pd.read_csv(ruta, delimiter=esquema['separador'], header=0, dtype=tipos, usecols=usecols, encoding='utf-8')
+    except (ValueError, TypeError):
+        warnings.warn(f"'{ruta}' tiene IDs no numéricos; se leen como texto y se convierten con errors='coerce'.")
+        df = pd.read_csv(ruta, delimiter=esquema['separador'], header=0, dtype=str, usecols=usecols, encoding='utf-8')
+    return tipar(df, tabla)
+
+def memoria_mb(df):
+    """Memoria real del DataFrame (incluye el contenido de los textos, no solo los punteros)."""
+    return df.memory_usage(deep=True).sum() / 1e6
+
+def tabla_de_archivo(ruta):
+    """Adivina el esquema por el nombre del archivo (para el reporte de este módulo)."""
+    nombre = os.path.splitext(os.path.basename(ruta))[0]
+    if nombre in ESQUEMAS:
+        return nombre
+    return 'scraped' if 'scraped' in nombre else 'tabla_cp'
+
+ARCHIVOS_POR_DEFECTO = [
+    'provincias.csv', 'deptos.csv', 'loca.csv', 'localidades.csv',
+    'todos_los_cp_scraped_combinado.csv', 'tabla_final_cruces_exitosos.csv', 'tabla_final_corregida_n.csv',
+]
+
+def main():
+    parser = argparse.ArgumentParser(description="Memoria de cada tabla del pipeline con dtype=str vs. con su esquema.")
+    parser.add_argument('archivos', nargs='*', default=ARCHIVOS_POR_DEFECTO)
+    args = parser.parse_args()
+
+    print(f"{'archivo':<40} {'filas':>8} {'dtype=str':>11} {'esquema':>10} {'ahorro':>7}")
+    for ruta in args.archivos:
+        if not os.path.exists(ruta):
+            print(f"{ruta:<40} (no existe, se omite)")
+            continue
+        tabla = tabla_de_archivo(ruta)
+        df_texto = pd.read_csv(ruta, delimiter=ESQUEMAS[tabla]['separador'], dtype=str, encoding='utf-8')
+        df_tipado = leer_con_esquema(ruta, tabla)
+        antes, despues = memoria_mb(df_texto), memoria_mb(df_tipado)
+        print(f"{ruta:<40} {len(df_tipado):>8} {antes:>9.2f}MB {despues:>8.2f}MB {antes / despues:>6.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# --- Formato columnar para los archivos del pipeline de CP ---
+# Los CSV del pipeline repiten miles de veces los mismos nombres de provincia, departamento y localidad.
+# En Parquet (o Arrow IPC / Feather) se guardan:
+#   - las columnas de IDs como enteros (Int32 nullable), solo si el texto se puede recuperar exacto (sin ceros a la izquierda);
+#   - las demás columnas de texto como categóricas, que pyarrow escribe con codificación de diccionario
+#     (cada nombre distinto se guarda una sola vez).
+# leer_tabla() / escribir_tabla() eligen el formato por la extensión (.csv, .parquet, .arrow/.feather), así el CSV
+# sigue disponible como formato de exportación. Por defecto la lectura devuelve lo mismo que
+# pd.read_csv(dtype=str), para que los scripts existentes no noten la diferencia.
+# Los scripts de cada etapa (limpiar_datos_scraped, cruzar_con_maestros_v3, deduplicar_tabla_final, corregir_n_final)
+# aceptan --formato como pipeline_cp.py: leen la salida de la etapa anterior y escriben la suya en ese formato.
+# Requiere pyarrow (pip install pyarrow) solo para los formatos columnares.
+
+COLUMNAS_ID = ('id_prov', 'id_depto', 'id_loca', 'id_cp', 'id_cp_fuente', 'id_cpa', 'id_cp_1974', 'idProvincia')
+EXTENSIONES_PARQUET = ('.parquet',)
+EXTENSIONES_ARROW = ('.arrow', '.feather')
+COMPRESION = 'zstd'
+FORMATOS = ('csv', 'parquet', 'arrow')
+# Valores que read_csv interpreta como nulos por defecto (documentación de pandas, parámetro na_values)
+VALORES_NA_CSV = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+]
+
+def _verificar_pyarrow():
+    try:
+        import pyarrow # noqa: F401
+    except ImportError:
+        raise ImportError("Los formatos .parquet/.arrow necesitan pyarrow: pip install pyarrow") from None
+
+def extension(ruta):
+    return os.path.splitext(ruta)[1].lower()
+
+def es_columnar(ruta):
+    return extension(ruta) in EXTENSIONES_PARQUET + EXTENSIONES_ARROW
+
+def _entero_si_es_exacto(serie):
+    """La columna como Int32 si cada valor vuelve a dar el mismo texto (ej. '12' sí, '012' o '1.5' no); si no, None."""
+    texto = serie.dropna().astype(str)
+    numeros = pd.to_numeric(texto, errors='coerce')
+    if numeros.isna().any() or (numeros % 1 != 0).any():
+        return None
+    if len(numeros) and numeros.abs().max() >= 2**31:
+        return None
+    if not (numeros.astype('int64').astype(str) == texto).all():
+        return None
+    return pd.to_numeric(serie, errors='coerce').astype('Int32')
+
+def tipar_para_columnar(df):
+    """
+    IDs -> Int32, texto -> categórica (diccionario). El resto de las columnas queda como está.
+    Los textos que read_csv leería como nulos ('nan', '', ...) se guardan como nulos: el archivo columnar se
+    relee igual que el CSV.
+    """
+    columnas = {}
+    for col in df.columns:
+        serie = df[col]
+        if not pd.api.types.is_numeric_dtype(serie):
+            serie = serie.where(~serie.isin(VALORES_NA_CSV))
+        if col in COLUMNAS_ID and not pd.api.types.is_numeric_dtype(serie):
+            entero = _entero_si_es_exacto(serie)
+            if entero is not None:
+                columnas[col] = entero
+                continue
+        if serie.dtype == object:
+            columnas[col] = serie.astype('category')
+        else:
+            columnas[col] = serie
+    return pd.DataFrame(columnas, index=df.index)
+
+def como_texto(df):
+    """Lo mismo que daría pd.read_csv(dtype=str): todas las columnas como texto (object) y los nulos como NaN."""
+    columnas = {}
+    for col in df.columns:
+        serie = df[col]
+        if not pd.api.types.is_object_dtype(serie):
+            serie = serie.astype('string').astype(object)
+        columnas[col] = serie.where(serie.notna(), np.nan)
+    return pd.DataFrame(columnas, index=df.index)
+
+def escribir_tabla(df, ruta, sep=';'):
+    ext = extension(ruta)
+    if ext in EXTENSIONES_PARQUET:
+        _verificar_pyarrow()
+        tipar_para_columnar(df).to_parquet(ruta, engine='pyarrow', compression=COMPRESION, index=False)
+    elif ext in EXTENSIONES_ARROW:
+        _verificar_pyarrow()
+        tipar_para_columnar(df).reset_index(drop=True).to_feather(ruta, compression=COMPRESION)
+    else:
+        df.to_csv(ruta, index=False, sep=sep, encoding='utf-8')
+
+def leer_tabla(ruta, sep=';', como_texto_plano=True):
+    """
+    Lee .csv, .parquet o .arrow/.feather. Con como_texto_plano=True (por defecto) el resultado es igual al de
+    pd.read_csv(ruta, dtype=str); con False se conservan los tipos columnares (Int32, categóricas).
+    """
+    ext = extension(ruta)
+    if ext in EXTENSIONES_PARQUET:
+        _verificar_pyarrow()
+        df = pd.read_parquet(ruta, engine='pyarrow')
+    elif ext in EXTENSIONES_ARROW:
+        _verificar_pyarrow()
+        df = pd.read_feather(ruta)
+    else:
+        return pd.read_csv(ruta, delimiter=sep, dtype=str, encoding='utf-8')
+    return como_texto(df) if como_texto_plano else df
+
+def formato_de_linea_de_comandos(descripcion):
+    """--formato csv|parquet|arrow de los scripts de cada etapa (csv si no se indica)."""
+    parser = argparse.ArgumentParser(description=descripcion)
+    parser.add_argument('--formato', default='csv', choices=FORMATOS,
+                        help="Formato del archivo intermedio que se lee y del que se escribe.")
+    return parser.parse_args().formato
+
+def con_extension(ruta, formato):
+    """'tabla.csv', 'parquet' -> 'tabla.parquet'."""
+    return os.path.splitext(ruta)[0] + '.' + formato
@@ -0,0 +1,51 @@
+import argparse
+import os
+import time
+
+# --- Gazetteer P-D-L precompilado: compilación y consulta desde la línea de comandos ---
+# El formato y la clase Gazetteer están en establecimientos/gazetteer.py (la usa también cargar_ubicaciones) y se
+# importan desde acá, igual que normalize_name (ver normalizacion.py).
+# Uso: python gazetteer.py compilar            -> arma gazetteer_pdl.bin desde provincias.csv, deptos.csv y loca.csv
+#      python gazetteer.py buscar cordoba "villa maria"
+
+import normalizacion # noqa: F401 (agrega la raíz del repositorio a sys.path)
+from establecimientos.gazetteer import ( # noqa: E402,F401
+    ARCHIVO_GAZETTEER, DEPTOS_FILE, LOCA_FILE, PROVINCIAS_FILE, Departamento, Gazetteer, Localidad, Provincia,
+    abrir_si_vigente, compilar, fuentes_por_defecto, hash_de_archivo, hash_de_normalizacion,
+)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compila o consulta el gazetteer P-D-L binario.")
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+    p_compilar = subcomandos.add_parser('compilar', help="Arma el archivo desde provincias.csv, deptos.csv y loca.csv.")
+    p_compilar.add_argument('--provincias', default=PROVINCIAS_FILE)
+    p_compilar.add_argument('--deptos', default=DEPTOS_FILE)
+    p_compilar.add_argument('--loca', default=LOCA_FILE)
+    p_compilar.add_argument('--salida', default=ARCHIVO_GAZETTEER)
+    p_buscar = subcomandos.add_parser('buscar', help="Resuelve una localidad por provincia y nombre.")
+    p_buscar.add_argument('provincia')
+    p_buscar.add_argument('localidad')
+    p_buscar.add_argument('--archivo', default=ARCHIVO_GAZETTEER)
+    args = parser.parse_args()
+
+    if args.comando == 'compilar':
+        inicio = time.perf_counter()
+        n_prov, n_depto, n_loca = compilar(args.provincias, args.deptos, args.loca, args.salida)
+        print(f"Gazetteer compilado en {time.perf_counter() - inicio:.2f} s: {n_prov} provincias, {n_depto} departamentos, "
+              f"{n_loca} localidades -> '{args.salida}' ({os.path.getsize(args.salida) / 1e6:.2f} MB)")
+        return
+
+    inicio = time.perf_counter()
+    gazetteer = Gazetteer(args.archivo)
+    abierto = time.perf_counter()
+    resultados = gazetteer.localidades(args.provincia, args.localidad)
+    fin = time.perf_counter()
+    print(f"Apertura: {(abierto - inicio) * 1000:.2f} ms | búsqueda: {(fin - abierto) * 1000:.3f} ms")
+    for localidad in resultados:
+        departamento = gazetteer.departamento_por_id(localidad.id_depto)
+        print(f"  id_loca={localidad.id} '{localidad.nombre}' | depto {departamento.id} '{departamento.nombre}' | prov {localidad.id_prov}")
+    if not resultados:
+        print("  Sin resultados.")
+
+if __name__ == "__main__":
+    main()
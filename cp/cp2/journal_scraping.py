@@ -0,0 +1,103 @@
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+
+# --- Journal del scraper v2 (para retomar exactamente donde se cortó) ---
+# Tablas (solo se insertan filas, nunca se modifican):
+#   paginas_localidad: cada página de localidad descargada y parseada, con sus filas crudas de tabla.
+#                      Si el script se corta, al reiniciar esas URLs no se vuelven a pedir.
+#   filas_emitidas:    las filas que esa página aportó al CSV de su provincia después de deduplicar.
+#   vistos:            índice persistente de (prov_tabla, loc_tabla, cp_tabla, cpa_tabla) ya emitidos;
+#                      reemplaza a 'seen_data_tuples_this_run', que se perdía en cada reinicio.
+# La deduplicación de una página y el registro de sus filas emitidas van en la misma transacción,
+# así un corte en el medio nunca deja una tupla marcada como vista sin su fila en el journal.
+# Para forzar una descarga completa desde cero, borrar el archivo del journal.
+
+ARCHIVO_JOURNAL = "journal_scraping.sqlite"
+
+class VistosPersistentes:
+    """Conjunto de tuplas (prov, loc, cp, cpa) guardado en SQLite; soporta 'in' y add() como un set."""
+
+    def __init__(self, conexion):
+        self.conexion = conexion
+
+    def __contains__(self, tupla):
+        return self.conexion.execute(
+            "SELECT 1 FROM vistos WHERE prov_tabla = ? AND loc_tabla = ? AND cp_tabla = ? AND cpa_tabla = ?", tupla
+        ).fetchone() is not None
+
+    def add(self, tupla):
+        self.conexion.execute(
+            "INSERT OR IGNORE INTO vistos (prov_tabla, loc_tabla, cp_tabla, cpa_tabla) VALUES (?, ?, ?, ?)", tupla
+        )
+
+    def __len__(self):
+        return self.conexion.execute("SELECT COUNT(*) FROM vistos").fetchone()[0]
+
+class JournalScraping:
+    def __init__(self, ruta=ARCHIVO_JOURNAL):
+        self.ruta = ruta
+        # isolation_level=None: las transacciones se manejan a mano con BEGIN/COMMIT
+        self.conexion = sqlite3.connect(ruta, isolation_level=None)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.executescript("""
+            CREATE TABLE IF NOT EXISTS paginas_localidad (
+                url TEXT PRIMARY KEY,
+                provincia_nav TEXT NOT NULL,
+                localidad_nav TEXT NOT NULL,
+                filas TEXT NOT NULL,
+                fecha REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS filas_emitidas (
+                url TEXT PRIMARY KEY,
+                filas TEXT NOT NULL,
+                fecha REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS vistos (
+                prov_tabla TEXT NOT NULL,
+                loc_tabla TEXT NOT NULL,
+                cp_tabla TEXT NOT NULL,
+                cpa_tabla TEXT NOT NULL,
+                PRIMARY KEY (prov_tabla, loc_tabla, cp_tabla, cpa_tabla)
+            ) WITHOUT ROWID;
+        """)
+        self.vistos = VistosPersistentes(self.conexion)
+
+    @contextmanager
+    def transaccion(self):
+        self.conexion.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self.conexion.execute("ROLLBACK")
+            raise
+        self.conexion.execute("COMMIT")
+
+    def filas_crudas(self, url):
+        """Filas de tabla ya descargadas para la URL, o None si la página todavía no se procesó."""
+        fila = self.conexion.execute("SELECT filas FROM paginas_localidad WHERE url = ?", (url,)).fetchone()
+        return [tuple(f) for f in json.loads(fila[0])] if fila else None
+
+    def registrar_pagina(self, url, provincia_nav, localidad_nav, filas_de_tabla):
+        self.conexion.execute(
+            "INSERT OR IGNORE INTO paginas_localidad (url, provincia_nav, localidad_nav, filas, fecha) VALUES (?, ?, ?, ?, ?)",
+            (url, provincia_nav, localidad_nav, json.dumps(filas_de_tabla, ensure_ascii=False), time.time())
+        )
+
+    def filas_emitidas(self, url):
+        fila = self.conexion.execute("SELECT filas FROM filas_emitidas WHERE url = ?", (url,)).fetchone()
+        return json.loads(fila[0]) if fila else None
+
+    def guardar_emitidas(self, url, filas):
+        self.conexion.execute(
+            "INSERT INTO filas_emitidas (url, filas, fecha) VALUES (?, ?, ?)",
+            (url, json.dumps(filas, ensure_ascii=False), time.time())
+        )
+
+    def resumen(self):
+        paginas = self.conexion.execute("SELECT COUNT(*) FROM paginas_localidad").fetchone()[0]
+        return f"Journal: {paginas} páginas de localidad registradas, {len(self.vistos)} tuplas (P,L,CP,CPA) únicas vistas"
+
+    def cerrar(self):
+        self.conexion.close()
@@ -0,0 +1,171 @@
+import functools
+import inspect
+import json
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# --- Métricas del scraper de códigos postales ---
+# Reemplaza a los print como única telemetría: histograma de latencia por petición, bytes descargados,
+# peticiones / reintentos / fallos por estado HTTP, tiempo en pausas (sleeps fijos, backoff y rate limit),
+# páginas por segundo y tiempo acumulado en cada función del scraper.
+# Al final de la corrida se escribe un resumen JSON y, opcionalmente, el formato de texto de Prometheus.
+
+# Límites superiores (en segundos) de los buckets del histograma de latencia
+LIMITES_LATENCIA = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+
+def estado_de_error(error):
+    """Código HTTP si el error lo tiene; si no, el nombre de la excepción (Timeout, ConnectionError...)."""
+    respuesta = getattr(error, 'response', None)
+    codigo = getattr(respuesta, 'status_code', None) or getattr(error, 'status', None)
+    return str(codigo) if codigo else type(error).__name__
+
+class MetricasCrawler:
+    def __init__(self):
+        self.inicio = time.monotonic()
+        self.buckets_latencia = [0] * (len(LIMITES_LATENCIA) + 1) # El último es +Inf
+        self.suma_latencia = 0.0
+        self.peticiones_por_estado = Counter()
+        self.reintentos_por_estado = Counter()
+        self.fallos_por_estado = Counter()
+        self.bytes_descargados = 0
+        self.paginas_desde_cache = 0
+        self.segundos_en_pausas = defaultdict(float)
+        self.segundos_por_etapa = defaultdict(float)
+        self.llamadas_por_etapa = Counter()
+
+    # --- Registro ---
+    def registrar_peticion(self, latencia, estado, cantidad_bytes=0):
+        for i, limite in enumerate(LIMITES_LATENCIA):
+            if latencia <= limite:
+                self.buckets_latencia[i] += 1
+                break
+        else:
+            self.buckets_latencia[-1] += 1
+        self.suma_latencia += latencia
+        self.peticiones_por_estado[str(estado)] += 1
+        self.bytes_descargados += cantidad_bytes
+
+    def registrar_reintento(self, estado):
+        self.reintentos_por_estado[str(estado)] += 1
+
+    def registrar_fallo(self, estado):
+        self.fallos_por_estado[str(estado)] += 1
+
+    def registrar_pagina_desde_cache(self):
+        self.paginas_desde_cache += 1
+
+    def registrar_pausa(self, motivo, segundos):
+        self.segundos_en_pausas[motivo] += segundos
+
+    @contextmanager
+    def medir(self, etapa):
+        inicio = time.monotonic()
+        try:
+            yield
+        finally:
+            self.segundos_por_etapa[etapa] += time.monotonic() - inicio
+            self.llamadas_por_etapa[etapa] += 1
+
+    def cronometrar(self, etapa):
+        """Decorador: acumula el tiempo de la función (normal o async) bajo el nombre 'etapa'."""
+        def decorador(funcion):
+            if inspect.iscoroutinefunction(funcion):
+                @functools.wraps(funcion)
+                async def envoltura_async(*args, **kwargs):
+                    with self.medir(etapa):
+                        return await funcion(*args, **kwargs)
+                return envoltura_async
+
+            @functools.wraps(funcion)
+            def envoltura(*args, **kwargs):
+                with self.medir(etapa):
+                    return funcion(*args, **kwargs)
+            return envoltura
+        return decorador
+
+    # --- Salida ---
+    def resumen(self):
+        duracion = time.monotonic() - self.inicio
+        total_peticiones = sum(self.peticiones_por_estado.values())
+        acumulado = 0
+        histograma = {}
+        for limite, cantidad in zip(list(LIMITES_LATENCIA) + ['+Inf'], self.buckets_latencia):
+            acumulado += cantidad
+            histograma[str(limite)] = acumulado # Acumulativo, como los buckets de Prometheus
+        return {
+            'duracion_segundos': round(duracion, 3),
+            'peticiones_totales': total_peticiones,
+            'paginas_por_segundo': round(total_peticiones / duracion, 3) if duracion > 0 else 0.0,
+            'paginas_desde_cache': self.paginas_desde_cache,
+            'bytes_descargados': self.bytes_descargados,
+            'latencia': {
+                'suma_segundos': round(self.suma_latencia, 3),
+                'promedio_segundos': round(self.suma_latencia / total_peticiones, 4) if total_peticiones else 0.0,
+                'histograma_acumulado': histograma,
+            },
+            'peticiones_por_estado': dict(self.peticiones_por_estado),
+            'reintentos_por_estado': dict(self.reintentos_por_estado),
+            'fallos_por_estado': dict(self.fallos_por_estado),
+            'segundos_en_pausas': {k: round(v, 3) for k, v in self.segundos_en_pausas.items()},
+            'etapas': {
+                etapa: {'segundos': round(self.segundos_por_etapa[etapa], 3), 'llamadas': self.llamadas_por_etapa[etapa]}
+                for etapa in self.segundos_por_etapa
+            },
+        }
+
+    def guardar_json(self, ruta):
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(self.resumen(), f, ensure_ascii=False, indent=2)
+
+    def texto_prometheus(self):
+        r = self.resumen()
+        lineas = [
+            "# HELP crawler_cp_latencia_peticion_segundos Latencia de cada petición HTTP.",
+            "# TYPE crawler_cp_latencia_peticion_segundos histogram",
+        ]
+        for limite, acumulado in r['latencia']['histograma_acumulado'].items():
+            lineas.append(f'crawler_cp_latencia_peticion_segundos_bucket{{le="{limite}"}} {acumulado}')
+        lineas += [
+            f"crawler_cp_latencia_peticion_segundos_sum {self.suma_latencia}",
+            f"crawler_cp_latencia_peticion_segundos_count {r['peticiones_totales']}",
+            "# TYPE crawler_cp_peticiones_total counter",
+        ]
+        lineas += [f'crawler_cp_peticiones_total{{estado="{e}"}} {n}' for e, n in self.peticiones_por_estado.items()]
+        lineas.append("# TYPE crawler_cp_reintentos_total counter")
+        lineas += [f'crawler_cp_reintentos_total{{estado="{e}"}} {n}' for e, n in self.reintentos_por_estado.items()]
+        lineas.append("# TYPE crawler_cp_fallos_total counter")
+        lineas += [f'crawler_cp_fallos_total{{estado="{e}"}} {n}' for e, n in self.fallos_por_estado.items()]
+        lineas += [
+            "# TYPE crawler_cp_bytes_descargados_total counter",
+            f"crawler_cp_bytes_descargados_total {self.bytes_descargados}",
+            "# TYPE crawler_cp_paginas_desde_cache_total counter",
+            f"crawler_cp_paginas_desde_cache_total {self.paginas_desde_cache}",
+            "# TYPE crawler_cp_paginas_por_segundo gauge",
+            f"crawler_cp_paginas_por_segundo {r['paginas_por_segundo']}",
+            "# TYPE crawler_cp_pausa_segundos_total counter",
+        ]
+        lineas += [f'crawler_cp_pausa_segundos_total{{motivo="{m}"}} {s}' for m, s in self.segundos_en_pausas.items()]
+        lineas.append("# TYPE crawler_cp_etapa_segundos_total counter")
+        lineas += [f'crawler_cp_etapa_segundos_total{{etapa="{e}"}} {s}' for e, s in self.segundos_por_etapa.items()]
+        lineas.append("# TYPE crawler_cp_etapa_llamadas_total counter")
+        lineas += [f'crawler_cp_etapa_llamadas_total{{etapa="{e}"}} {n}' for e, n in self.llamadas_por_etapa.items()]
+        return "\n".join(lineas) + "\n"
+
+    def guardar_prometheus(self, ruta):
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write(self.texto_prometheus())
+
+    def imprimir_resumen(self):
+        r = self.resumen()
+        print("\n--- Métricas del crawler ---")
+        print(f"  Duración: {r['duracion_segundos']} s | Peticiones: {r['peticiones_totales']} "
+              f"({r['paginas_por_segundo']} pág/s) | Desde caché: {r['paginas_desde_cache']} | Bytes: {r['bytes_descargados']}")
+        print(f"  Latencia promedio: {r['latencia']['promedio_segundos']} s | Por estado: {r['peticiones_por_estado']}")
+        print(f"  Reintentos: {r['reintentos_por_estado']} | Fallos: {r['fallos_por_estado']}")
+        print(f"  Pausas (s): {r['segundos_en_pausas']}")
+        for etapa, datos in r['etapas'].items():
+            print(f"  {etapa}: {datos['segundos']} s en {datos['llamadas']} llamadas")
+
+# Instancia única que usan el scraper v2 y el modo async
+METRICAS = MetricasCrawler()
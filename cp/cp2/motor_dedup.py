@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+# --- Motor de deduplicación por grupos (sin ordenar la tabla por columnas de texto) ---
+# Para quedarse con una fila por grupo, deduplicar_tabla_final.py ordenaba la tabla entera por siete columnas de texto
+# más id_loca. Acá:
+#   1. cada columna del grupo se factoriza (hash) en códigos enteros; con sort=True solo se ordenan los valores
+#      distintos, y el orden de los códigos es el orden alfabético (nulos al final, como na_position='last').
+#      Las categóricas ya traen códigos: solo se reordenan sus categorías;
+#   2. los códigos se combinan en una sola clave entera por fila (se recomprime si no entra en int64);
+#   3. en una pasada se elige la fila a conservar de cada grupo según la política;
+#   4. se devuelven los grupos en el orden de su clave, que es el mismo que daba el sort_values de antes.
+# Políticas (POLITICAS): 'min_id' (menor valor de la columna id; empates -> la primera), 'primero' (la primera que
+# aparece) y 'mas_completo' (la de más columnas no nulas; empates -> menor id, después la primera).
+
+POLITICAS = ('min_id', 'primero', 'mas_completo')
+MAXIMO_CLAVE = np.iinfo(np.int64).max
+
+def _codigos_ordenados(serie):
+    """Códigos enteros cuyo orden es el de los valores (nulos al final) y cantidad de códigos distintos."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Una categórica ya tiene sus códigos: solo se reordenan las categorías (pocas), no las filas
+        categorias = serie.cat.categories
+        rango = np.empty(len(categorias) + 1, dtype=np.int64)
+        if categorias.is_monotonic_increasing: # Las de read_csv ya vienen en orden alfabético
+            rango[:-1] = np.arange(len(categorias))
+        else:
+            rango[categorias.argsort()] = np.arange(len(categorias))
+        rango[-1] = len(categorias) # El código -1 (nulo) toma el último lugar
+        return rango[serie.cat.codes.to_numpy()], len(categorias) + 1
+    codigos, unicos = pd.factorize(serie, sort=True)
+    codigos = codigos.astype(np.int64)
+    codigos[codigos == -1] = len(unicos) # factorize marca los nulos con -1
+    return codigos, len(unicos) + 1
+
+def clave_de_grupo(df, columnas):
+    """Una clave int64 por fila; dos filas tienen la misma clave sii coinciden en 'columnas', y el orden de las claves es el lexicográfico."""
+    clave, tamano = _codigos_ordenados(df[columnas[0]])
+    for col in columnas[1:]:
+        codigos, n = _codigos_ordenados(df[col])
+        if tamano > MAXIMO_CLAVE // n:
+            clave, tamano = _codigos_ordenados(pd.Series(clave)) # Recomprimir: mismo orden, códigos 0..k-1
+        clave = clave * n + codigos
+        tamano *= n
+    return clave
+
+def _primer_minimo(grupo, valores, n_grupos):
+    """Posición de la primera fila con el menor valor de cada grupo (valores ya sin nulos)."""
+    minimo = np.full(n_grupos, np.inf)
+    np.minimum.at(minimo, grupo, valores)
+    es_minimo = valores == minimo[grupo]
+    posicion = np.full(n_grupos, len(grupo), dtype=np.int64)
+    np.minimum.at(posicion, grupo[es_minimo], np.flatnonzero(es_minimo))
+    return posicion
+
+def _ids_para_comparar(df, columna_id):
+    """La columna id como float, con los nulos (o la columna faltante) al final, como na_position='last'."""
+    if columna_id is None or columna_id not in df.columns:
+        return np.zeros(len(df))
+    return pd.to_numeric(df[columna_id], errors='coerce').astype('float64').fillna(np.inf).to_numpy()
+
+def deduplicar_por_grupos(df, columnas_grupo, columna_id=None, politica='min_id'):
+    """
+    Devuelve (df con una fila por grupo, cantidad de filas de cada grupo). El resultado queda en el orden de
+    df.sort_values(columnas_grupo) y la serie de tamaños está alineada con su índice.
+    """
+    if politica not in POLITICAS:
+        raise ValueError(f"Política de deduplicación desconocida: '{politica}'. Opciones: {POLITICAS}")
+    if df.empty:
+        return df.copy(), pd.Series(dtype='int64', index=df.index)
+
+    clave = clave_de_grupo(df, columnas_grupo)
+    grupo, claves_unicas = pd.factorize(clave) # Por hash: grupo = 0..n_grupos-1 en orden de aparición
+    n_grupos = len(claves_unicas)
+
+    if politica == 'primero':
+        posicion = np.full(n_grupos, len(df), dtype=np.int64)
+        np.minimum.at(posicion, grupo, np.arange(len(df)))
+    elif politica == 'min_id':
+        posicion = _primer_minimo(grupo, _ids_para_comparar(df, columna_id), n_grupos)
+    else: # 'mas_completo': más columnas no nulas; se desempata por id y después por orden de aparición
+        completas = df.notna().sum(axis=1).to_numpy()
+        ids = _ids_para_comparar(df, columna_id)
+        # Un solo valor a minimizar: menos completo -> mayor; el id (rango 0..n-1) desempata
+        rango_id = pd.Series(ids).rank(method='dense').to_numpy() - 1
+        posicion = _primer_minimo(grupo, -completas * float(len(df)) + rango_id, n_grupos)
+
+    tamanos = np.bincount(grupo, minlength=n_grupos)
+    orden = np.argsort(claves_unicas, kind='stable') # Solo se ordenan las claves enteras de los grupos
+    filas = posicion[orden]
+    resultado = df.iloc[filas].copy()
+    return resultado, pd.Series(tamanos[orden], index=resultado.index, name='filas_en_grupo')
+
+def resumen_de_grupos(tamanos):
+    """Texto con cuántos grupos colapsaron filas y cuántas filas tenían."""
+    colapsados = tamanos[tamanos > 1]
+    lineas = [f"  Grupos con más de una fila: {len(colapsados)} (de {len(tamanos)}); filas eliminadas: {int((tamanos - 1).sum())}"]
+    if len(colapsados):
+        distribucion = colapsados.value_counts().sort_index()
+        lineas.append("  Filas por grupo -> cantidad de grupos: " + ", ".join(f"{k}: {v}" for k, v in distribucion.items()))
+        lineas.append(f"  Máximo: {int(colapsados.max())} filas en un grupo")
+    return "\n".join(lineas)
@@ -0,0 +1,68 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+# --- Normalización de nombres compartida por los scripts de cp ---
+# Antes cada script tenía su propia copia de normalize_name (limpiar_datos_scraped.py, cruzar_con_maestros_v3.py)
+# o una variante (clean_locality_name en consolidar_todo.py), aplicada fila por fila con Series.apply.
+# normalize_name está en establecimientos/normalizacion.py (la usa también la app: CPA, formularios) y se importa
+# desde acá; este módulo agrega:
+#   - clean_locality_name(), con la misma caché LRU por nombre,
+#   - normalizar_serie(): normaliza solo los valores distintos (factorize -> normalizar únicos -> volver a mapear),
+#     y opcionalmente reparte los únicos en bloques entre varios procesos.
+# El resultado es idéntico al de las funciones originales (ver benchmark_normalizacion.py).
+# pandas y numpy se importan solo en normalizar_serie(): normalize_name() se puede usar sin ellos (ver gazetteer.py).
+
+# Raíz del repositorio, para importar el paquete establecimientos (sin Django: sus módulos de normalización y CPA
+# no lo necesitan)
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if RAIZ_REPO not in sys.path:
+    sys.path.append(RAIZ_REPO)
+
+from establecimientos.normalizacion import ( # noqa: E402 (necesita RAIZ_REPO en sys.path)
+    RE_ESPACIOS, RE_PARENTESIS, TAMANO_CACHE, _normalizar, es_nulo, normalize_name,
+)
+
+TAMANO_BLOQUE = 50_000 # Únicos por bloque cuando se reparte entre procesos
+
+@lru_cache(maxsize=TAMANO_CACHE)
+def _limpiar_localidad(texto):
+    texto = texto.lower().strip()
+    texto = RE_PARENTESIS.sub('', texto).strip()
+    return RE_ESPACIOS.sub(' ', texto).strip()
+
+def clean_locality_name(name):
+    """Variante de consolidar_todo.py: minúsculas, sin paréntesis y con espacios simples (conserva las tildes)."""
+    if es_nulo(name):
+        return ""
+    return _limpiar_localidad(str(name))
+
+def vaciar_caches():
+    """Suelta los nombres guardados en las cachés LRU (ej. entre etapas de pipeline_cp.py, cuando ya no se normaliza)."""
+    _normalizar.cache_clear()
+    _limpiar_localidad.cache_clear()
+
+def _normalizar_bloque(argumentos):
+    funcion, valores = argumentos
+    return [funcion(v) for v in valores]
+
+def normalizar_unicos(valores, funcion=normalize_name, procesos=1, tamano_bloque=TAMANO_BLOQUE):
+    """Aplica 'funcion' a una lista de valores distintos, en bloques entre procesos si son muchos."""
+    if procesos <= 1 or len(valores) <= tamano_bloque:
+        return [funcion(v) for v in valores]
+    bloques = [valores[i:i + tamano_bloque] for i in range(0, len(valores), tamano_bloque)]
+    with ProcessPoolExecutor(max_workers=procesos) as executor:
+        resultados = executor.map(_normalizar_bloque, [(funcion, b) for b in bloques])
+        return [nombre for bloque in resultados for nombre in bloque]
+
+def normalizar_serie(serie, funcion=normalize_name, procesos=1):
+    """
+    Equivale a serie.apply(funcion), pero la función se evalúa una sola vez por valor distinto.
+    Los nulos quedan como '' (igual que en normalize_name).
+    """
+    import numpy as np
+    import pandas as pd
+    codigos, unicos = pd.factorize(serie) # Los nulos reciben el código -1
+    normalizados = np.array(normalizar_unicos(list(unicos), funcion, procesos) + [""], dtype=object)
+    return pd.Series(normalizados[codigos], index=serie.index, name=serie.name) # codigos == -1 toma el "" del final
@@ -0,0 +1,104 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import scraping_codigos_postales_v2 as scraper
+from archivo_paginas import leer_registros
+
+# --- Etapa de parseo separada de la descarga ---
+# Lee el archivo de páginas crudas que genera el scraper v2 (--archivo-html, idealmente con --solo-descargar)
+# y reparte el parseo de las páginas de localidad entre varios procesos (el parseo con BeautifulSoup
+# es CPU puro, así que escala con la cantidad de núcleos). Genera los mismos CSV por provincia que el
+# scraper: mismo orden de provincias y localidades, misma deduplicación.
+# Uso:
+#   python scraping_codigos_postales_v2.py --modo async --archivo-html paginas.warc.gz --solo-descargar
+#   python parsear_archivo_paginas.py paginas.warc.gz --procesos 8 --parser lxml
+
+def parsear_pagina_localidad(tarea):
+    url, html, parser = tarea
+    return scraper.parsear_cp_y_cpa_de_tabla(html, url, parser)
+
+def cargar_registros(ruta_archivo):
+    """Último registro de cada URL (el archivo puede tener varias ejecuciones agregadas)."""
+    registros = {}
+    for registro in leer_registros(ruta_archivo):
+        registros[registro['url']] = registro
+    return registros
+
+def planificar(registros, parser):
+    """Reconstruye el recorrido del scraper: [(provincia, [(localidad_nav, url), ...]), ...]."""
+    paginas_provincias = [r for r in registros.values() if r['tipo'] == 'provincias']
+    if not paginas_provincias:
+        print("ERROR: El archivo no tiene la página con la lista de provincias.")
+        return []
+    pagina_provincias = paginas_provincias[-1]
+    # Los links se resuelven contra la misma URL base que se usó al descargar
+    scraper.BASE_URL = pagina_provincias['url'].split('/argentina/')[0]
+    provincias = scraper.parsear_provincias(pagina_provincias['html'], parser)
+
+    plan = []
+    for provincia_nombre, provincia_url in provincias:
+        registro = registros.get(provincia_url)
+        if registro is None:
+            print(f"  ADVERTENCIA: La página de {provincia_nombre} no está en el archivo. Se omite.")
+            continue
+        plan.append((provincia_nombre, scraper.parsear_localidades(registro['html'], provincia_nombre, parser)))
+    return plan
+
+def main():
+    parser_args = argparse.ArgumentParser(description="Parsea en paralelo un archivo de páginas crudas del scraper v2.")
+    parser_args.add_argument('archivo', help="Archivo .gz generado con --archivo-html")
+    parser_args.add_argument('--salida', default=scraper.OUTPUT_DIRECTORY, help="Carpeta para los CSV por provincia.")
+    parser_args.add_argument('--procesos', type=int, default=os.cpu_count(), help="Procesos de parseo en paralelo.")
+    parser_args.add_argument('--parser', default='html.parser', choices=['html.parser', 'lxml'],
+                             help="Parser de BeautifulSoup ('lxml' es bastante más rápido).")
+    args = parser_args.parse_args()
+
+    print(f"Leyendo archivo de páginas '{args.archivo}'...")
+    inicio = time.monotonic()
+    registros = cargar_registros(args.archivo)
+    print(f"  Registros (URLs únicas): {len(registros)}")
+
+    plan = planificar(registros, args.parser)
+    tareas = []
+    for provincia_nombre, localidades_nav in plan:
+        for localidad_nav_nombre, localidad_nav_url in localidades_nav:
+            registro = registros.get(localidad_nav_url)
+            if registro is None:
+                print(f"  ADVERTENCIA: Falta la página de '{localidad_nav_nombre}' ({provincia_nombre}) en el archivo.")
+                continue
+            tareas.append((localidad_nav_url, registro['html'], args.parser))
+
+    print(f"\nParseando {len(tareas)} páginas de localidad con {args.procesos} procesos ({args.parser})...")
+    inicio_parseo = time.monotonic()
+    with ProcessPoolExecutor(max_workers=args.procesos) as executor:
+        chunksize = max(1, len(tareas) // (args.procesos * 8))
+        filas_por_url = dict(zip(
+            (url for url, _, _ in tareas),
+            executor.map(parsear_pagina_localidad, tareas, chunksize=chunksize)
+        ))
+    segundos_parseo = time.monotonic() - inicio_parseo
+    print(f"  Parseo terminado en {segundos_parseo:.2f} s ({len(tareas) / max(segundos_parseo, 1e-9):.0f} páginas/s)")
+
+    # La deduplicación y la escritura se hacen en el orden original, igual que el scraper
+    scraper.OUTPUT_DIRECTORY = args.salida
+    os.makedirs(args.salida, exist_ok=True)
+    seen_data_tuples = set()
+    for provincia_nombre, localidades_nav in plan:
+        datos_para_esta_provincia = []
+        for localidad_nav_nombre, localidad_nav_url in localidades_nav:
+            filas_de_tabla = filas_por_url.get(localidad_nav_url)
+            if filas_de_tabla:
+                scraper.agregar_filas_unicas(
+                    filas_de_tabla, provincia_nombre, localidad_nav_nombre, seen_data_tuples, datos_para_esta_provincia
+                )
+        if datos_para_esta_provincia:
+            ruta_archivo_provincia = scraper.ruta_csv_provincia(provincia_nombre)
+            scraper.guardar_csv_provincia(ruta_archivo_provincia, datos_para_esta_provincia)
+            print(f"  Datos de {provincia_nombre} ({len(datos_para_esta_provincia)} filas) guardados en {ruta_archivo_provincia}")
+
+    print(f"\n¡Parseo completado en {time.monotonic() - inicio:.2f} s! CSV en la carpeta: {args.salida}")
+
+if __name__ == "__main__":
+    main()
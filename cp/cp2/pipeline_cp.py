@@ -0,0 +1,218 @@
+import argparse
+import contextlib
+import ctypes
+import ctypes.util
+import gc
+import io
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import limpiar_datos_scraped
+import cruzar_con_maestros_v3
+import deduplicar_tabla_final
+import corregir_n_final
+from formato_columnar import VALORES_NA_CSV, con_extension, escribir_tabla
+from esquemas import leer_con_esquema, memoria_mb
+from normalizacion import vaciar_caches
+
+try:
+    import resource # No existe en Windows: ahí no se informa el pico de memoria
+except ImportError:
+    resource = None
+
+# malloc_trim (solo glibc) devuelve al sistema la memoria libre del heap; en otros sistemas no se llama
+_libc = ctypes.CDLL(ctypes.util.find_library('c')) if os.name == 'posix' else None
+malloc_trim = getattr(_libc, 'malloc_trim', None)
+
+# --- Pipeline de CP en un solo paso ---
+# Encadena en memoria lo que antes eran cuatro scripts con un CSV intermedio cada uno:
+#   limpiar_datos_scraped -> cruzar_con_maestros_v3 -> deduplicar_tabla_final -> corregir_n_final
+# Cada script sigue funcionando por separado (su lógica está en limpiar(), cruzar(), deduplicar() y corregir()).
+# Las tablas viajan tipadas (IDs enteros compactos, nombres categóricos; ver esquemas.py). Solo después de la
+# limpieza, como_releido_de_csv() deja los datos igual que si se hubieran escrito y vuelto a leer con
+# read_csv(dtype=str) (los 'nan' de texto pasan a nulos), así la salida es byte a byte la de los cuatro scripts.
+# Al final se informa, por etapa, el tiempo, la memoria del resultado y la memoria del proceso.
+# Entre etapas se sueltan las tablas que ya no se usan y, con liberar_memoria(), las cachés de normalize_name (con el
+# gazetteer vigente no se vuelve a normalizar después de la limpieza) y la memoria libre del heap: el pico del
+# pipeline es el del cruce, no el de todo lo acumulado (el de cruzar_con_maestros_v3.py solo, más o menos).
+# emparejador_difuso y validar_tabla_cp se importan solo con --difuso / --validar.
+# Con --difuso, las filas sin match exacto pasan por emparejador_difuso.py y las aceptadas se suman a los cruces
+# antes de deduplicar (el archivo sin match queda solo con las que siguen sin candidato aceptable).
+# Los CSV intermedios solo se escriben con --volcar-intermedios (para depurar).
+# Con --formato parquet (o arrow) la tabla final y los intermedios se escriben en formato columnar
+# (ver formato_columnar.py); la entrada puede ser .csv, .parquet o .arrow.
+# Con --validar, la tabla final pasa por las reglas de validar_tabla_cp.py (solo informa; no corta el pipeline).
+# Uso: python pipeline_cp.py [--formato csv|parquet|arrow] [--validar] [--volcar-intermedios] [--detallado]
+
+def como_releido_de_csv(df):
+    """Equivale a df.to_csv() + pd.read_csv(dtype=str): todo a texto, y los textos 'nulos' ('', 'nan', ...) a NaN."""
+    columnas = {}
+    for col in df.columns:
+        texto = df[col].astype('string').astype(object)
+        columnas[col] = texto.where(~(texto.isna() | texto.isin(VALORES_NA_CSV)), np.nan)
+    return pd.DataFrame(columnas).reset_index(drop=True)
+
+def pico_memoria_mb():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # En Linux ru_maxrss está en KB
+
+def liberar_memoria():
+    """Después de soltar las tablas de una etapa: vacía las cachés de normalización y devuelve al sistema lo liberado."""
+    vaciar_caches()
+    gc.collect()
+    if malloc_trim is not None:
+        malloc_trim(0)
+
+def memoria_actual_mb():
+    """RSS actual del proceso (solo Linux, de /proc/self/statm); None en otros sistemas."""
+    try:
+        with open('/proc/self/statm') as f:
+            paginas = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return paginas * os.sysconf('SC_PAGE_SIZE') / 2**20
+
+def formato_mb(valor):
+    return f"{valor:.0f}" if valor is not None else "-"
+
+class Etapas:
+    """Cronometra y mide la memoria de cada etapa y, salvo con --detallado, oculta los print de los scripts originales."""
+
+    def __init__(self, detallado):
+        self.detallado = detallado
+        self.perfil = []
+
+    @contextlib.contextmanager
+    def etapa(self, nombre):
+        print(f"  {nombre}...", end=" ", flush=True)
+        inicio = time.perf_counter()
+        salida = contextlib.nullcontext() if self.detallado else contextlib.redirect_stdout(io.StringIO())
+        with salida:
+            yield
+        segundos = time.perf_counter() - inicio
+        self.perfil.append({'etapa': nombre, 'segundos': segundos, 'resultado_mb': None,
+                            'rss_mb': memoria_actual_mb(), 'pico_mb': pico_memoria_mb()})
+        print(f"{segundos:.2f} s")
+
+    def resultado(self, df):
+        """Anota cuánta memoria ocupa la tabla que dejó la última etapa."""
+        self.perfil[-1]['resultado_mb'] = memoria_mb(df)
+
+    def reporte_memoria(self):
+        print(f"\n{'Etapa':<30} {'tiempo':>8} {'resultado':>10} {'RSS':>8} {'pico RSS':>9}")
+        for fila in self.perfil:
+            resultado = f"{fila['resultado_mb']:.1f}" if fila['resultado_mb'] is not None else "-"
+            print(f"{fila['etapa']:<30} {fila['segundos']:>6.2f} s {resultado:>7} MB "
+                  f"{formato_mb(fila['rss_mb']):>5} MB {formato_mb(fila['pico_mb']):>6} MB")
+
+def volcar(df, ruta, args):
+    """Guarda la salida de una etapa tal como la escribía su script (solo con --volcar-intermedios)."""
+    if args.volcar_intermedios:
+        ruta = con_extension(ruta, args.formato)
+        escribir_tabla(df, ruta)
+        print(f"    (intermedio guardado en '{ruta}')")
+
+
+def ejecutar(args):
+    etapas = Etapas(args.detallado)
+    inicio = time.perf_counter()
+
+    with etapas.etapa("Carga"):
+        df_scraped = leer_con_esquema(args.entrada, 'scraped') # También .parquet/.arrow
+        df_provincias_ref = pd.read_csv(args.provincias, delimiter=',', header=0, dtype=str)
+        provincias_validas = limpiar_datos_scraped.nombres_de_provincia_normalizados(df_provincias_ref)
+    etapas.resultado(df_scraped)
+    if df_scraped.empty:
+        print("El archivo scrapeado está vacío. No hay nada que procesar.")
+        return
+
+    with etapas.etapa("Limpieza"):
+        df_limpio = limpiar_datos_scraped.limpiar(df_scraped, provincias_validas)
+    volcar(df_limpio, limpiar_datos_scraped.CLEANED_OUTPUT_FILE, args)
+    df_limpio = como_releido_de_csv(df_limpio)
+    etapas.resultado(df_limpio)
+    del df_scraped, df_provincias_ref # Cada etapa suelta lo que ya no se usa, así el pico es el de la etapa más grande
+    liberar_memoria()
+
+    with etapas.etapa("Cruce con maestros"):
+        df_master_pdl = cruzar_con_maestros_v3.cargar_maestro_pdl(args.provincias, args.deptos, args.loca)
+        df_cruces, df_sin_match = cruzar_con_maestros_v3.cruzar(df_limpio, df_master_pdl)
+        del df_limpio
+    if df_cruces is not None:
+        etapas.resultado(df_cruces)
+    if args.difuso and df_sin_match is not None:
+        import emparejador_difuso
+        filas_sin_match = len(df_sin_match)
+        with etapas.etapa("Emparejamiento difuso"):
+            df_candidatos, df_aceptados, df_sin_match = emparejador_difuso.emparejar(df_sin_match, df_master_pdl)
+            df_candidatos.to_csv(emparejador_difuso.CANDIDATOS_OUTPUT_FILE, index=False, sep=';', encoding='utf-8')
+        if df_aceptados is not None:
+            etapas.resultado(df_aceptados)
+            df_cruces = df_aceptados if df_cruces is None else pd.concat([df_cruces, df_aceptados], ignore_index=True)
+        print(f"    {filas_sin_match - len(df_sin_match)} de {filas_sin_match} filas sin match aceptadas por aproximación; "
+              f"candidatos en '{emparejador_difuso.CANDIDATOS_OUTPUT_FILE}'")
+    del df_master_pdl
+    liberar_memoria()
+    # Las filas sin match no son un intermedio: es el archivo para revisión manual
+    if df_sin_match is not None:
+        df_sin_match.to_csv(args.sin_match, index=False, sep=';', encoding='utf-8')
+        print(f"    {len(df_sin_match)} filas sin match guardadas en '{args.sin_match}'")
+    if df_cruces is None:
+        print("No se encontraron cruces exitosos. No se genera la tabla final.")
+        return
+    volcar(df_cruces, cruzar_con_maestros_v3.MATCHED_OUTPUT_FILE, args)
+
+    with etapas.etapa("Deduplicación"):
+        df_deduplicado = deduplicar_tabla_final.deduplicar(df_cruces)
+        del df_cruces
+    etapas.resultado(df_deduplicado)
+    liberar_memoria()
+    volcar(df_deduplicado, deduplicar_tabla_final.OUTPUT_FILE, args)
+
+    with etapas.etapa("Corrección de ñ y escritura"):
+        df_final = corregir_n_final.corregir(df_deduplicado)
+        salida = con_extension(args.salida, args.formato)
+        escribir_tabla(df_final, salida)
+    etapas.resultado(df_final)
+
+    if args.validar:
+        import validar_tabla_cp
+        with etapas.etapa("Validación"):
+            resumen, muestras = validar_tabla_cp.validar(df_final, validar_tabla_cp.cargar_maestros(args.provincias, args.deptos, args.loca))
+            resumen.to_csv(validar_tabla_cp.RESUMEN_OUTPUT_FILE, index=False, sep=';', encoding='utf-8')
+            muestras.to_csv(validar_tabla_cp.MUESTRAS_OUTPUT_FILE, index=False, sep=';', encoding='utf-8')
+        con_violaciones = resumen[resumen['violaciones'] > 0]
+        print("    " + ("; ".join(f"{fila.regla} ({fila.severidad}): {fila.violaciones}" for fila in con_violaciones.itertuples())
+                        or "sin violaciones") + f" | detalle en '{validar_tabla_cp.RESUMEN_OUTPUT_FILE}'")
+
+    etapas.reporte_memoria()
+    total = time.perf_counter() - inicio
+    pico = pico_memoria_mb()
+    print(f"\nTabla final: {len(df_final)} filas en '{salida}'")
+    print(f"Tiempo total: {total:.2f} s" + (f" | Pico de memoria (RSS): {pico:.0f} MB" if pico else ""))
+
+def main():
+    parser = argparse.ArgumentParser(description="Limpieza, cruce, deduplicación y corrección de ñ en un solo paso.")
+    parser.add_argument('--entrada', default=limpiar_datos_scraped.SCRAPED_DATA_FILE)
+    parser.add_argument('--provincias', default=cruzar_con_maestros_v3.PROVINCIAS_MASTER_FILE)
+    parser.add_argument('--deptos', default=cruzar_con_maestros_v3.DEPTOS_MASTER_FILE)
+    parser.add_argument('--loca', default=cruzar_con_maestros_v3.LOCA_MASTER_FILE)
+    parser.add_argument('--salida', default=corregir_n_final.OUTPUT_FILE)
+    parser.add_argument('--sin-match', default=cruzar_con_maestros_v3.UNMATCHED_OUTPUT_FILE)
+    parser.add_argument('--formato', default='csv', choices=['csv', 'parquet', 'arrow'],
+                        help="Formato de la tabla final y de los intermedios (el CSV queda como exportación).")
+    parser.add_argument('--difuso', action='store_true', help="Emparejar por aproximación las filas sin match exacto.")
+    parser.add_argument('--validar', action='store_true', help="Validar la tabla final (ver validar_tabla_cp.py).")
+    parser.add_argument('--volcar-intermedios', action='store_true', help="Guardar también los CSV intermedios (depuración).")
+    parser.add_argument('--detallado', action='store_true', help="Mostrar la salida completa de cada etapa.")
+    args = parser.parse_args()
+
+    print(f"Pipeline de CP: '{args.entrada}' -> '{args.salida}'")
+    ejecutar(args)
+
+if __name__ == "__main__":
+    main()
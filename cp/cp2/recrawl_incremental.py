@@ -0,0 +1,244 @@
+import argparse
+import asyncio
+import csv
+import hashlib
+import heapq
+import json
+import os
+import sqlite3
+import time
+from collections import defaultdict
+
+import scraping_codigos_postales_v2 as scraper
+import crawler_async
+from cache_http import CacheHTTP, DIRECTORIO_CACHE
+from journal_scraping import ARCHIVO_JOURNAL
+from metricas_crawler import METRICAS
+
+# --- Re-crawl incremental: solo se refrescan las páginas viejas o que cambian seguido ---
+# Guarda por cada URL de localidad: última descarga, hash de su tabla de CP, último cambio,
+# cantidad de descargas y de cambios. En cada corrida:
+#   1. Se descubren las localidades actuales (1 página de provincias + 1 por provincia).
+#   2. Se eligen hasta --presupuesto páginas por prioridad: primero las nunca vistas, después las de
+#      mayor  edad_en_días * (0.5 + frecuencia_de_cambio).
+#   3. Se descargan con el crawler async (misma concurrencia y rate limit) y se compara el hash de la tabla.
+#   4. Solo las localidades cuya tabla cambió se reescriben en su CSV de provincia y se listan en
+#      cambios_incrementales.csv.
+# Uso: python recrawl_incremental.py --presupuesto 500
+
+ARCHIVO_ESTADO = "estado_paginas.sqlite"
+ARCHIVO_CAMBIOS = "cambios_incrementales.csv"
+PRESUPUESTO_POR_DEFECTO = 500
+SEGUNDOS_POR_DIA = 86400
+
+def hash_filas(filas_de_tabla):
+    return hashlib.sha256(json.dumps([list(f) for f in filas_de_tabla], ensure_ascii=False).encode('utf-8')).hexdigest()
+
+class EstadoPaginas:
+    def __init__(self, ruta=ARCHIVO_ESTADO):
+        self.conexion = sqlite3.connect(ruta)
+        self.conexion.execute("""
+            CREATE TABLE IF NOT EXISTS paginas (
+                url TEXT PRIMARY KEY,
+                provincia_nav TEXT NOT NULL,
+                localidad_nav TEXT NOT NULL,
+                hash_tabla TEXT,
+                ultima_descarga REAL,
+                ultimo_cambio REAL,
+                descargas INTEGER NOT NULL DEFAULT 0,
+                cambios INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self.conexion.commit()
+
+    def todas(self):
+        cursor = self.conexion.execute(
+            "SELECT url, hash_tabla, ultima_descarga, descargas, cambios FROM paginas"
+        )
+        return {url: {'hash_tabla': h, 'ultima_descarga': u, 'descargas': d, 'cambios': c} for url, h, u, d, c in cursor}
+
+    def importar_journal(self, ruta_journal):
+        """Si el estado está vacío, toma como línea base las páginas ya descargadas por el scraper v2."""
+        if self.conexion.execute("SELECT COUNT(*) FROM paginas").fetchone()[0] or not os.path.exists(ruta_journal):
+            return 0
+        journal = sqlite3.connect(ruta_journal)
+        filas = [
+            (url, provincia_nav, localidad_nav, hash_filas(json.loads(filas)), fecha, fecha)
+            for url, provincia_nav, localidad_nav, filas, fecha in journal.execute(
+                "SELECT url, provincia_nav, localidad_nav, filas, fecha FROM paginas_localidad"
+            )
+        ]
+        journal.close()
+        self.conexion.executemany(
+            "INSERT OR IGNORE INTO paginas (url, provincia_nav, localidad_nav, hash_tabla, ultima_descarga, ultimo_cambio, descargas) "
+            "VALUES (?, ?, ?, ?, ?, ?, 1)", filas
+        )
+        self.conexion.commit()
+        return len(filas)
+
+    def registrar_descarga(self, url, provincia_nav, localidad_nav, hash_tabla, cambio, ahora):
+        self.conexion.execute("""
+            INSERT INTO paginas (url, provincia_nav, localidad_nav, hash_tabla, ultima_descarga, ultimo_cambio, descargas, cambios)
+            VALUES (?, ?, ?, ?, ?, ?, 1, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                hash_tabla = excluded.hash_tabla,
+                ultima_descarga = excluded.ultima_descarga,
+                ultimo_cambio = CASE WHEN ? THEN excluded.ultima_descarga ELSE paginas.ultimo_cambio END,
+                descargas = paginas.descargas + 1,
+                cambios = paginas.cambios + ?
+        """, (url, provincia_nav, localidad_nav, hash_tabla, ahora, ahora if cambio else None, int(cambio), int(cambio), int(cambio)))
+
+    def confirmar(self):
+        self.conexion.commit()
+
+def prioridad(estado_pagina, ahora):
+    if estado_pagina is None or estado_pagina['hash_tabla'] is None:
+        return float('inf') # Nunca descargada: va primero
+    edad_dias = (ahora - estado_pagina['ultima_descarga']) / SEGUNDOS_POR_DIA
+    # Frecuencia de cambio con suavizado de Laplace, para que una sola observación no domine
+    frecuencia_cambio = (estado_pagina['cambios'] + 1) / (estado_pagina['descargas'] + 2)
+    return edad_dias * (0.5 + frecuencia_cambio)
+
+def elegir_paginas(descubiertas, estado, presupuesto, ahora):
+    return heapq.nlargest(presupuesto, descubiertas, key=lambda d: prioridad(estado.get(d[2]), ahora))
+
+# --- CSV por provincia ---
+def leer_csv_provincia(ruta):
+    if not os.path.exists(ruta):
+        return []
+    with open(ruta, newline='', encoding='utf-8') as f:
+        lector = csv.reader(f, delimiter=';')
+        next(lector, None) # Encabezado
+        return [fila for fila in lector if fila]
+
+def clave(fila_csv):
+    return tuple(fila_csv[2:6]) # (Provincia_Tabla, Localidad_Especifica_Tabla, CP_Tabla, CPA_Tabla)
+
+def tabla_cambio_respecto_del_csv(filas_de_tabla, localidad_nav, filas_csv):
+    """Sin hash previo: compara la tabla descargada contra lo que ya hay en el CSV para esa localidad."""
+    claves_pagina = {tuple(f[:4]) for f in filas_de_tabla}
+    claves_provincia = {clave(f) for f in filas_csv}
+    claves_localidad = {clave(f) for f in filas_csv if f[1] == localidad_nav}
+    # Las filas que faltan en la localidad pueden estar en otra localidad de la provincia (deduplicadas)
+    return bool(claves_pagina - claves_provincia or claves_localidad - claves_pagina)
+
+def reemplazar_localidades(filas_csv, provincia_nombre, tablas_nuevas):
+    """Reemplaza en el CSV las filas de las localidades cambiadas, manteniendo su posición."""
+    claves_otras = {clave(f) for f in filas_csv if f[1] not in tablas_nuevas}
+    filas_nuevas_por_localidad = {}
+    for localidad_nav, filas_de_tabla in tablas_nuevas.items():
+        filas_nuevas_por_localidad[localidad_nav] = []
+        scraper.agregar_filas_unicas(
+            filas_de_tabla, provincia_nombre, localidad_nav, claves_otras, filas_nuevas_por_localidad[localidad_nav]
+        )
+
+    resultado = []
+    insertadas = set()
+    for fila in filas_csv:
+        localidad_nav = fila[1]
+        if localidad_nav not in tablas_nuevas:
+            resultado.append(fila)
+        elif localidad_nav not in insertadas:
+            resultado.extend(filas_nuevas_por_localidad[localidad_nav])
+            insertadas.add(localidad_nav)
+    for localidad_nav, filas in filas_nuevas_por_localidad.items():
+        if localidad_nav not in insertadas: # Localidad nueva en el sitio: va al final
+            resultado.extend(filas)
+    return resultado, [f for filas in filas_nuevas_por_localidad.values() for f in filas]
+
+async def descubrir_y_descargar(args, estado):
+    async with crawler_async.crear_sesion(args.concurrencia) as session:
+        crawler = crawler_async.CrawlerAsync(session, args.concurrencia, args.rps)
+        provincias = await crawler.obtener_provincias()
+        listas = await asyncio.gather(*[crawler.obtener_localidades(url, nombre) for nombre, url in provincias])
+        descubiertas = [
+            (provincia_nombre, localidad_nombre, localidad_url)
+            for (provincia_nombre, _), localidades in zip(provincias, listas)
+            for localidad_nombre, localidad_url in localidades
+        ]
+        estado_actual = estado.todas()
+        elegidas = elegir_paginas(descubiertas, estado_actual, args.presupuesto, time.time())
+        nuevas = sum(1 for d in elegidas if d[2] not in estado_actual)
+        print(f"\nLocalidades en el sitio: {len(descubiertas)}. Se refrescan {len(elegidas)} "
+              f"(presupuesto {args.presupuesto}; {nuevas} nunca descargadas).")
+        if args.solo_planificar:
+            for provincia_nombre, localidad_nombre, localidad_url in elegidas:
+                print(f"  {provincia_nombre} / {localidad_nombre}: {localidad_url}")
+            return []
+        tablas = await asyncio.gather(*[
+            crawler.obtener_cp_y_cpa_de_tabla(url, provincia_nombre, localidad_nombre)
+            for provincia_nombre, localidad_nombre, url in elegidas
+        ])
+        return list(zip(elegidas, tablas))
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-crawl incremental de las páginas de localidad viejas o cambiantes.")
+    parser.add_argument('--presupuesto', type=int, default=PRESUPUESTO_POR_DEFECTO, help="Máximo de páginas de localidad a pedir.")
+    parser.add_argument('--concurrencia', type=int, default=8)
+    parser.add_argument('--rps', type=float, default=4.0)
+    parser.add_argument('--base-url', default=scraper.BASE_URL)
+    parser.add_argument('--salida', default=scraper.OUTPUT_DIRECTORY, help="Carpeta con los CSV por provincia a actualizar.")
+    parser.add_argument('--estado', default=ARCHIVO_ESTADO, help="SQLite con los metadatos por URL.")
+    parser.add_argument('--journal', default=ARCHIVO_JOURNAL, help="Journal del scraper v2 usado como línea base la primera vez.")
+    parser.add_argument('--cache', default=DIRECTORIO_CACHE)
+    parser.add_argument('--cambios', default=ARCHIVO_CAMBIOS, help="CSV con las filas nuevas de las localidades que cambiaron.")
+    parser.add_argument('--solo-planificar', action='store_true', help="Mostrar qué páginas se pedirían, sin descargarlas.")
+    args = parser.parse_args()
+
+    scraper.BASE_URL = args.base_url.rstrip('/')
+    scraper.OUTPUT_DIRECTORY = args.salida
+    scraper.CACHE = CacheHTTP(args.cache) # Con caché, las páginas sin cambios responden 304
+    estado = EstadoPaginas(args.estado)
+    importadas = estado.importar_journal(args.journal)
+    if importadas:
+        print(f"Estado inicial importado del journal: {importadas} páginas.")
+
+    resultados = asyncio.run(descubrir_y_descargar(args, estado))
+    if not resultados:
+        return
+
+    ahora = time.time()
+    estado_previo = estado.todas()
+    cambios_por_provincia = defaultdict(dict)
+    csv_por_provincia = {}
+    sin_cambios = fallidas = 0
+    for (provincia_nombre, localidad_nav, url), filas_de_tabla in resultados:
+        if filas_de_tabla is None:
+            fallidas += 1
+            continue
+        if provincia_nombre not in csv_por_provincia:
+            csv_por_provincia[provincia_nombre] = leer_csv_provincia(scraper.ruta_csv_provincia(provincia_nombre))
+        hash_tabla = hash_filas(filas_de_tabla)
+        previo = estado_previo.get(url)
+        if previo and previo['hash_tabla']:
+            cambio = previo['hash_tabla'] != hash_tabla
+        else:
+            cambio = tabla_cambio_respecto_del_csv(filas_de_tabla, localidad_nav, csv_por_provincia[provincia_nombre])
+        estado.registrar_descarga(url, provincia_nombre, localidad_nav, hash_tabla, cambio, ahora)
+        if cambio:
+            cambios_por_provincia[provincia_nombre][localidad_nav] = filas_de_tabla
+        else:
+            sin_cambios += 1
+    estado.confirmar()
+
+    filas_cambiadas = []
+    for provincia_nombre, tablas_nuevas in cambios_por_provincia.items():
+        filas_actualizadas, filas_emitidas = reemplazar_localidades(csv_por_provincia[provincia_nombre], provincia_nombre, tablas_nuevas)
+        os.makedirs(args.salida, exist_ok=True)
+        scraper.guardar_csv_provincia(scraper.ruta_csv_provincia(provincia_nombre), filas_actualizadas)
+        filas_cambiadas.extend(filas_emitidas)
+        print(f"  {provincia_nombre}: {len(tablas_nuevas)} localidades con cambios, CSV actualizado.")
+
+    with open(args.cambios, mode='w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(scraper.ENCABEZADO_CSV)
+        writer.writerows(filas_cambiadas)
+
+    total_cambios = sum(len(t) for t in cambios_por_provincia.values())
+    print(f"\nRe-crawl incremental: {len(resultados)} páginas pedidas, {total_cambios} con cambios, "
+          f"{sin_cambios} sin cambios, {fallidas} fallidas.")
+    print(f"Filas re-emitidas: {len(filas_cambiadas)} (en '{args.cambios}')")
+    METRICAS.imprimir_resumen()
+
+if __name__ == "__main__":
+    main()
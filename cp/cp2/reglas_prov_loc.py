@@ -0,0 +1,118 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from normalizacion import normalize_name, normalizar_serie
+
+# --- Reglas para corregir Provincia / Localidad de las filas scrapeadas ---
+# En algunas tablas del sitio las columnas Provincia y Localidad vienen intercambiadas. Cada fila se clasifica
+# con la primera regla que cumple (mismo orden que los if/elif de la versión original) y de ahí salen
+# Provincia_Corregida, Localidad_Corregida y Regla_Aplicada.
+# La tabla REGLAS es declarativa: condición sobre máscaras booleanas + qué columna va a provincia y cuál a localidad.
+# aplicar_reglas() evalúa todas las máscaras de una vez sobre la columna entera y elige con np.select,
+# en lugar de armar un pd.Series por fila con df.apply(axis=1).
+# Que las dos versiones den lo mismo lo comprueba test_reglas_prov_loc.py; ejecutar este archivo compara los tiempos.
+
+# (Regla_Aplicada, condición, columna para Provincia_Corregida, columna para Localidad_Corregida)
+REGLAS = [
+    ('A1_Col0_Prov_Coincide_Nav',
+     lambda m: m['col0_es_prov'] & m['col0_coincide_nav'], 'Provincia_Tabla', 'Localidad_Especifica_Tabla'),
+    ('A2_Col0_Prov_Col1_NoProv',
+     lambda m: m['col0_es_prov'] & ~m['col1_es_prov'], 'Provincia_Tabla', 'Localidad_Especifica_Tabla'),
+    ('A3_Col0_Prov_Col1_TambienProv_Col0_NoCoincideNav',
+     lambda m: m['col0_es_prov'], 'Provincia_Tabla', 'Localidad_Especifica_Tabla'),
+    ('B1_Col1_Prov_Coincide_Nav_INTERCAMBIADO',
+     lambda m: m['col1_es_prov'] & m['col1_coincide_nav'], 'Localidad_Especifica_Tabla', 'Provincia_Tabla'),
+    ('B2_Col1_Prov_Col0_NoProv_INTERCAMBIADO',
+     lambda m: m['col1_es_prov'], 'Localidad_Especifica_Tabla', 'Provincia_Tabla'),
+]
+# Si ninguna regla se cumple
+REGLA_POR_DEFECTO = ('C_Ninguna_Reconocida_Usando_Nav', 'Provincia_Navegacion', 'Localidad_Especifica_Tabla')
+
+def calcular_mascaras(df, valid_prov_names_set):
+    prov_nav = normalizar_serie(df['Provincia_Navegacion']).to_numpy()
+    col0 = normalizar_serie(df['Provincia_Tabla']).to_numpy()
+    col1 = normalizar_serie(df['Localidad_Especifica_Tabla']).to_numpy()
+    validos = list(valid_prov_names_set)
+    return {
+        'col0_es_prov': np.isin(col0, validos),
+        'col1_es_prov': np.isin(col1, validos),
+        'col0_coincide_nav': col0 == prov_nav,
+        'col1_coincide_nav': col1 == prov_nav,
+    }
+
+def aplicar_reglas(df, valid_prov_names_set):
+    """DataFrame con Provincia_Corregida, Localidad_Corregida y Regla_Aplicada (mismo índice que df)."""
+    mascaras = calcular_mascaras(df, valid_prov_names_set)
+    condiciones = [condicion(mascaras) for _, condicion, _, _ in REGLAS]
+    columnas = {c: df[c].to_numpy(dtype=object) for c in ('Provincia_Navegacion', 'Provincia_Tabla', 'Localidad_Especifica_Tabla')}
+    regla_defecto, prov_defecto, loc_defecto = REGLA_POR_DEFECTO
+    return pd.DataFrame({
+        'Provincia_Corregida': np.select(condiciones, [columnas[p] for _, _, p, _ in REGLAS], columnas[prov_defecto]),
+        'Localidad_Corregida': np.select(condiciones, [columnas[l] for _, _, _, l in REGLAS], columnas[loc_defecto]),
+        'Regla_Aplicada': np.select(condiciones, [np.array(r, dtype=object) for r, _, _, _ in REGLAS], regla_defecto),
+    }, index=df.index)
+
+# --- Versión original, fila por fila (referencia para la comparación) ---
+def determinar_prov_loc_corregidas(row, valid_prov_names_set):
+    prov_nav = normalize_name(row['Provincia_Navegacion'])
+    col0_val_orig = row['Provincia_Tabla']
+    col1_val_orig = row['Localidad_Especifica_Tabla']
+
+    col0_norm = normalize_name(col0_val_orig)
+    col1_norm = normalize_name(col1_val_orig)
+
+    is_col0_a_province = col0_norm in valid_prov_names_set
+    is_col1_a_province = col1_norm in valid_prov_names_set
+
+    if is_col0_a_province:
+        if col0_norm == prov_nav:
+            return pd.Series([col0_val_orig, col1_val_orig, 'A1_Col0_Prov_Coincide_Nav'])
+        elif not is_col1_a_province:
+            return pd.Series([col0_val_orig, col1_val_orig, 'A2_Col0_Prov_Col1_NoProv'])
+        else:
+            return pd.Series([col0_val_orig, col1_val_orig, 'A3_Col0_Prov_Col1_TambienProv_Col0_NoCoincideNav'])
+    elif is_col1_a_province:
+        if col1_norm == prov_nav:
+            return pd.Series([col1_val_orig, col0_val_orig, 'B1_Col1_Prov_Coincide_Nav_INTERCAMBIADO'])
+        else:
+            return pd.Series([col1_val_orig, col0_val_orig, 'B2_Col1_Prov_Col0_NoProv_INTERCAMBIADO'])
+    else:
+        return pd.Series([row['Provincia_Navegacion'], col1_val_orig, 'C_Ninguna_Reconocida_Usando_Nav'])
+
+def aplicar_reglas_fila_por_fila(df, valid_prov_names_set):
+    correcciones = df.apply(lambda row: determinar_prov_loc_corregidas(row, valid_prov_names_set), axis=1)
+    correcciones.columns = ['Provincia_Corregida', 'Localidad_Corregida', 'Regla_Aplicada']
+    return correcciones
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide las reglas vectorizadas contra la versión fila por fila.")
+    parser.add_argument('archivo', nargs='?', default='todos_los_cp_scraped_combinado.csv')
+    parser.add_argument('--provincias', default='provincias.csv')
+    parser.add_argument('--repeticiones', type=int, default=1, help="Replicar el archivo N veces para medir a mayor escala.")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.archivo, delimiter=';', dtype=str, encoding='utf-8')
+    if args.repeticiones > 1:
+        df = pd.concat([df] * args.repeticiones, ignore_index=True)
+    validos = set(normalizar_serie(pd.read_csv(args.provincias, dtype=str)['nom_prov']))
+    print(f"Filas: {len(df)} | Provincias de referencia: {len(validos)}")
+
+    inicio = time.perf_counter()
+    esperado = aplicar_reglas_fila_por_fila(df, validos)
+    t_fila = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    obtenido = aplicar_reglas(df, validos)
+    t_vector = time.perf_counter() - inicio
+
+    print(f"  Fila por fila (df.apply axis=1): {t_fila:8.3f} s")
+    print(f"  Vectorizado (np.select):         {t_vector:8.3f} s  ({t_fila / t_vector:.0f}x más rápido)")
+    conteo_esperado = esperado['Regla_Aplicada'].value_counts()
+    conteo_obtenido = obtenido['Regla_Aplicada'].value_counts()
+    print("\nConteo de reglas (fila por fila / vectorizado):")
+    print(pd.concat([conteo_esperado, conteo_obtenido], axis=1, keys=['fila_por_fila', 'vectorizado']).fillna(0).astype(int))
+
+if __name__ == "__main__":
+    main()
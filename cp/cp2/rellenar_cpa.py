@@ -0,0 +1,213 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+from collections import Counter, defaultdict
+
+import scraping_codigos_postales_v2 as scraper
+import crawler_async
+from cache_http import CacheHTTP, DIRECTORIO_CACHE
+from journal_scraping import ARCHIVO_JOURNAL, JournalScraping
+from metricas_crawler import METRICAS
+from normalizacion import normalize_name as normalizar
+
+# --- Relleno dirigido de CPA faltantes ---
+# Lee la tabla final (tabla_final_corregida_n.csv), busca las filas con CPA vacío o "Buscar CPA"
+# y arma una cola de trabajo solo con las páginas de localidad que pueden completarlas:
+#   1. Cada fila con hueco (nom_prov, nom_loca, cp) se asocia a las URLs cuyas filas de tabla ya
+#      descargadas (journal del scraper v2) tienen esa localidad y ese CP. Si una localidad no aparece
+#      en el journal, se busca por nombre en los links de la página de su provincia (1 pedido por provincia).
+#   2. Las URLs se piden en orden de cantidad de huecos que pueden llenar, con el crawler async
+#      (misma concurrencia y rate limit que el scraper) y sin retomar del journal, para ver la página actual.
+#   3. Los CPA reales encontrados se escriben en la tabla, en el mismo archivo y en el mismo orden.
+# El costo es proporcional a la cantidad de huecos, no al tamaño del país.
+# Uso: python rellenar_cpa.py --presupuesto 300
+
+TABLA_FINAL = 'tabla_final_corregida_n.csv'
+ARCHIVO_RELLENADOS = 'cpa_rellenados.csv'
+MARCADORES_SIN_CPA = {'', 'buscar cpa', 'nan'}
+
+def falta_cpa(cpa):
+    return cpa.strip().lower() in MARCADORES_SIN_CPA
+
+# --- Tabla final ---
+def leer_tabla(ruta):
+    with open(ruta, newline='', encoding='utf-8') as f:
+        lector = csv.reader(f, delimiter=';')
+        encabezado = next(lector)
+        return encabezado, [fila for fila in lector if fila]
+
+def guardar_tabla(ruta, encabezado, filas):
+    ruta_temporal = ruta + '.tmp'
+    with open(ruta_temporal, mode='w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter=';', lineterminator='\n') # Mismo formato que el to_csv de corregir_n_final.py
+        writer.writerow(encabezado)
+        writer.writerows(filas)
+    os.replace(ruta_temporal, ruta) # Así un corte nunca deja la tabla a medio escribir
+
+def huecos_de_la_tabla(encabezado, filas):
+    """[(índice de fila, prov normalizada, loc normalizada, cp), ...] de las filas sin CPA real."""
+    i_prov, i_loca, i_cp, i_cpa = (encabezado.index(c) for c in ('nom_prov', 'nom_loca', 'cp', 'cpa'))
+    return [
+        (i, normalizar(fila[i_prov]), normalizar(fila[i_loca]), fila[i_cp].strip())
+        for i, fila in enumerate(filas) if falta_cpa(fila[i_cpa])
+    ]
+
+# --- Cola de trabajo ---
+def indice_del_journal(ruta_journal):
+    """
+    A partir de las filas ya descargadas devuelve:
+      indice:  (loc normalizada, cp) -> {url: prov_navegacion normalizada}
+      paginas: url -> (provincia_nav, localidad_nav)
+    """
+    indice = defaultdict(dict)
+    paginas = {}
+    if not os.path.exists(ruta_journal):
+        return indice, paginas
+    journal = JournalScraping(ruta_journal)
+    consulta = "SELECT url, provincia_nav, localidad_nav, filas FROM paginas_localidad"
+    for url, provincia_nav, localidad_nav, filas in journal.conexion.execute(consulta):
+        paginas[url] = (provincia_nav, localidad_nav)
+        prov_nav = normalizar(provincia_nav)
+        for fila in json.loads(filas):
+            provincia_tabla, localidad_tabla, cp_tabla = fila[0], fila[1], fila[2].strip()
+            # Las reglas de limpieza a veces toman la localidad de la columna de provincia, así que se indexan las dos
+            for nombre in (localidad_tabla, provincia_tabla):
+                indice[(normalizar(nombre), cp_tabla)][url] = prov_nav
+    journal.cerrar()
+    return indice, paginas
+
+def urls_para_hueco(indice, prov, loc, cp):
+    candidatas = indice.get((loc, cp), {})
+    de_la_provincia = [url for url, prov_nav in candidatas.items() if prov_nav == prov]
+    return de_la_provincia or list(candidatas) # Si el nombre de la provincia no coincide (ej. CABA), todas
+
+def armar_cola(huecos_por_url, presupuesto):
+    """URLs ordenadas por cantidad de huecos que pueden llenar (las más rendidoras primero)."""
+    cola = sorted(huecos_por_url, key=lambda url: (-len(huecos_por_url[url]), url))
+    return cola[:presupuesto] if presupuesto else cola
+
+async def links_de_provincias(crawler, provincias_con_huecos):
+    """Para los huecos sin página conocida: prov normalizada -> {loc normalizada: (prov_nav, loc_nav, url)}."""
+    provincias = await crawler.obtener_provincias()
+    elegidas = [(nombre, url) for nombre, url in provincias if normalizar(nombre) in provincias_con_huecos]
+    listas = await asyncio.gather(*[crawler.obtener_localidades(url, nombre) for nombre, url in elegidas])
+    return {
+        normalizar(provincia_nombre): {normalizar(loc_nombre): (provincia_nombre, loc_nombre, loc_url) for loc_nombre, loc_url in localidades}
+        for (provincia_nombre, _), localidades in zip(elegidas, listas)
+    }
+
+async def descargar_cola(args, huecos, indice, paginas):
+    async with crawler_async.crear_sesion(args.concurrencia) as session:
+        crawler = crawler_async.CrawlerAsync(session, args.concurrencia, args.rps)
+
+        huecos_por_url = defaultdict(list)
+        destino_por_url = dict(paginas)
+        sin_pagina = []
+        for hueco in huecos:
+            _, prov, loc, cp = hueco
+            urls = urls_para_hueco(indice, prov, loc, cp)
+            if not urls:
+                sin_pagina.append(hueco)
+            for url in urls:
+                huecos_por_url[url].append(hueco)
+
+        if sin_pagina:
+            provincias_con_huecos = {prov for _, prov, _, _ in sin_pagina}
+            print(f"\n{len(sin_pagina)} huecos sin página en el journal: se buscan en los links de {len(provincias_con_huecos)} provincias.")
+            links = await links_de_provincias(crawler, provincias_con_huecos)
+            for hueco in sin_pagina:
+                _, prov, loc, _ = hueco
+                encontrado = links.get(prov, {}).get(loc)
+                if encontrado:
+                    provincia_nav, localidad_nav, url = encontrado
+                    huecos_por_url[url].append(hueco)
+                    destino_por_url[url] = (provincia_nav, localidad_nav)
+
+        cola = armar_cola(huecos_por_url, args.presupuesto)
+        cubiertos = len({h[0] for url in cola for h in huecos_por_url[url]})
+        print(f"\nCola de trabajo: {len(cola)} páginas de localidad (de {len(huecos_por_url)} candidatas) "
+              f"para {cubiertos} de {len(huecos)} huecos.")
+        if args.solo_planificar:
+            for url in cola:
+                print(f"  {len(huecos_por_url[url])} huecos: {url}")
+            return {}, huecos_por_url
+
+        tablas = await asyncio.gather(*[
+            crawler.obtener_cp_y_cpa_de_tabla(url, *destino_por_url[url]) for url in cola
+        ])
+        return dict(zip(cola, tablas)), huecos_por_url
+
+# --- Parche de la tabla ---
+def cpa_encontrados(filas_de_tabla):
+    """(loc normalizada, cp) -> primer CPA real de la página para ese par."""
+    encontrados = {}
+    for provincia_tabla, localidad_tabla, cp_tabla, cpa_tabla, *_ in filas_de_tabla:
+        if falta_cpa(cpa_tabla):
+            continue
+        for nombre in (localidad_tabla, provincia_tabla):
+            encontrados.setdefault((normalizar(nombre), cp_tabla.strip()), cpa_tabla.strip())
+    return encontrados
+
+def rellenar(filas, i_cpa, tablas_por_url, huecos_por_url):
+    rellenados = []
+    for url, filas_de_tabla in tablas_por_url.items():
+        if not filas_de_tabla:
+            continue
+        encontrados = cpa_encontrados(filas_de_tabla)
+        for i, _, loc, cp in huecos_por_url[url]:
+            cpa = encontrados.get((loc, cp))
+            if cpa and falta_cpa(filas[i][i_cpa]): # Un hueco puede estar en varias páginas: vale la primera
+                filas[i][i_cpa] = cpa
+                rellenados.append(filas[i] + [url])
+    return rellenados
+
+def main():
+    parser = argparse.ArgumentParser(description="Completa los CPA faltantes de la tabla final pidiendo solo las páginas necesarias.")
+    parser.add_argument('--tabla', default=TABLA_FINAL, help="Tabla final a completar (se modifica en el lugar).")
+    parser.add_argument('--presupuesto', type=int, default=0, help="Máximo de páginas de localidad a pedir (0 = sin límite).")
+    parser.add_argument('--concurrencia', type=int, default=8)
+    parser.add_argument('--rps', type=float, default=4.0)
+    parser.add_argument('--base-url', default=scraper.BASE_URL)
+    parser.add_argument('--journal', default=ARCHIVO_JOURNAL, help="Journal del scraper v2, para saber qué página tiene cada localidad.")
+    parser.add_argument('--cache', default=DIRECTORIO_CACHE)
+    parser.add_argument('--rellenados', default=ARCHIVO_RELLENADOS, help="CSV con las filas completadas y la URL de origen.")
+    parser.add_argument('--solo-planificar', action='store_true', help="Mostrar la cola de trabajo, sin descargar ni modificar la tabla.")
+    args = parser.parse_args()
+
+    inicio = time.monotonic()
+    encabezado, filas = leer_tabla(args.tabla)
+    huecos = huecos_de_la_tabla(encabezado, filas)
+    print(f"Tabla '{args.tabla}': {len(filas)} filas, {len(huecos)} sin CPA real.")
+    print(Counter(prov for _, prov, _, _ in huecos).most_common())
+    if not huecos:
+        return
+
+    scraper.BASE_URL = args.base_url.rstrip('/')
+    scraper.CACHE = CacheHTTP(args.cache) # Las páginas que no cambiaron responden 304
+    scraper.JOURNAL = None # Se quiere la página actual, no las filas guardadas en la corrida anterior
+    indice, paginas = indice_del_journal(args.journal)
+    print(f"Índice del journal: {len(indice)} pares (localidad, CP).")
+
+    tablas_por_url, huecos_por_url = asyncio.run(descargar_cola(args, huecos, indice, paginas))
+    if args.solo_planificar:
+        return
+
+    rellenados = rellenar(filas, encabezado.index('cpa'), tablas_por_url, huecos_por_url)
+    if rellenados:
+        guardar_tabla(args.tabla, encabezado, filas)
+    with open(args.rellenados, mode='w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter=';', lineterminator='\n')
+        writer.writerow(encabezado + ['url_origen'])
+        writer.writerows(rellenados)
+
+    fallidas = sum(1 for t in tablas_por_url.values() if t is None)
+    print(f"\nRelleno de CPA: {len(tablas_por_url)} páginas pedidas ({fallidas} fallidas), "
+          f"{len(rellenados)} de {len(huecos)} huecos completados en {time.monotonic() - inicio:.1f} s.")
+    print(f"Filas completadas en '{args.rellenados}'. Siguen sin CPA: {len(huecos) - len(rellenados)}")
+    METRICAS.imprimir_resumen()
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,15 @@
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import csv
 from urllib.parse import urljoin
 import time
 import os
 import re # Para la función clean_locality_name (si la usamos después)
+import argparse
+from cache_http import CacheHTTP, RespuestaCacheada, DIRECTORIO_CACHE
+from journal_scraping import JournalScraping, ARCHIVO_JOURNAL
+from archivo_paginas import EscritorArchivoPaginas
+from metricas_crawler import METRICAS, estado_de_error
 
 # --- Configuración ---
 BASE_URL = "https://codigo-postal.co"
@@ -15,37 +20,88 @@ SLEEP_TIME_PROV = 2   # Segundos de pausa entre provincias
 SLEEP_TIME_LOC = 2    # Segundos de pausa entre localidades/CP_pages
 MAX_RETRIES = 3       # Máximo de reintentos por URL
 
+CACHE = None          # CacheHTTP activa (ver cache_http.py); None = sin caché
+MODO_REPLAY = False   # True = no se toca la red, todo sale de la caché
+JOURNAL = None        # JournalScraping activo (ver journal_scraping.py); None = sin journal
+ARCHIVO_HTML = None   # EscritorArchivoPaginas activo (ver archivo_paginas.py); None = no se archiva
+SOLO_DESCARGAR = False # True = las páginas de localidad solo se archivan; se parsean después con parsear_archivo_paginas.py
+
+# Parser de BeautifulSoup: 'html.parser' (estándar) o 'lxml' (más rápido, requiere instalar lxml).
+PARSER_HTML = 'html.parser'
+# Solo se construye el subárbol que se usa de cada página, no el documento entero
+STRAINER_PROVINCIAS = SoupStrainer('ul', class_='column-list')
+STRAINER_LOCALIDADES = SoupStrainer('ul', class_='cities')
+STRAINER_TABLA_CP = SoupStrainer('table')
+
+# Dominio real del sitio. Si BASE_URL apunta a otro lado (p. ej. un servidor local con páginas
+# grabadas), los links absolutos a este dominio se reescriben para que apunten a BASE_URL.
+SITIO_ORIGINAL = "https://codigo-postal.co"
+
+HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"}
+
+ARCHIVO_METRICAS_JSON = "metricas_crawler.json"
+
+ENCABEZADO_CSV = [
+    "Provincia_Navegacion", "Localidad_Agrupadora_Link",
+    "Provincia_Tabla", "Localidad_Especifica_Tabla",
+    "CP_Tabla", "CPA_Tabla", "CodTel_Tabla"
+]
+
 # --- Función Auxiliar para Peticiones Web con Reintentos ---
 def make_request(url, headers, current_retry=0): # Eliminado retries de los args, usa MAX_RETRIES
     # El print ahora incluye el nombre de la función que llama, para más contexto
     # Se podría añadir un parámetro extra para pasar el nombre de la función llamante
+    if MODO_REPLAY:
+        texto = CACHE.leer(url)
+        if texto is None:
+            print(f"    REPLAY: {url} no está en la caché, se omite.")
+            return None
+        METRICAS.registrar_pagina_desde_cache()
+        return RespuestaCacheada(texto)
+
     print(f"    Intentando acceder (intento {current_retry + 1}/{MAX_RETRIES}): {url}")
     try:
-        response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        headers_peticion = headers
+        if CACHE:
+            headers_peticion = {**headers, **CACHE.encabezados_condicionales(url)}
+        inicio_peticion = time.monotonic()
+        response = requests.get(url, headers=headers_peticion, timeout=REQUEST_TIMEOUT)
+        METRICAS.registrar_peticion(time.monotonic() - inicio_peticion, response.status_code, len(response.content))
+        if response.status_code == 304 and CACHE:
+            CACHE.marcar_revalidada(url)
+            METRICAS.registrar_pagina_desde_cache()
+            return RespuestaCacheada(CACHE.leer(url))
         response.raise_for_status()
+        if CACHE:
+            CACHE.guardar(url, response.text, response.headers.get('ETag'), response.headers.get('Last-Modified'))
         return response
     except requests.exceptions.RequestException as e:
         print(f"    ERROR en intento {current_retry + 1} para {url}: {e}")
         if current_retry < MAX_RETRIES - 1:
+            METRICAS.registrar_reintento(estado_de_error(e))
             retry_delay = 5 * (current_retry + 1)
             print(f"    Reintentando en {retry_delay} segundos...")
-            time.sleep(retry_delay)
+            pausar('backoff_reintento', retry_delay)
             return make_request(url, headers, current_retry + 1) # Pasar current_retry incrementado
         else:
+            METRICAS.registrar_fallo(estado_de_error(e))
             print(f"    Todos los {MAX_RETRIES} intentos fallaron para {url}.")
             return None
 
-# --- Funciones de Scraping ---
-def obtener_provincias():
-    url = f"{BASE_URL}/argentina/"
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"}
-    print(f"\nObteniendo lista de provincias desde: {url}")
-    
-    response = make_request(url, headers)
-    if not response:
-        return []
+def pausar(motivo, segundos):
+    time.sleep(segundos)
+    METRICAS.registrar_pausa(motivo, segundos)
+
+# --- Funciones de Parseo (sin red, reutilizadas por el modo async) ---
+def resolver_enlace(enlace_relativo):
+    enlace_absoluto = urljoin(BASE_URL, enlace_relativo)
+    if BASE_URL != SITIO_ORIGINAL and enlace_absoluto.startswith(SITIO_ORIGINAL):
+        enlace_absoluto = BASE_URL + enlace_absoluto[len(SITIO_ORIGINAL):]
+    return enlace_absoluto
 
-    soup = BeautifulSoup(response.text, 'html.parser')
+@METRICAS.cronometrar('parsear_provincias')
+def parsear_provincias(html, parser=None):
+    soup = BeautifulSoup(html, parser or PARSER_HTML, parse_only=STRAINER_PROVINCIAS)
     provincias = []
     selector_provincias = "ul.column-list li a" # Selector para los links de provincias
     elementos_provincia = soup.select(selector_provincias)
@@ -55,20 +111,14 @@ def obtener_provincias():
         nombre = a.text.strip()
         enlace_relativo = a.get('href')
         if enlace_relativo:
-            enlace_absoluto = urljoin(BASE_URL, enlace_relativo)
+            enlace_absoluto = resolver_enlace(enlace_relativo)
             provincias.append((nombre, enlace_absoluto))
     print(f"  >> Provincias: Links válidos (con href) añadidos: {len(provincias)}")
     return provincias
 
-def obtener_localidades(provincia_url, provincia_nombre):
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"}
-    print(f"  Obteniendo links de localidad para {provincia_nombre} desde: {provincia_url}")
-    
-    response = make_request(provincia_url, headers)
-    if not response:
-        return []
-        
-    soup = BeautifulSoup(response.text, 'html.parser')
+@METRICAS.cronometrar('parsear_localidades')
+def parsear_localidades(html, provincia_nombre, parser=None):
+    soup = BeautifulSoup(html, parser or PARSER_HTML, parse_only=STRAINER_LOCALIDADES)
     localidades = []
     selector_localidades = "ul.cities li a" # Selector para links de localidades en pág. de provincia
     
@@ -80,7 +130,7 @@ def obtener_localidades(provincia_url, provincia_nombre):
         nombre = a_tag.text.strip()
         enlace_relativo = a_tag.get('href')
         if enlace_relativo:
-            enlace_absoluto = urljoin(BASE_URL, enlace_relativo)
+            enlace_absoluto = resolver_enlace(enlace_relativo)
             localidades.append((nombre, enlace_absoluto))
             valid_links_count += 1
         else:
@@ -90,16 +140,9 @@ def obtener_localidades(provincia_url, provincia_nombre):
     print(f"    >> Localidades en {provincia_nombre}: Links válidos (con href) añadidos: {valid_links_count}")
     return localidades
 
-def obtener_cp_y_cpa_de_tabla(localidad_url_navegada, nombre_provincia_navegada, nombre_localidad_navegada):
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"}
-    print(f"    Obteniendo CP/CPA para '{nombre_localidad_navegada}' ({nombre_provincia_navegada}) desde: {localidad_url_navegada}")
-
-    response = make_request(localidad_url_navegada, headers)
-    if not response:
-        print(f"      No se pudo obtener la página de CP para {localidad_url_navegada} después de reintentos.")
-        return []
-        
-    soup = BeautifulSoup(response.text, 'html.parser')
+@METRICAS.cronometrar('parsear_cp_y_cpa_de_tabla')
+def parsear_cp_y_cpa_de_tabla(html, localidad_url_navegada, parser=None):
+    soup = BeautifulSoup(html, parser or PARSER_HTML, parse_only=STRAINER_TABLA_CP)
     datos_tabla = []
     tabla = soup.find("table") # Asume que la primera tabla es la correcta
     if not tabla:
@@ -130,6 +173,106 @@ def obtener_cp_y_cpa_de_tabla(localidad_url_navegada, nombre_provincia_navegada,
             
     return datos_tabla
 
+# --- Funciones de Scraping ---
+@METRICAS.cronometrar('obtener_provincias')
+def obtener_provincias():
+    url = f"{BASE_URL}/argentina/"
+    print(f"\nObteniendo lista de provincias desde: {url}")
+    
+    response = make_request(url, HEADERS)
+    if not response:
+        return []
+
+    archivar_pagina(url, 'provincias', response.text)
+    return parsear_provincias(response.text)
+
+@METRICAS.cronometrar('obtener_localidades')
+def obtener_localidades(provincia_url, provincia_nombre):
+    print(f"  Obteniendo links de localidad para {provincia_nombre} desde: {provincia_url}")
+    
+    response = make_request(provincia_url, HEADERS)
+    if not response:
+        return []
+        
+    archivar_pagina(provincia_url, 'provincia', response.text, provincia_nombre)
+    return parsear_localidades(response.text, provincia_nombre)
+
+@METRICAS.cronometrar('obtener_cp_y_cpa_de_tabla')
+def obtener_cp_y_cpa_de_tabla(localidad_url_navegada, nombre_provincia_navegada, nombre_localidad_navegada):
+    print(f"    Obteniendo CP/CPA para '{nombre_localidad_navegada}' ({nombre_provincia_navegada}) desde: {localidad_url_navegada}")
+
+    response = make_request(localidad_url_navegada, HEADERS)
+    if not response:
+        print(f"      No se pudo obtener la página de CP para {localidad_url_navegada} después de reintentos.")
+        return None # None (y no []) para distinguir "falló la descarga" de "página sin tabla"
+        
+    archivar_pagina(localidad_url_navegada, 'localidad', response.text, nombre_provincia_navegada, nombre_localidad_navegada)
+    if SOLO_DESCARGAR:
+        return [] # Se parsea después, desde el archivo de páginas
+    return parsear_cp_y_cpa_de_tabla(response.text, localidad_url_navegada)
+
+def archivar_pagina(url, tipo, html, provincia="", localidad=""):
+    if ARCHIVO_HTML is not None:
+        ARCHIVO_HTML.escribir(url, tipo, html, provincia, localidad)
+
+# --- Funciones Auxiliares de Salida (compartidas entre modo secuencial y async) ---
+def ruta_csv_provincia(provincia_nombre):
+    nombre_archivo_provincia_limpio = re.sub(r'[^\w\.-]', '_', provincia_nombre) # Nombre más seguro para archivo
+    nombre_archivo_provincia = f"cp_{nombre_archivo_provincia_limpio}.csv"
+    return os.path.join(OUTPUT_DIRECTORY, nombre_archivo_provincia)
+
+def agregar_filas_unicas(filas_de_tabla, provincia_nombre, localidad_nav_nombre, seen_data_tuples, destino):
+    """Agrega a 'destino' las filas de tabla no vistas todavía. Devuelve cuántas se agregaron."""
+    count_nuevos = 0
+    for prov_tabla, loc_tabla, cp_tabla, cpa_tabla, codtel_tabla in filas_de_tabla:
+        data_tuple_key = (prov_tabla, loc_tabla, cp_tabla, cpa_tabla) 
+        if data_tuple_key not in seen_data_tuples:
+            seen_data_tuples.add(data_tuple_key)
+            destino.append([
+                provincia_nombre, localidad_nav_nombre, 
+                prov_tabla, loc_tabla, cp_tabla, cpa_tabla, codtel_tabla
+            ])
+            count_nuevos += 1
+    return count_nuevos
+
+def filas_retomadas_del_journal(localidad_url):
+    """Filas crudas de una página ya procesada en una ejecución anterior (None si hay que descargarla)."""
+    if JOURNAL is None:
+        return None
+    filas_de_tabla = JOURNAL.filas_crudas(localidad_url)
+    if filas_de_tabla is not None:
+        print(f"      Retomado del journal (sin descargar): {localidad_url}")
+    return filas_de_tabla
+
+def registrar_en_journal(localidad_url, provincia_nombre, localidad_nav_nombre, filas_de_tabla):
+    if JOURNAL is not None and filas_de_tabla is not None:
+        JOURNAL.registrar_pagina(localidad_url, provincia_nombre, localidad_nav_nombre, filas_de_tabla)
+
+def emitir_filas_localidad(localidad_url, filas_de_tabla, provincia_nombre, localidad_nav_nombre, seen_data_tuples, destino):
+    """
+    Deduplica las filas de una página de localidad y las agrega a 'destino'.
+    Con journal, la deduplicación usa el índice persistente y el resultado queda registrado,
+    así que una página ya emitida en una ejecución anterior no se vuelve a deduplicar.
+    """
+    if JOURNAL is None:
+        return agregar_filas_unicas(filas_de_tabla or [], provincia_nombre, localidad_nav_nombre, seen_data_tuples, destino)
+    filas_emitidas = JOURNAL.filas_emitidas(localidad_url)
+    if filas_emitidas is None:
+        if filas_de_tabla is None:
+            return 0 # Falló la descarga: no se registra nada, se reintenta en la próxima ejecución
+        filas_emitidas = []
+        with JOURNAL.transaccion():
+            agregar_filas_unicas(filas_de_tabla, provincia_nombre, localidad_nav_nombre, JOURNAL.vistos, filas_emitidas)
+            JOURNAL.guardar_emitidas(localidad_url, filas_emitidas)
+    destino.extend(filas_emitidas)
+    return len(filas_emitidas)
+
+def guardar_csv_provincia(ruta_archivo_provincia, datos_para_esta_provincia):
+    with open(ruta_archivo_provincia, mode='w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file, delimiter=';')
+        writer.writerow(ENCABEZADO_CSV)
+        writer.writerows(datos_para_esta_provincia)
+
 def main():
     print("Iniciando script de scraping v3 (incremental por provincia, con deduplicación y reintentos)...")
     
@@ -143,25 +286,24 @@ def main():
         print("No se pudieron obtener las provincias. Terminando script.")
         return
     
-    # Este set es para deduplicar DENTRO DE UNA MISMA EJECUCIÓN del script.
-    # Si el script se detiene y se reinicia, las provincias ya guardadas se saltarán,
-    # pero este set se reiniciará. La deduplicación global final se haría al combinar los CSVs.
+    # Este set es para deduplicar DENTRO DE UNA MISMA EJECUCIÓN del script (solo si no hay journal).
+    # Con journal (por defecto) la deduplicación usa el índice persistente de journal_scraping.py,
+    # que sobrevive a los reinicios.
     seen_data_tuples_this_run = set() 
     
     print("\n--- Iniciando extracción completa por provincia ---")
     for provincia_iter_nombre, provincia_iter_url in provincias:
         
-        nombre_archivo_provincia_limpio = re.sub(r'[^\w\.-]', '_', provincia_iter_nombre) # Nombre más seguro para archivo
-        nombre_archivo_provincia = f"cp_{nombre_archivo_provincia_limpio}.csv"
-        ruta_archivo_provincia = os.path.join(OUTPUT_DIRECTORY, nombre_archivo_provincia)
+        ruta_archivo_provincia = ruta_csv_provincia(provincia_iter_nombre)
 
-        if os.path.exists(ruta_archivo_provincia):
+        if os.path.exists(ruta_archivo_provincia) and not MODO_REPLAY: # En replay se regeneran todos
             print(f"\nArchivo {ruta_archivo_provincia} ya existe. Saltando provincia: {provincia_iter_nombre}.")
             continue
 
         print(f"\nProcesando Provincia: {provincia_iter_nombre} ({provincia_iter_url})")
         print(f"  Guardará en: {ruta_archivo_provincia}")
-        time.sleep(SLEEP_TIME_PROV) 
+        if not MODO_REPLAY:
+            pausar('pausa_entre_provincias', SLEEP_TIME_PROV)
         
         localidades_nav = obtener_localidades(provincia_iter_url, provincia_iter_nombre)
         
@@ -178,35 +320,29 @@ def main():
             
         for localidad_nav_nombre, localidad_nav_url in localidades_nav:
             print(f"    Procesando link de localidad (pág. agrupadora): {localidad_nav_nombre}")
-            time.sleep(SLEEP_TIME_LOC) 
-            
-            filas_de_tabla = obtener_cp_y_cpa_de_tabla(localidad_nav_url, provincia_iter_nombre, localidad_nav_nombre)
+            filas_de_tabla = filas_retomadas_del_journal(localidad_nav_url)
+            if filas_de_tabla is None:
+                if not MODO_REPLAY:
+                    pausar('pausa_entre_localidades', SLEEP_TIME_LOC)
+                filas_de_tabla = obtener_cp_y_cpa_de_tabla(localidad_nav_url, provincia_iter_nombre, localidad_nav_nombre)
+                registrar_en_journal(localidad_nav_url, provincia_iter_nombre, localidad_nav_nombre, filas_de_tabla)
+            if SOLO_DESCARGAR:
+                continue
             
             if filas_de_tabla:
-                count_nuevos_para_esta_loc_nav = 0
-                for prov_tabla, loc_tabla, cp_tabla, cpa_tabla, codtel_tabla in filas_de_tabla:
-                    data_tuple_key = (prov_tabla, loc_tabla, cp_tabla, cpa_tabla) 
-                    if data_tuple_key not in seen_data_tuples_this_run:
-                        seen_data_tuples_this_run.add(data_tuple_key)
-                        datos_para_esta_provincia.append([
-                            provincia_iter_nombre, localidad_nav_nombre, 
-                            prov_tabla, loc_tabla, cp_tabla, cpa_tabla, codtel_tabla
-                        ])
-                        count_nuevos_para_esta_loc_nav +=1
+                count_nuevos_para_esta_loc_nav = emitir_filas_localidad(
+                    localidad_nav_url, filas_de_tabla, provincia_iter_nombre, localidad_nav_nombre,
+                    seen_data_tuples_this_run, datos_para_esta_provincia
+                )
                 if count_nuevos_para_esta_loc_nav > 0:
                      print(f"      De {len(filas_de_tabla)} filas en tabla, {count_nuevos_para_esta_loc_nav} registros únicos (P,L,CP,CPA de tabla) añadidos para esta provincia (en esta ejecución).")
             else:
                 print(f"      No se encontraron datos de CP/CPA en la tabla para {localidad_nav_nombre}.")
 
-        if datos_para_esta_provincia:
-            with open(ruta_archivo_provincia, mode='w', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file, delimiter=';')
-                writer.writerow([
-                    "Provincia_Navegacion", "Localidad_Agrupadora_Link", 
-                    "Provincia_Tabla", "Localidad_Especifica_Tabla", 
-                    "CP_Tabla", "CPA_Tabla", "CodTel_Tabla"
-                ])
-                writer.writerows(datos_para_esta_provincia)
+        if SOLO_DESCARGAR:
+            print(f"  Páginas de {provincia_iter_nombre} archivadas (los CSV se generan con parsear_archivo_paginas.py).")
+        elif datos_para_esta_provincia:
+            guardar_csv_provincia(ruta_archivo_provincia, datos_para_esta_provincia)
             print(f"  Datos de {provincia_iter_nombre} ({len(datos_para_esta_provincia)} filas) guardados en {ruta_archivo_provincia}")
         else:
             print(f"  No se guardaron datos para {provincia_iter_nombre} (no se encontró información nueva de CP/CPA o localidades).")
@@ -220,5 +356,79 @@ def main():
     print(f"Los archivos CSV individuales están en la carpeta: {OUTPUT_DIRECTORY}")
     print("El siguiente paso sería combinar estos archivos CSV y realizar una deduplicación final si es necesario.")
 
+def parsear_argumentos():
+    parser = argparse.ArgumentParser(description="Scraping de códigos postales por provincia (codigo-postal.co).")
+    parser.add_argument('--modo', choices=['secuencial', 'async'], default='secuencial',
+                        help="'secuencial' (requests + pausas fijas) o 'async' (asyncio con concurrencia acotada y rate limit por host).")
+    parser.add_argument('--concurrencia', type=int, default=8,
+                        help="Modo async: máximo de peticiones simultáneas (y conexiones keep-alive en el pool).")
+    parser.add_argument('--rps', type=float, default=4.0,
+                        help="Modo async: peticiones por segundo permitidas por host (token bucket).")
+    parser.add_argument('--base-url', default=BASE_URL,
+                        help="URL base del sitio. Útil para apuntar a un servidor local con páginas grabadas.")
+    parser.add_argument('--salida', default=OUTPUT_DIRECTORY,
+                        help="Carpeta donde se guardan los CSV por provincia.")
+    parser.add_argument('--cache', default=DIRECTORIO_CACHE,
+                        help="Carpeta de la caché HTTP en disco (respuestas comprimidas + ETag/Last-Modified).")
+    parser.add_argument('--sin-cache', action='store_true',
+                        help="No leer ni escribir la caché HTTP.")
+    parser.add_argument('--replay', action='store_true',
+                        help="Sin red: vuelve a parsear todo desde la caché y regenera los CSV (aunque ya existan).")
+    parser.add_argument('--journal', default=ARCHIVO_JOURNAL,
+                        help="Archivo SQLite con las páginas de localidad ya procesadas y el índice de deduplicación.")
+    parser.add_argument('--sin-journal', action='store_true',
+                        help="No usar el journal (deduplicación solo en memoria, sin retomar por página).")
+    parser.add_argument('--archivo-html', default=None,
+                        help="Archivo .gz (tipo WARC) donde se guarda el HTML crudo de cada página descargada.")
+    parser.add_argument('--solo-descargar', action='store_true',
+                        help="Con --archivo-html: no parsear las páginas de localidad; hacerlo después con parsear_archivo_paginas.py.")
+    parser.add_argument('--parser', default=PARSER_HTML, choices=['html.parser', 'lxml'],
+                        help="Parser de BeautifulSoup.")
+    parser.add_argument('--metricas-json', default=ARCHIVO_METRICAS_JSON,
+                        help="Archivo donde se guarda el resumen de métricas de la corrida.")
+    parser.add_argument('--metricas-prometheus', default=None,
+                        help="Opcional: archivo donde se guardan las métricas en formato de texto de Prometheus.")
+    return parser.parse_args()
+
+def guardar_metricas(args):
+    METRICAS.imprimir_resumen()
+    METRICAS.guardar_json(args.metricas_json)
+    print(f"Métricas guardadas en: {args.metricas_json}")
+    if args.metricas_prometheus:
+        METRICAS.guardar_prometheus(args.metricas_prometheus)
+        print(f"Métricas (formato Prometheus) guardadas en: {args.metricas_prometheus}")
+
+def configurar(args):
+    """Aplica los argumentos de línea de comandos a la configuración del módulo."""
+    global BASE_URL, OUTPUT_DIRECTORY, CACHE, MODO_REPLAY, JOURNAL, ARCHIVO_HTML, SOLO_DESCARGAR, PARSER_HTML
+    BASE_URL = args.base_url.rstrip('/')
+    OUTPUT_DIRECTORY = args.salida
+    MODO_REPLAY = args.replay
+    if args.replay and args.sin_cache:
+        raise SystemExit("ERROR: --replay necesita la caché, no se puede combinar con --sin-cache.")
+    if not args.sin_cache:
+        CACHE = CacheHTTP(args.cache)
+    if args.solo_descargar and not args.archivo_html:
+        raise SystemExit("ERROR: --solo-descargar necesita --archivo-html.")
+    SOLO_DESCARGAR = args.solo_descargar
+    PARSER_HTML = args.parser
+    if args.archivo_html:
+        ARCHIVO_HTML = EscritorArchivoPaginas(args.archivo_html)
+    # En replay se quiere volver a parsear todo, así que no se retoma nada del journal.
+    # Con --solo-descargar no hay filas parseadas que registrar.
+    if not args.sin_journal and not args.replay and not args.solo_descargar:
+        JOURNAL = JournalScraping(args.journal)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parsear_argumentos()
+    if args.modo == 'async' and not args.replay:
+        import crawler_async
+        crawler_async.main_async(args)
+    else:
+        configurar(args) # El replay no usa la red, así que siempre va por el camino secuencial
+        main()
+        if CACHE:
+            print(CACHE.resumen())
+        if JOURNAL:
+            print(JOURNAL.resumen())
+        guardar_metricas(args)
\ No newline at end of file
@@ -0,0 +1,45 @@
+import argparse
+import os
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from functools import partial
+
+# --- Servidor local con páginas grabadas del sitio de códigos postales ---
+# Sirve un directorio con la misma estructura de rutas que codigo-postal.co, por ejemplo:
+#   paginas_grabadas/argentina/index.html
+#   paginas_grabadas/argentina/buenos-aires/index.html
+#   paginas_grabadas/argentina/buenos-aires/11-de-septiembre/index.html
+# Sirve para probar el scraper (secuencial o async) sin tocar el sitio real:
+#   python servidor_paginas_grabadas.py --directorio paginas_grabadas --puerto 8000
+#   python scraping_codigos_postales_v2.py --modo async --base-url http://127.0.0.1:8000
+
+DIRECTORIO_POR_DEFECTO = "paginas_grabadas"
+
+class ManejadorKeepAlive(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Permite conexiones keep-alive, como el sitio real
+    extensions_map = {**SimpleHTTPRequestHandler.extensions_map, '.html': 'text/html; charset=utf-8'}
+
+    def log_message(self, format, *args):
+        pass # Silencioso: el scraper ya imprime cada URL
+
+def main():
+    parser = argparse.ArgumentParser(description="Sirve páginas grabadas para probar el scraper localmente.")
+    parser.add_argument('--directorio', default=DIRECTORIO_POR_DEFECTO)
+    parser.add_argument('--puerto', type=int, default=8000)
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directorio):
+        print(f"ERROR: No existe el directorio de páginas grabadas '{args.directorio}'.")
+        return
+
+    manejador = partial(ManejadorKeepAlive, directory=args.directorio)
+    servidor = ThreadingHTTPServer(("127.0.0.1", args.puerto), manejador)
+    print(f"Sirviendo '{args.directorio}' en http://127.0.0.1:{args.puerto} (Ctrl+C para terminar)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import sys
+
+import pandas as pd
+
+import emparejador_difuso
+from emparejador_difuso import ACEPTADOS_OUTPUT_FILE, CANDIDATOS_OUTPUT_FILE, COLUMNAS_ACEPTADOS, emparejar
+
+# La decisión de aceptar no depende de --top-k y emparejador_difuso.py no deja salidas de una corrida anterior.
+# Uso: python -m pytest test_emparejador_difuso.py   (desde cp/cp2)
+
+# 'villa mari' se parece lo mismo a 'villa maria' que a 'villa marie': no se puede aceptar ninguna
+MAESTRO = pd.DataFrame({
+    'master_id_prov': [1, 1, 1],
+    'master_nom_prov': ['CORDOBA'] * 3,
+    'master_id_depto': [10, 10, 11],
+    'master_nom_depto': ['GENERAL SAN MARTIN', 'GENERAL SAN MARTIN', 'RIO CUARTO'],
+    'master_id_loca': [100, 101, 102],
+    'master_nom_loca': ['VILLA MARIA', 'VILLA MARIE', 'ALCIRA'],
+    'master_nom_prov_norm': ['cordoba'] * 3,
+    'master_nom_loca_norm': ['villa maria', 'villa marie', 'alcira'],
+})
+
+def _sin_match(localidades):
+    return pd.DataFrame({'nom_prov_scraped_no_match': ['cordoba'] * len(localidades),
+                         'nom_loca_scraped_no_match': localidades,
+                         'cp': ['5900'] * len(localidades), 'cpa': ['Buscar CPA'] * len(localidades)})
+
+def test_top_k_1_no_saltea_el_margen():
+    for k in (1, 3):
+        df_candidatos, df_aceptados, df_restantes = emparejar(_sin_match(['villa mari', 'alcira']), MAESTRO, k=k)
+        assert list(df_restantes['nom_loca_scraped_no_match']) == ['villa mari']
+        assert list(df_aceptados['id_loca']) == [102]
+        assert df_candidatos.groupby('fila').size().max() <= k
+        assert list(df_candidatos.loc[df_candidatos['aceptado'], 'candidato']) == ['alcira']
+
+def test_sin_aceptadas_escribe_solo_el_encabezado(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(emparejador_difuso.cruzar_con_maestros_v3, 'cargar_maestro_pdl', lambda: MAESTRO)
+    (tmp_path / ACEPTADOS_OUTPUT_FILE).write_text('de;una;corrida;anterior\n', encoding='utf-8')
+    _sin_match(['villa mari']).to_csv('sin_match.csv', index=False, sep=';')
+
+    monkeypatch.setattr(sys, 'argv', ['emparejador_difuso.py', '--entrada', 'sin_match.csv', '--top-k', '1'])
+    emparejador_difuso.main()
+    assert (tmp_path / ACEPTADOS_OUTPUT_FILE).read_text(encoding='utf-8') == ';'.join(COLUMNAS_ACEPTADOS) + '\n'
+    assert len(pd.read_csv(CANDIDATOS_OUTPUT_FILE, sep=';')) == 1
+
+    # Sin filas de entrada también se reescriben las salidas
+    _sin_match([]).to_csv('sin_match.csv', index=False, sep=';')
+    (tmp_path / ACEPTADOS_OUTPUT_FILE).write_text('de;una;corrida;anterior\n', encoding='utf-8')
+    emparejador_difuso.main()
+    assert (tmp_path / ACEPTADOS_OUTPUT_FILE).read_text(encoding='utf-8') == ';'.join(COLUMNAS_ACEPTADOS) + '\n'
+    assert pd.read_csv(CANDIDATOS_OUTPUT_FILE, sep=';').empty
@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from normalizacion import normalizar_serie
+from reglas_prov_loc import aplicar_reglas, aplicar_reglas_fila_por_fila
+
+# Las reglas vectorizadas (np.select) tienen que dar exactamente lo mismo que la versión fila por fila.
+# Uso: python -m pytest test_reglas_prov_loc.py   (desde cp/cp2)
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+PROVINCIAS = {'buenos aires', 'cordoba', 'santa fe', 'la rioja'}
+COLUMNAS = ['Provincia_Navegacion', 'Provincia_Tabla', 'Localidad_Especifica_Tabla']
+
+# Un caso por rama (y los bordes: nulos, tildes, 'a+-' y paréntesis)
+FILAS = [
+    ('Buenos Aires', 'Buenos Aires', 'Churruca'),               # A1
+    ('Córdoba', 'Buenos Aires', 'Villa María'),                 # A2
+    ('Córdoba', 'Santa Fe', 'La Rioja'),                        # A3
+    ('Córdoba', 'Villa María', 'CORDOBA'),                      # B1
+    ('Santa Fe', 'Chilecito', 'La Rioja (Capital)'),            # B2
+    ('La Rioja', 'Chilecito', 'Nonogasta'),                     # C
+    ('Buenos Aires', np.nan, 'Churruca'),                       # C con nulo
+    ('Buenos Aires', 'Buenos Aires', np.nan),                   # A1 con nulo
+    (np.nan, 'Santa Fe', 'Rosario'),                            # A2 sin navegación
+    ('Cordoba', ' cordoba ', 'Espa a+-a'),                      # A1 con espacios
+]
+
+def _comparar(df, validos):
+    esperado = aplicar_reglas_fila_por_fila(df, validos)
+    obtenido = aplicar_reglas(df, validos)
+    pd.testing.assert_frame_equal(obtenido, esperado)
+    return obtenido
+
+def test_reglas_iguales_a_fila_por_fila():
+    df = pd.DataFrame(FILAS, columns=COLUMNAS, dtype=object)
+    obtenido = _comparar(df, PROVINCIAS)
+    assert list(obtenido['Regla_Aplicada']) == [
+        'A1_Col0_Prov_Coincide_Nav', 'A2_Col0_Prov_Col1_NoProv', 'A3_Col0_Prov_Col1_TambienProv_Col0_NoCoincideNav',
+        'B1_Col1_Prov_Coincide_Nav_INTERCAMBIADO', 'B2_Col1_Prov_Col0_NoProv_INTERCAMBIADO',
+        'C_Ninguna_Reconocida_Usando_Nav', 'C_Ninguna_Reconocida_Usando_Nav', 'A1_Col0_Prov_Coincide_Nav',
+        'A2_Col0_Prov_Col1_NoProv', 'A1_Col0_Prov_Coincide_Nav',
+    ]
+
+def test_indice_no_consecutivo():
+    df = pd.DataFrame(FILAS, columns=COLUMNAS, dtype=object, index=range(100, 100 + 3 * len(FILAS), 3))
+    _comparar(df, PROVINCIAS)
+
+def test_scrape_combinado():
+    archivo = os.path.join(DIRECTORIO, 'todos_los_cp_scraped_combinado.csv')
+    if not os.path.exists(archivo):
+        pytest.skip("falta todos_los_cp_scraped_combinado.csv")
+    df = pd.read_csv(archivo, delimiter=';', dtype=str, encoding='utf-8')
+    validos = set(normalizar_serie(pd.read_csv(os.path.join(DIRECTORIO, 'provincias.csv'), dtype=str)['nom_prov']))
+    _comparar(df, validos)
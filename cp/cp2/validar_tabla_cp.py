@@ -0,0 +1,226 @@
+import argparse
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+import corregir_n_final
+import cruzar_con_maestros_v3
+import normalizacion # noqa: F401 (agrega la raíz del repositorio a sys.path)
+from esquemas import leer_con_esquema, tipar
+from establecimientos.cpa import LETRA_CPA
+
+# --- Validación de la tabla final de CP antes de importarla ---
+# Reglas declarativas (REGLAS) evaluadas sobre columnas enteras, sin recorrer filas:
+#   - las reglas de texto (patrón, lista, prohibido, mapeo) se evalúan una vez por valor distinto y se expanden
+#     a las filas por código (la tabla se pasa entera a categóricas una vez, así cp y cpa también);
+#   - las referenciales buscan las combinaciones de IDs en los maestros (provincias.csv, deptos.csv, loca.csv).
+# Cada regla tiene severidad 'error' o 'advertencia'. Se informa la cantidad de filas que viola cada regla
+# y se guardan hasta MUESTRAS_POR_REGLA filas de ejemplo por regla.
+# Como compuerta: sale con código 1 si alguna regla de severidad 'error' tiene violaciones
+# (--solo-reporte para informar sin cortar; --ignorar REGLA para dejar afuera reglas puntuales).
+# Uso: python validar_tabla_cp.py [tabla_final_corregida_n.csv] [--ignorar cpa_marcador] [--escala 40]
+
+TABLA_POR_DEFECTO = corregir_n_final.OUTPUT_FILE
+RESUMEN_OUTPUT_FILE = 'validacion_tabla_cp.csv'
+MUESTRAS_OUTPUT_FILE = 'validacion_tabla_cp_muestras.csv'
+MUESTRAS_POR_REGLA = 20
+
+ERROR = 'error'
+ADVERTENCIA = 'advertencia'
+
+# Textos que el scraping dejó en lugar de un CPA (los mismos que busca rellenar_cpa.py, sin distinguir mayúsculas)
+MARCADORES_SIN_CPA = ('buscar cpa', 'nan')
+
+# tipo: requerida | patron | rango | en_lista | prohibido | mapeo | coincide | en_maestro | unica
+# parametro según el tipo (ver COMPROBACIONES); excepto: valores que la regla no evalúa (sin distinguir mayúsculas)
+Regla = namedtuple('Regla', 'nombre tipo columnas parametro severidad descripcion excepto', defaults=((),))
+
+REGLAS = [
+    Regla('ids_requeridos', 'requerida', ('id_prov', 'id_depto', 'id_loca'), None, ERROR,
+          "Falta algún ID (o no es numérico)"),
+    Regla('cp_requerido', 'requerida', ('cp',), None, ERROR, "Falta el CP"),
+    Regla('cp_cuatro_digitos', 'patron', ('cp',), r'\d{4}', ERROR, "El CP no son cuatro dígitos"),
+    Regla('cp_rango', 'rango', ('cp',), (1000, 9499), ERROR, "El CP está fuera del rango de los CP argentinos"),
+    Regla('cpa_marcador', 'en_lista', ('cpa',), MARCADORES_SIN_CPA, ERROR,
+          "Texto de relleno en lugar de un CPA ('Buscar CPA'): debe cargarse vacío o rellenarse (rellenar_cpa.py)"),
+    Regla('cpa_formato', 'patron', ('cpa',), r'[A-Z]\d{4}[A-Z]{3}', ERROR,
+          "El CPA no tiene el formato letra + 4 dígitos + 3 letras", excepto=MARCADORES_SIN_CPA),
+    Regla('cpa_letra_provincia', 'mapeo', ('nom_prov', 'cpa'), LETRA_CPA, ERROR,
+          "La letra del CPA no es la de la provincia", excepto=MARCADORES_SIN_CPA),
+    Regla('cpa_digitos_cp', 'coincide', ('cpa', 'cp'), slice(1, 5), ADVERTENCIA,
+          "Los dígitos del CPA no son el CP (puede ser legítimo: el CPA conserva el CP de su zona)",
+          excepto=MARCADORES_SIN_CPA),
+    Regla('nombres_mal_codificados', 'prohibido', ('nom_prov', 'nom_depto', 'nom_loca'), r'(?i)a\+-|Ã|Â|�', ERROR,
+          "Nombre con caracteres mal decodificados ('a+-' en lugar de 'Ñ', mojibake UTF-8)"),
+    Regla('provincia_en_maestro', 'en_maestro', ('id_prov',), ('provincias', ('id_prov',)), ERROR,
+          "id_prov no existe en provincias.csv"),
+    Regla('depto_en_maestro', 'en_maestro', ('id_depto', 'id_prov'), ('deptos', ('id_depto', 'id_prov')), ERROR,
+          "(id_depto, id_prov) no existe en deptos.csv"),
+    Regla('localidad_en_maestro', 'en_maestro', ('id_loca', 'id_depto'), ('loca', ('id_loca', 'id_depto')), ERROR,
+          "(id_loca, id_depto) no existe en loca.csv"),
+    Regla('clave_unica', 'unica', ('id_prov', 'id_loca', 'cp'), None, ERROR,
+          "(provincia, localidad, cp) repetido: CodigoPostal no lo admite (unique_together)"),
+]
+
+# --- Comprobaciones: cada una devuelve un arreglo booleano con True en las filas que violan la regla ---
+def _por_valor(serie, transformacion, nulo=False):
+    """
+    Aplica 'transformacion' (Series de textos -> Series) una vez por valor distinto y expande el resultado a las
+    filas por código; las filas nulas reciben 'nulo'. Con validar() todas las columnas llegan categóricas.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        valores, codigos = serie.cat.categories, serie.cat.codes.to_numpy()
+    else:
+        codigos, valores = pd.factorize(serie)
+    resultado = transformacion(pd.Series(valores, dtype=object).astype(str)).to_numpy()
+    return np.append(resultado, np.array([nulo], dtype=resultado.dtype))[codigos] # El código -1 toma el del final
+
+def _evaluables(df, regla):
+    """Filas con valor en todas las columnas de la regla y que no son uno de sus valores exceptuados."""
+    evaluables = df[list(regla.columnas)].notna().all(axis=1).to_numpy()
+    if regla.excepto:
+        for col in regla.columnas:
+            evaluables &= ~_por_valor(df[col], lambda s: s.str.strip().str.lower().isin(regla.excepto))
+    return evaluables
+
+def _requerida(df, regla, maestros):
+    return ~df[list(regla.columnas)].notna().all(axis=1).to_numpy()
+
+def _patron(df, regla, maestros):
+    return _evaluables(df, regla) & _por_valor(df[regla.columnas[0]], lambda s: ~s.str.fullmatch(regla.parametro))
+
+def _rango(df, regla, maestros):
+    minimo, maximo = regla.parametro
+    fuera = lambda s: ~pd.to_numeric(s, errors='coerce').between(minimo, maximo)
+    return _evaluables(df, regla) & _por_valor(df[regla.columnas[0]], fuera)
+
+def _en_lista(df, regla, maestros):
+    return _por_valor(df[regla.columnas[0]], lambda s: s.str.strip().str.lower().isin(regla.parametro))
+
+def _prohibido(df, regla, maestros):
+    violaciones = np.zeros(len(df), dtype=bool)
+    for col in regla.columnas:
+        violaciones |= _por_valor(df[col], lambda s: s.str.contains(regla.parametro, regex=True))
+    return violaciones
+
+def _mapeo(df, regla, maestros):
+    """columnas (clave, valor): el valor tiene que empezar con lo que el mapeo dice para la clave."""
+    col_clave, col_valor = regla.columnas
+    esperado = _por_valor(df[col_clave], lambda s: s.map(regla.parametro), nulo=None)
+    inicial = _por_valor(df[col_valor], lambda s: s.str[:1], nulo=None)
+    return _evaluables(df, regla) & pd.notna(esperado) & (inicial != esperado)
+
+def _coincide(df, regla, maestros):
+    """columnas (a, b): la porción 'parametro' de a tiene que ser igual a b."""
+    col_a, col_b = regla.columnas
+    porcion = _por_valor(df[col_a], lambda s: s.str[regla.parametro], nulo=None)
+    return _evaluables(df, regla) & (porcion != _por_valor(df[col_b], lambda s: s, nulo=None))
+
+def _en_maestro(df, regla, maestros):
+    tabla, columnas_maestro = regla.parametro
+    maestro = maestros[tabla]
+    if len(regla.columnas) == 1:
+        presentes = df[regla.columnas[0]].isin(maestro[columnas_maestro[0]]).to_numpy()
+    else:
+        claves = pd.MultiIndex.from_frame(df[list(regla.columnas)])
+        presentes = claves.isin(pd.MultiIndex.from_frame(maestro[list(columnas_maestro)]))
+    return _evaluables(df, regla) & ~presentes
+
+def _unica(df, regla, maestros):
+    return _evaluables(df, regla) & df.duplicated(list(regla.columnas), keep=False).to_numpy()
+
+COMPROBACIONES = {
+    'requerida': _requerida, 'patron': _patron, 'rango': _rango, 'en_lista': _en_lista, 'prohibido': _prohibido,
+    'mapeo': _mapeo, 'coincide': _coincide, 'en_maestro': _en_maestro, 'unica': _unica,
+}
+
+# --- Validación ---
+def cargar_maestros(provincias=cruzar_con_maestros_v3.PROVINCIAS_MASTER_FILE,
+                    deptos=cruzar_con_maestros_v3.DEPTOS_MASTER_FILE, loca=cruzar_con_maestros_v3.LOCA_MASTER_FILE):
+    """Solo las columnas de ID de cada maestro (las que usan las reglas 'en_maestro')."""
+    return {
+        'provincias': leer_con_esquema(provincias, 'provincias', usecols=['id_prov']),
+        'deptos': leer_con_esquema(deptos, 'deptos', usecols=['id_depto', 'id_prov']),
+        'loca': leer_con_esquema(loca, 'loca', usecols=['id_loca', 'id_depto']),
+    }
+
+def validar(df, maestros, reglas=REGLAS, muestras_por_regla=MUESTRAS_POR_REGLA):
+    """
+    Evalúa las reglas sobre df (cualquier tabla con las columnas de tabla_final_corregida_n.csv).
+    Devuelve (resumen: una fila por regla con su cantidad de violaciones, muestras: filas de ejemplo por regla).
+    """
+    df = tipar(df.copy(), 'tabla_cp')
+    for col in df.columns: # Los textos (cp, cpa) también a categóricas: cada regla evalúa los valores distintos una sola vez
+        if df[col].dtype == object:
+            df[col] = df[col].astype('category')
+    resumen, muestras = [], []
+    for regla in reglas:
+        faltantes = [col for col in regla.columnas if col not in df.columns]
+        if faltantes:
+            raise KeyError(f"La regla '{regla.nombre}' usa columnas que la tabla no tiene: {faltantes}")
+        violaciones = COMPROBACIONES[regla.tipo](df, regla, maestros)
+        cantidad = int(violaciones.sum())
+        resumen.append({'regla': regla.nombre, 'severidad': regla.severidad, 'columnas': ','.join(regla.columnas),
+                        'violaciones': cantidad, 'descripcion': regla.descripcion})
+        if cantidad:
+            filas = np.flatnonzero(violaciones)[:muestras_por_regla]
+            muestra = df.iloc[filas].astype(object).where(df.iloc[filas].notna(), None)
+            muestra.insert(0, 'fila', filas + 2) # Número de línea en el CSV (la 1 es el encabezado)
+            muestra.insert(0, 'regla', regla.nombre)
+            muestras.append(muestra)
+    df_muestras = pd.concat(muestras, ignore_index=True) if muestras else pd.DataFrame(columns=['regla', 'fila', *df.columns])
+    return pd.DataFrame(resumen), df_muestras
+
+def hay_errores(resumen):
+    return bool(((resumen['severidad'] == ERROR) & (resumen['violaciones'] > 0)).any())
+
+def imprimir_resumen(resumen, filas):
+    print(f"\n{'regla':<26} {'severidad':<12} {'violaciones':>11} {'%':>7}")
+    for fila in resumen.itertuples():
+        marca = '' if fila.violaciones == 0 else ('  <-- ' + fila.descripcion)
+        print(f"{fila.regla:<26} {fila.severidad:<12} {fila.violaciones:>11} {100 * fila.violaciones / max(filas, 1):>6.2f}%{marca}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Valida la tabla final de CP (formato, rangos y referencias a los maestros).")
+    parser.add_argument('tabla', nargs='?', default=TABLA_POR_DEFECTO)
+    parser.add_argument('--provincias', default=cruzar_con_maestros_v3.PROVINCIAS_MASTER_FILE)
+    parser.add_argument('--deptos', default=cruzar_con_maestros_v3.DEPTOS_MASTER_FILE)
+    parser.add_argument('--loca', default=cruzar_con_maestros_v3.LOCA_MASTER_FILE)
+    parser.add_argument('--ignorar', nargs='+', default=[], metavar='REGLA', help="Reglas a no evaluar.")
+    parser.add_argument('--solo-reporte', action='store_true', help="Salir con código 0 aunque haya errores.")
+    parser.add_argument('--escala', type=int, default=1, help="Repetir la tabla N veces (para medir la velocidad).")
+    args = parser.parse_args()
+
+    desconocidas = set(args.ignorar) - {regla.nombre for regla in REGLAS}
+    if desconocidas:
+        parser.error(f"Reglas desconocidas: {sorted(desconocidas)}")
+    reglas = [regla for regla in REGLAS if regla.nombre not in args.ignorar]
+
+    print(f"Cargando '{args.tabla}' y los maestros...")
+    df = leer_con_esquema(args.tabla, 'tabla_cp')
+    if args.escala > 1:
+        df = pd.concat([df] * args.escala, ignore_index=True)
+    maestros = cargar_maestros(args.provincias, args.deptos, args.loca)
+
+    inicio = time.perf_counter()
+    resumen, muestras = validar(df, maestros, reglas)
+    segundos = time.perf_counter() - inicio
+    imprimir_resumen(resumen, len(df))
+    print(f"\n{len(df)} filas, {len(reglas)} reglas en {segundos:.2f} s ({len(df) / segundos:,.0f} filas/s)")
+
+    resumen.to_csv(RESUMEN_OUTPUT_FILE, index=False, sep=';', encoding='utf-8')
+    muestras.to_csv(MUESTRAS_OUTPUT_FILE, index=False, sep=';', encoding='utf-8')
+    print(f"Resumen en '{RESUMEN_OUTPUT_FILE}'; filas de ejemplo en '{MUESTRAS_OUTPUT_FILE}'")
+
+    if hay_errores(resumen):
+        print("\nLa tabla NO pasa la validación (hay reglas de severidad 'error' con violaciones).")
+        if not args.solo_reporte:
+            sys.exit(1)
+    else:
+        print("\nLa tabla pasa la validación.")
+
+if __name__ == "__main__":
+    main()
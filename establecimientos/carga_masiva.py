@@ -0,0 +1,224 @@
+import csv
+import io
+import os
+import time
+from contextlib import contextmanager
+
+from django.db import connections, router
+
+# Upsert por lotes para los comandos de carga (reemplaza update_or_create fila por fila).
+#   1. Una sola consulta trae la clave y los campos de todas las filas existentes del modelo
+#      (con precargar_todo=False, una consulta por lote trae solo las del lote: la memoria depende del lote,
+#      no del tamaño de la tabla; para cargas en streaming).
+#   2. Cada fila recibida se compara en memoria: nueva, cambiada o sin cambios (las sin cambios no se escriben).
+#   3. Cada TAMANO_LOTE filas se escribe el lote: si la base soporta INSERT ... ON CONFLICT DO UPDATE
+#      (PostgreSQL, SQLite), nuevas y cambiadas van en un solo bulk_create(update_conflicts=True);
+#      si no, bulk_create para las nuevas y bulk_update para las cambiadas.
+# Una clave repetida en la entrada queda con los valores de su última aparición.
+# La transacción la maneja quien llama (los comandos envuelven toda la carga en transaction.atomic()).
+#
+# Para cargas de tablas enteras, cargar_tabla_temporal() vuelca filas a una tabla temporal (staging)
+# desde la que se hace el upsert con un INSERT ... SELECT ... ON CONFLICT (ver cargar_ubicaciones):
+# en PostgreSQL con COPY FROM STDIN, en otras bases (SQLite, para probar en local) con executemany por lotes.
+# abrir_tabla() lee las tablas del pipeline de CP en CSV, Parquet o Arrow IPC (.arrow/.feather), según la extensión
+# como cp/cp2/formato_columnar.py: las columnares de a un lote de filas, con los IDs como enteros (pyarrow).
+
+TAMANO_LOTE = 2000
+NULO_COPY = r'\N' # Marca de NULL en el CSV que se manda por COPY (así '' sigue siendo texto vacío)
+EXTENSIONES_PARQUET = ('.parquet',)
+EXTENSIONES_ARROW = ('.arrow', '.feather')
+
+class UpsertPorLotes:
+    def __init__(self, modelo, clave, campos, tamano_lote=TAMANO_LOTE, on_conflict=None, precargar_todo=True):
+        """
+        clave: campo único por el que se identifica cada fila (ej. 'codigo').
+        campos: campos a cargar/actualizar; las FK van por su columna (ej. 'provincia_id').
+        on_conflict: None = usarlo si la base lo soporta; False = forzar bulk_create + bulk_update.
+        precargar_todo: leer toda la tabla al empezar (True) o solo las filas de cada lote (False).
+        """
+        self.modelo = modelo
+        self.clave = clave
+        self.campos = list(campos)
+        self.tamano_lote = tamano_lote
+        self.base = router.db_for_write(modelo)
+        soportado = connections[self.base].features.supports_update_conflicts_with_target
+        self.on_conflict = soportado if on_conflict is None else (on_conflict and soportado)
+        # Para bulk_create/bulk_update los campos van por nombre ('provincia', no 'provincia_id')
+        self.nombres_campos = [modelo._meta.get_field(campo).name for campo in self.campos]
+
+        self.precargar_todo = precargar_todo
+        self.inicio = time.perf_counter()
+        self.existentes = self._leer_existentes() if precargar_todo else {}
+        self.pendientes = {} # clave -> valores (tupla en el orden de self.campos)
+        self.recibidas = self.creadas = self.actualizadas = self.sin_cambios = 0
+
+    def _leer_existentes(self, claves=None):
+        """clave -> (pk, valores) de las filas ya guardadas (todas, o solo las de 'claves')."""
+        filas = self.modelo.objects.using(self.base)
+        if claves is not None:
+            filas = filas.filter(**{f'{self.clave}__in': claves})
+        filas = filas.values_list(self.clave, 'pk', *self.campos)
+        return {fila[0]: (fila[1], tuple(fila[2:])) for fila in filas.iterator(chunk_size=10000)}
+
+    def agregar(self, clave, **valores):
+        self.recibidas += 1
+        self.pendientes[clave] = tuple(valores[campo] for campo in self.campos)
+        if len(self.pendientes) >= self.tamano_lote:
+            self.escribir_lote()
+
+    def escribir_lote(self):
+        if not self.precargar_todo:
+            self.existentes = self._leer_existentes(list(self.pendientes))
+        nuevas, cambiadas = [], []
+        for clave, valores in self.pendientes.items():
+            existente = self.existentes.get(clave)
+            if existente is None:
+                nuevas.append((clave, valores))
+            elif existente[1] != valores:
+                cambiadas.append((clave, existente[0], valores))
+            else:
+                self.sin_cambios += 1
+        self.pendientes = {}
+
+        objetos_nuevos = [self.modelo(**{self.clave: clave}, **dict(zip(self.campos, valores))) for clave, valores in nuevas]
+        if self.on_conflict:
+            objetos = objetos_nuevos + [self.modelo(**{self.clave: clave}, **dict(zip(self.campos, valores)))
+                                        for clave, _, valores in cambiadas]
+            if objetos:
+                self.modelo.objects.using(self.base).bulk_create(
+                    objetos, update_conflicts=True, unique_fields=[self.clave], update_fields=self.nombres_campos)
+        else:
+            if objetos_nuevos:
+                self.modelo.objects.using(self.base).bulk_create(objetos_nuevos)
+            objetos = [self.modelo(pk=pk, **{self.clave: clave}, **dict(zip(self.campos, valores)))
+                       for clave, pk, valores in cambiadas]
+            sin_pk = [objeto for objeto in objetos if objeto.pk is None]
+            if sin_pk: # Creadas en un lote anterior en una base que no devuelve los pk de bulk_create
+                pks = dict(self.modelo.objects.using(self.base)
+                           .filter(**{f'{self.clave}__in': [getattr(o, self.clave) for o in sin_pk]})
+                           .values_list(self.clave, 'pk'))
+                for objeto in sin_pk:
+                    objeto.pk = pks[getattr(objeto, self.clave)]
+            if objetos:
+                self.modelo.objects.using(self.base).bulk_update(objetos, self.nombres_campos)
+
+        for objeto, (clave, valores) in zip(objetos_nuevos, nuevas):
+            self.existentes[clave] = (objeto.pk, valores)
+        for clave, pk, valores in cambiadas:
+            self.existentes[clave] = (pk, valores)
+        self.creadas += len(nuevas)
+        self.actualizadas += len(cambiadas)
+
+    def pk(self, clave):
+        """pk de la fila con esa clave (la escribe primero si estaba pendiente); None si no existe."""
+        if clave in self.pendientes:
+            self.escribir_lote()
+        existente = self.existentes.get(clave)
+        if existente is None and not self.precargar_todo:
+            existente = self._leer_existentes([clave]).get(clave)
+        if existente is None:
+            return None
+        if existente[0] is None: # La base no devolvió el pk al crearla
+            pk = self.modelo.objects.using(self.base).values_list('pk', flat=True).get(**{self.clave: clave})
+            self.existentes[clave] = (pk, existente[1])
+            return pk
+        return existente[0]
+
+    def terminar(self):
+        """Escribe lo pendiente y devuelve el resumen de la carga."""
+        if self.pendientes:
+            self.escribir_lote()
+        segundos = time.perf_counter() - self.inicio
+        return {
+            'recibidas': self.recibidas, 'creadas': self.creadas, 'actualizadas': self.actualizadas,
+            'sin_cambios': self.sin_cambios, 'segundos': segundos,
+            'filas_por_segundo': self.recibidas / segundos if segundos else 0.0,
+        }
+
+def describir(modelo, resumen, con_velocidad=True):
+    velocidad = (f" en {resumen['segundos']:.2f} s ({resumen['filas_por_segundo']:,.0f} filas/s)" if con_velocidad else "")
+    return (f"{modelo.__name__}: {resumen['recibidas']} filas{velocidad} | creadas {resumen['creadas']}, "
+            f"actualizadas {resumen['actualizadas']}, sin cambios {resumen['sin_cambios']}")
+
+def _filas_por_lote(lotes):
+    for lote in lotes:
+        yield from lote.to_pylist()
+
+@contextmanager
+def abrir_tabla(ruta, separador=';', tamano_lote=TAMANO_LOTE):
+    """
+    (columnas, filas) de un .csv, .parquet o .arrow/.feather; cada fila es un dict columna -> valor.
+    En el CSV los valores son texto; en los columnares conservan su tipo (IDs enteros) y los nulos son None.
+    """
+    extension = os.path.splitext(str(ruta))[1].lower()
+    if extension not in EXTENSIONES_PARQUET + EXTENSIONES_ARROW:
+        with open(ruta, newline='', encoding='utf-8') as archivo:
+            lector = csv.DictReader(archivo, delimiter=separador)
+            yield lector.fieldnames or [], lector
+        return
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Los formatos .parquet/.arrow necesitan pyarrow: pip install pyarrow") from None
+    if extension in EXTENSIONES_PARQUET:
+        with pq.ParquetFile(ruta) as archivo:
+            yield archivo.schema_arrow.names, _filas_por_lote(archivo.iter_batches(batch_size=tamano_lote))
+    else:
+        with pa.memory_map(str(ruta)) as origen:
+            lector = pa.ipc.open_file(origen)
+            yield lector.schema.names, _filas_por_lote(lector.get_batch(i) for i in range(lector.num_record_batches))
+
+def crear_tabla_temporal(connection, tabla, columnas):
+    """columnas: [(nombre, tipo SQL), ...]. Si ya existía en la sesión, se vuelve a crear vacía."""
+    nombre = connection.ops.quote_name(tabla)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {nombre}")
+        cursor.execute(f"CREATE TEMPORARY TABLE {nombre} ({', '.join(f'{c} {t}' for c, t in columnas)})")
+
+def _copiar(cursor_crudo, sql, bloques):
+    if hasattr(cursor_crudo, 'copy_expert'): # psycopg2
+        for bloque in bloques:
+            cursor_crudo.copy_expert(sql, io.StringIO(bloque))
+    else: # psycopg 3
+        with cursor_crudo.copy(sql) as copia:
+            for bloque in bloques:
+                copia.write(bloque)
+
+def cargar_tabla_temporal(connection, tabla, columnas, filas, tamano_lote=TAMANO_LOTE):
+    """
+    Carga las tuplas de 'filas' (en el orden de 'columnas') en la tabla, leyéndolas de a tamano_lote.
+    None se guarda como NULL. Devuelve la cantidad de filas cargadas.
+    """
+    nombre = connection.ops.quote_name(tabla)
+    lista_columnas = ', '.join(connection.ops.quote_name(c) for c in columnas)
+    total = 0
+
+    def lotes():
+        nonlocal total
+        lote = []
+        for fila in filas:
+            lote.append(fila)
+            if len(lote) >= tamano_lote:
+                total += len(lote)
+                yield lote
+                lote = []
+        if lote:
+            total += len(lote)
+            yield lote
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            def bloques():
+                for lote in lotes():
+                    texto = io.StringIO()
+                    csv.writer(texto, lineterminator='\n').writerows(
+                        [[NULO_COPY if valor is None else valor for valor in fila] for fila in lote])
+                    yield texto.getvalue()
+            sql = f"COPY {nombre} ({lista_columnas}) FROM STDIN WITH (FORMAT csv, NULL '{NULO_COPY}')"
+            _copiar(cursor.cursor, sql, bloques())
+        else:
+            marcas = ', '.join(['%s'] * len(columnas))
+            for lote in lotes():
+                cursor.executemany(f"INSERT INTO {nombre} ({lista_columnas}) VALUES ({marcas})", lote)
+    return total
@@ -0,0 +1,142 @@
+import csv
+import time
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+# Nomenclador CLAE: lectura/validación del CSV y jerarquía letra > clae2 > clae3 > clae6 en memoria.
+# El CSV (clae/clae_agg.csv) repite en cada actividad las descripciones de su letra, clae2 y clae3;
+# JerarquiaCLAE guarda cada nivel una sola vez y resuelve los padres de un código por sus prefijos
+# (los 3 primeros dígitos son el clae3, los 2 primeros el clae2) y los hijos por búsqueda binaria.
+# Los códigos que perdieron los ceros a la izquierda (planilla de cálculo: '14211' en lugar de '014211')
+# se completan con ceros antes de validar.
+# obtener_jerarquia() la arma desde ActividadCLAE una vez por proceso (la usa la vista actividades_clae).
+# Como el índice CPA (ver indice_cpa.py): importar_clae y recargar_referencia llaman a invalidar_jerarquia(), que
+# incrementa VersionDatos('clae'); los demás procesos comparan esa versión a lo sumo cada
+# SEGUNDOS_ENTRE_VERIFICACIONES y vuelven a armar la jerarquía si cambió.
+
+VERSION = 'clae'
+SEGUNDOS_ENTRE_VERIFICACIONES = 30
+
+ANCHO = {'clae6': 6, 'clae3': 3, 'clae2': 2}
+COLUMNAS = ('clae6', 'clae6_desc', 'clae3', 'clae3_desc', 'clae2', 'clae2_desc', 'letra', 'letra_desc')
+
+FilaCLAE = namedtuple('FilaCLAE', COLUMNAS)
+
+def _codigo(valor, ancho):
+    valor = valor.strip()
+    return valor.zfill(ancho) if valor.isdigit() else valor
+
+def validar_fila(fila):
+    """Lista de problemas de una fila ya normalizada (vacía si está bien)."""
+    problemas = []
+    for campo, ancho in ANCHO.items():
+        codigo = getattr(fila, campo)
+        if not (codigo.isdigit() and len(codigo) == ancho):
+            problemas.append(f"{campo} '{codigo}' no son {ancho} dígitos")
+    if not problemas:
+        if fila.clae6[:3] != fila.clae3:
+            problemas.append(f"clae6 {fila.clae6} no pertenece a clae3 {fila.clae3}")
+        if fila.clae3[:2] != fila.clae2:
+            problemas.append(f"clae3 {fila.clae3} no pertenece a clae2 {fila.clae2}")
+    if not (len(fila.letra) == 1 and fila.letra.isalpha() and fila.letra.isupper()):
+        problemas.append(f"letra '{fila.letra}' no es una letra mayúscula")
+    if not fila.clae6_desc:
+        problemas.append("falta la descripción")
+    return problemas
+
+def leer_clae(ruta):
+    """
+    Lee y valida el CSV en una pasada. Devuelve (filas válidas, errores) con errores = [(línea, problema), ...].
+    Si un código se repite, queda la última fila (y se informa).
+    """
+    filas, errores = {}, []
+    with open(ruta, newline='', encoding='utf-8') as f:
+        lector = csv.DictReader(f)
+        faltantes = [col for col in COLUMNAS if col not in (lector.fieldnames or [])]
+        if faltantes:
+            raise ValueError(f"Faltan columnas en '{ruta}': {', '.join(faltantes)}")
+        for fila in lector:
+            valores = {col: (fila[col] or '').strip() for col in COLUMNAS}
+            for campo, ancho in ANCHO.items():
+                valores[campo] = _codigo(valores[campo], ancho)
+            fila_clae = FilaCLAE(**valores)
+            problemas = validar_fila(fila_clae)
+            if problemas:
+                errores.append((lector.line_num, "; ".join(problemas)))
+                continue
+            if fila_clae.clae6 in filas:
+                errores.append((lector.line_num, f"clae6 {fila_clae.clae6} repetido (queda esta fila)"))
+            filas[fila_clae.clae6] = fila_clae
+    return list(filas.values()), errores
+
+class JerarquiaCLAE:
+    """Letra, clae2, clae3 y clae6 con su descripción, cada uno una sola vez."""
+
+    def __init__(self, filas):
+        self.letras = {}      # 'A' -> descripción
+        self.clae2 = {}       # '01' -> (descripción, letra)
+        self.clae3 = {}       # '011' -> descripción
+        self.actividades = {} # '011111' -> descripción
+        for fila in filas:
+            self.letras.setdefault(fila.letra, fila.letra_desc)
+            self.clae2.setdefault(fila.clae2, (fila.clae2_desc, fila.letra))
+            self.clae3.setdefault(fila.clae3, fila.clae3_desc)
+            self.actividades[fila.clae6] = fila.clae6_desc
+        self.codigos = sorted(self.actividades)
+
+    def padres(self, codigo):
+        """(letra, clae2, clae3) de un clae6; None si el código no está en el nomenclador."""
+        codigo = _codigo(codigo, 6)
+        if codigo not in self.actividades:
+            return None
+        return self.clae2[codigo[:2]][1], codigo[:2], codigo[:3]
+
+    def descripcion(self, codigo):
+        """Descripción de un código de cualquier nivel (letra, clae2, clae3 o clae6); None si no está."""
+        if codigo in self.letras:
+            return self.letras[codigo]
+        if codigo in self.clae2:
+            return self.clae2[codigo][0]
+        return self.clae3.get(codigo) or self.actividades.get(codigo)
+
+    def actividades_de(self, prefijo):
+        """Los clae6 de una letra, o de un clae2/clae3 (por prefijo, con búsqueda binaria), ordenados."""
+        if prefijo in self.letras:
+            return [c for c in self.codigos if self.clae2[c[:2]][1] == prefijo]
+        if not prefijo.isdigit():
+            return []
+        desde = bisect_left(self.codigos, prefijo)
+        hasta = bisect_right(self.codigos, prefijo + '9' * (6 - len(prefijo)))
+        return self.codigos[desde:hasta]
+
+    @classmethod
+    def desde_base(cls):
+        """Arma la jerarquía con una sola consulta a ActividadCLAE."""
+        from .models import ActividadCLAE
+        filas = ActividadCLAE.objects.values_list('codigo', 'descripcion', 'clae3', 'clae3_desc', 'clae2',
+                                                  'clae2_desc', 'letra', 'letra_desc')
+        return cls(FilaCLAE(*(valor or '' for valor in fila)) for fila in filas.iterator(chunk_size=5000))
+
+_jerarquia = None
+_version = None
+_verificado = 0.0 # time.monotonic() de la última comparación con la versión en la base
+
+def obtener_jerarquia():
+    """La jerarquía armada desde la base, una vez por proceso (y otra vez si otro proceso la invalidó)."""
+    global _jerarquia, _version, _verificado
+    from .models import VersionDatos
+    ahora = time.monotonic()
+    if _jerarquia is not None and ahora - _verificado < SEGUNDOS_ENTRE_VERIFICACIONES:
+        return _jerarquia
+    version = VersionDatos.actual(VERSION)
+    _verificado = ahora
+    if _jerarquia is None or version != _version:
+        _jerarquia, _version = JerarquiaCLAE.desde_base(), version
+    return _jerarquia
+
+def invalidar_jerarquia():
+    """Después de importar el nomenclador: la jerarquía se vuelve a armar en este proceso y en los demás."""
+    global _jerarquia
+    from .models import VersionDatos
+    _jerarquia = None
+    VersionDatos.incrementar(VERSION)
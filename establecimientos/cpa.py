@@ -0,0 +1,155 @@
+import csv
+import re
+from collections import Counter, namedtuple
+
+from .normalizacion import normalize_name
+
+# CPA (Código Postal Argentino): decodificación e índice en memoria.
+# Un CPA como 'B1636AAA' es: letra de la provincia (la de ISO 3166-2:AR) + CP de 4 dígitos de la zona + 3 letras
+# que identifican la cara de manzana. Acá:
+#   - parsear(): un CPA suelto (tolera minúsculas, espacios y guiones: 'b 1636-aaa'); None si no es un CPA;
+#   - parsear_serie(): lo mismo para una columna entera (una vez por valor distinto, como cp/cp2/validar_tabla_cp.py);
+#   - IndiceCPA: diccionarios en memoria, armados desde la tabla de CP (tabla_final_corregida_n.csv) o desde
+#     CodigoPostal/Establecimiento (ver indice_cpa.py), para resolver sin ir a la base:
+#       CPA -> provincia, CP y localidades candidatas (las que tienen ese CPA; si no hay, las de ese CP en la provincia)
+#       (localidad, calle) -> CPA conocidos en esa calle (de los domicilios ya cargados), el más frecuente primero.
+# Las localidades se identifican con el ID que traiga la fuente (id_loca de la tabla de CP o el pk de Localidad).
+# Este módulo no depende de Django ni de pandas (pandas solo para parsear_serie): los scripts de cp/cp2 lo importan
+# tal cual (ver cp/cp2/cpa.py, que agrega la línea de comandos).
+
+TABLA_POR_DEFECTO = 'tabla_final_corregida_n.csv'
+
+# Letra del CPA de cada provincia, por nombre del maestro provincias.csv
+LETRA_CPA = {
+    'BUENOS AIRES': 'B', 'CAPITAL FEDERAL': 'C', 'CATAMARCA': 'K', 'CHACO': 'H', 'CHUBUT': 'U', 'CORDOBA': 'X',
+    'CORRIENTES': 'W', 'ENTRE RIOS': 'E', 'FORMOSA': 'P', 'JUJUY': 'Y', 'LA PAMPA': 'L', 'LA RIOJA': 'F',
+    'MENDOZA': 'M', 'MISIONES': 'N', 'NEUQUEN': 'Q', 'RIO NEGRO': 'R', 'SALTA': 'A', 'SAN JUAN': 'J',
+    'SAN LUIS': 'D', 'SANTA CRUZ': 'Z', 'SANTA FE': 'S', 'SANTIAGO DEL ESTERO': 'G', 'TIERRA DEL FUEGO': 'V',
+    'TUCUMAN': 'T',
+}
+# Otros nombres con que aparecen las provincias (INDEC, formularios), ya normalizados
+OTROS_NOMBRES = {
+    'ciudad autonoma de buenos aires': 'C', 'caba': 'C',
+    'tierra del fuego, antartida e islas del atlantico sur': 'V',
+}
+LETRA_POR_NOMBRE = {normalize_name(nombre): letra for nombre, letra in LETRA_CPA.items()} | OTROS_NOMBRES
+PROVINCIA_POR_LETRA = {letra: nombre for nombre, letra in LETRA_CPA.items()}
+
+RE_CPA = re.compile(r'([A-Z])(\d{4})([A-Z]{3})')
+RE_SEPARADORES = re.compile(r'[\s\-.]+')
+# Prefijos que no cambian la calle ('Av. San Martín' = 'San Martin'), ya normalizados
+RE_PREFIJO_CALLE = re.compile(r'^(avenida|avda|av|calle|boulevard|bv|bulevar|pasaje|pje)\.?\s+')
+
+CPA = namedtuple('CPA', 'codigo letra cp sufijo provincia')
+Resolucion = namedtuple('Resolucion', 'cpa localidades exacto') # exacto: el CPA completo figura en el índice
+
+def letra_de_provincia(nombre):
+    """Letra del CPA para un nombre de provincia (cualquier grafía que normalize_name deje igual); None si no se conoce."""
+    return LETRA_POR_NOMBRE.get(normalize_name(nombre))
+
+def parsear(texto):
+    """CPA de un texto ('B1636AAA', 'b 1636-aaa'); None si no es un CPA válido (incluye 'Buscar CPA' y vacíos)."""
+    if not isinstance(texto, str):
+        return None
+    m = RE_CPA.fullmatch(RE_SEPARADORES.sub('', texto).upper())
+    if m is None or m.group(1) not in PROVINCIA_POR_LETRA:
+        return None
+    letra, cp, sufijo = m.groups()
+    return CPA(letra + cp + sufijo, letra, cp, sufijo, PROVINCIA_POR_LETRA[letra])
+
+def parsear_serie(serie):
+    """DataFrame con las columnas de CPA (codigo, letra, cp, sufijo, provincia) por fila; nulos donde no hay un CPA válido."""
+    import pandas as pd
+    codigos, valores = pd.factorize(serie)
+    campos = pd.DataFrame([parsear(v) or (None,) * len(CPA._fields) for v in valores], columns=CPA._fields)
+    filas = campos.reindex(codigos) # El código -1 (nulo) no está en el índice: queda todo nulo
+    return filas.set_axis(serie.index)
+
+def normalizar_calle(calle):
+    return RE_PREFIJO_CALLE.sub('', normalize_name(calle))
+
+class IndiceCPA:
+    """Índices en memoria CPA -> localidades, (letra, CP) -> localidades y (localidad, calle) -> CPA."""
+
+    def __init__(self):
+        self.por_cpa = {}   # 'B1636AAA' -> {id_loca: None} (un dict como conjunto ordenado)
+        self.por_cp = {}    # ('B', '1636') -> {id_loca: None}
+        self.por_calle = {} # (id_loca, calle normalizada) -> Counter de CPA
+        self.nombres = {}   # id_loca -> nombre de la localidad
+
+    def agregar(self, id_loca, cp=None, cpa=None, provincia=None, nombre=None):
+        """Una fila de la tabla de CP o de CodigoPostal: la localidad queda asociada a su CPA y a su CP."""
+        decodificado = parsear(cpa)
+        letra = decodificado.letra if decodificado else letra_de_provincia(provincia)
+        if nombre is not None:
+            self.nombres[id_loca] = nombre
+        if decodificado:
+            self.por_cpa.setdefault(decodificado.codigo, {})[id_loca] = None
+            # Los dígitos del CPA son el CP de la zona, que no siempre es el CP de la localidad en la tabla
+            self.por_cp.setdefault((letra, decodificado.cp), {})[id_loca] = None
+        if letra and cp:
+            self.por_cp.setdefault((letra, str(cp).strip()), {})[id_loca] = None
+
+    def agregar_domicilio(self, id_loca, calle, cpa):
+        """Un domicilio conocido (ej. de un Establecimiento) con su CPA."""
+        decodificado = parsear(cpa)
+        calle = normalizar_calle(calle)
+        if decodificado and calle:
+            self.por_calle.setdefault((id_loca, calle), Counter())[decodificado.codigo] += 1
+            self.por_cpa.setdefault(decodificado.codigo, {})[id_loca] = None
+
+    def resolver(self, texto):
+        """Resolucion(cpa, localidades candidatas, exacto) para un texto de CPA; None si no es un CPA válido."""
+        decodificado = parsear(texto)
+        if decodificado is None:
+            return None
+        localidades = self.por_cpa.get(decodificado.codigo)
+        if localidades:
+            return Resolucion(decodificado, list(localidades), True)
+        return Resolucion(decodificado, list(self.por_cp.get((decodificado.letra, decodificado.cp), ())), False)
+
+    def resolver_lote(self, textos):
+        return [self.resolver(texto) for texto in textos]
+
+    def cpas_de_calle(self, id_loca, calle):
+        """CPA conocidos para esa calle de esa localidad, del más al menos frecuente."""
+        conteo = self.por_calle.get((id_loca, normalizar_calle(calle)))
+        return [codigo for codigo, _ in conteo.most_common()] if conteo else []
+
+    def verificar(self, texto, provincia=None, cp=None, id_loca=None):
+        """Lista de problemas (vacía si no hay) del CPA 'texto' para un domicilio de esa provincia, CP y localidad."""
+        decodificado = parsear(texto)
+        if decodificado is None:
+            return [f"'{texto}' no es un CPA válido (letra de provincia + 4 dígitos + 3 letras, ej. B1636AAA)."]
+        problemas = []
+        letra = letra_de_provincia(provincia) if provincia else None
+        if letra and letra != decodificado.letra:
+            problemas.append(f"El CPA {decodificado.codigo} es de {decodificado.provincia}, no de {provincia}.")
+        resolucion = self.resolver(decodificado.codigo)
+        if cp and str(cp).strip() != decodificado.cp:
+            # El CP puede diferir de los dígitos del CPA si alguna localidad de ese CPA (o la indicada) tiene ese CP
+            con_ese_cp = self.por_cp.get((decodificado.letra, str(cp).strip()), {})
+            if id_loca not in con_ese_cp and not (resolucion.exacto and any(i in con_ese_cp for i in resolucion.localidades)):
+                problemas.append(f"El CP {cp} no corresponde al CPA {decodificado.codigo}.")
+        if id_loca is not None and resolucion.exacto and id_loca not in resolucion.localidades:
+            nombres = ", ".join(str(self.nombres.get(i, i)) for i in resolucion.localidades[:3])
+            problemas.append(f"El CPA {decodificado.codigo} corresponde a otra localidad ({nombres}).")
+        return problemas
+
+    def __len__(self):
+        return len(self.por_cpa)
+
+    @classmethod
+    def desde_filas(cls, filas):
+        """Desde tuplas (id_loca, cp, cpa, provincia, nombre)."""
+        indice = cls()
+        for fila in filas:
+            indice.agregar(*fila)
+        return indice
+
+    @classmethod
+    def desde_tabla_cp(cls, ruta=TABLA_POR_DEFECTO):
+        """Desde la tabla final del pipeline (columnas id_loca, nom_loca, nom_prov, cp, cpa; separador ';')."""
+        with open(ruta, newline='', encoding='utf-8') as f:
+            lector = csv.DictReader(f, delimiter=';')
+            return cls.desde_filas((fila['id_loca'], fila['cp'], fila['cpa'], fila['nom_prov'], fila['nom_loca']) for fila in lector)
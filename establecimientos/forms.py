@@ -1,5 +1,7 @@
 from django import forms
 from .models import Establecimiento, Provincia, Localidad
+from . import cpa
+from .indice_cpa import obtener_indice
 
 class EstablecimientoForm(forms.ModelForm):
     provincia = forms.ModelChoiceField(
@@ -40,3 +42,25 @@ class EstablecimientoForm(forms.ModelForm):
             'cuit': forms.TextInput(attrs={'class': 'form-control'}),
             'empresa': forms.Select(attrs={'class': 'form-control'}),
         }
+
+    def clean(self):
+        """Valida el CPA contra el índice en memoria y completa el CP (o el CPA, si la calle ya tiene uno conocido)."""
+        datos = super().clean()
+        indice = obtener_indice()
+        provincia, localidad = datos.get('provincia'), datos.get('localidad')
+        texto_cpa = (datos.get('cpa') or '').strip()
+        if not texto_cpa and localidad and datos.get('calle'):
+            conocidos = indice.cpas_de_calle(localidad.id, datos['calle'])
+            if conocidos:
+                texto_cpa = datos['cpa'] = conocidos[0]
+        if texto_cpa:
+            problemas = indice.verificar(texto_cpa, provincia.nombre if provincia else None,
+                                         datos.get('cp'), localidad.id if localidad else None)
+            for problema in problemas:
+                self.add_error('cpa', problema)
+            if not problemas:
+                decodificado = cpa.parsear(texto_cpa)
+                datos['cpa'] = decodificado.codigo # Se guarda siempre igual: 'b 1636-aaa' -> 'B1636AAA'
+                if not datos.get('cp'):
+                    datos['cp'] = decodificado.cp
+        return datos
@@ -0,0 +1,295 @@
+import bisect
+import csv
+import hashlib
+import inspect
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import namedtuple
+from datetime import datetime
+
+from .normalizacion import normalize_name
+
+# --- Gazetteer P-D-L precompilado (provincia -> departamento -> localidad) ---
+# Cada script armaba el maestro P-D-L desde provincias.csv, deptos.csv y loca.csv con dos pd.merge y volvía a
+# normalizar todos los nombres. Acá eso se compila una vez en un archivo binario versionado (gazetteer_pdl.bin):
+#   - arreglos de enteros (int32) con los IDs y las referencias a la provincia / departamento de cada fila;
+#   - los nombres originales y normalizados (normalize_name) como bloques UTF-8 con sus posiciones de inicio;
+#   - índices ordenados por (provincia, nombre normalizado) y por ID, para buscar con bisect.
+# El archivo se abre con mmap: cargarlo no lee ni convierte nada, así que tarda milisegundos, y la clase
+# Gazetteer lo consulta sin pandas ni Django. La usan los scripts de cp (cp/cp2/gazetteer.py compila y consulta
+# desde la línea de comandos) y cargar_ubicaciones, que resuelve con él el id_loca de cada fila de la tabla final.
+# Las localidades quedan en el mismo orden que el merge P-D-L de cruzar_con_maestros_v3.cargar_maestro_pdl().
+# El encabezado guarda el hash de los tres CSV y del código de normalize_name: abrir_si_vigente() descarta el archivo
+# si alguno cambió (los nombres normalizados guardados ya no coincidirían con los que calculan los scripts).
+# Uso (desde cp/cp2): python gazetteer.py compilar            -> arma gazetteer_pdl.bin
+#                    python gazetteer.py buscar cordoba "villa maria"
+
+ARCHIVO_GAZETTEER = 'gazetteer_pdl.bin'
+PROVINCIAS_FILE = 'provincias.csv'
+DEPTOS_FILE = 'deptos.csv'
+LOCA_FILE = 'loca.csv'
+
+MAGIA = b'GAZPDL\x00\x00'
+VERSION_FORMATO = 1
+ALINEACION = 8
+
+Provincia = namedtuple('Provincia', 'id nombre nombre_norm')
+Departamento = namedtuple('Departamento', 'id id_prov nombre nombre_norm')
+Localidad = namedtuple('Localidad', 'id id_depto id_prov nombre nombre_norm')
+
+def hash_de_archivo(ruta):
+    with open(ruta, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def hash_de_normalizacion():
+    """Hash del archivo donde está definida normalize_name (establecimientos/normalizacion.py)."""
+    return hash_de_archivo(inspect.getsourcefile(normalize_name))
+
+def fuentes_por_defecto(directorio='.'):
+    return [os.path.join(directorio, nombre) for nombre in (PROVINCIAS_FILE, DEPTOS_FILE, LOCA_FILE)]
+
+# --- Compilación ---
+def _leer_filas(ruta, columnas_enteras):
+    """Filas del CSV como dict; se descartan las que no tienen un entero en alguna de 'columnas_enteras' (como dropna)."""
+    with open(ruta, newline='', encoding='utf-8') as f:
+        for fila in csv.DictReader(f):
+            try:
+                for col in columnas_enteras:
+                    fila[col] = int(fila[col])
+            except (TypeError, ValueError):
+                continue
+            yield fila
+
+class _Textos:
+    """Lista de textos -> bloque UTF-8 + posiciones de inicio (uint32, una más que la cantidad de textos)."""
+
+    def __init__(self):
+        self.bloque = bytearray()
+        self.inicios = array('I', [0])
+
+    def agregar(self, texto):
+        self.bloque += texto.encode('utf-8')
+        self.inicios.append(len(self.bloque))
+
+def compilar(provincias_file=PROVINCIAS_FILE, deptos_file=DEPTOS_FILE, loca_file=LOCA_FILE, destino=ARCHIVO_GAZETTEER):
+    """Arma el archivo binario. Devuelve las cantidades de provincias, departamentos y localidades."""
+    provincias = list(_leer_filas(provincias_file, ['id_prov']))
+    deptos = list(_leer_filas(deptos_file, ['id_depto', 'id_prov']))
+    locas = list(_leer_filas(loca_file, ['id_loca', 'id_depto']))
+
+    # El mismo orden que merge(provincias, deptos) y después merge(.., loca): por fila de la izquierda,
+    # las coincidencias de la derecha en el orden del archivo (los merge 'inner' de pandas conservan ese orden)
+    deptos_por_prov, locas_por_depto = {}, {}
+    for fila in deptos:
+        deptos_por_prov.setdefault(fila['id_prov'], []).append(fila)
+    for fila in locas:
+        locas_por_depto.setdefault(fila['id_depto'], []).append(fila)
+
+    secciones = {nombre: array('i') for nombre in ('prov_id', 'depto_id', 'depto_prov', 'loca_id', 'loca_depto')}
+    textos = {nombre: _Textos() for nombre in ('prov_nombre', 'prov_norm', 'depto_nombre', 'depto_norm', 'loca_nombre', 'loca_norm')}
+    for fila_prov in provincias:
+        p = len(secciones['prov_id'])
+        secciones['prov_id'].append(fila_prov['id_prov'])
+        textos['prov_nombre'].agregar(fila_prov['nom_prov'])
+        textos['prov_norm'].agregar(normalize_name(fila_prov['nom_prov']))
+        for fila_depto in deptos_por_prov.get(fila_prov['id_prov'], []):
+            d = len(secciones['depto_id'])
+            secciones['depto_id'].append(fila_depto['id_depto'])
+            secciones['depto_prov'].append(p)
+            textos['depto_nombre'].agregar(fila_depto['nom_depto'])
+            textos['depto_norm'].agregar(normalize_name(fila_depto['nom_depto']))
+            for fila_loca in locas_por_depto.get(fila_depto['id_depto'], []):
+                secciones['loca_id'].append(fila_loca['id_loca'])
+                secciones['loca_depto'].append(d)
+                textos['loca_nombre'].agregar(fila_loca['nom_loca'])
+                textos['loca_norm'].agregar(normalize_name(fila_loca['nom_loca']))
+
+    # Índices: posiciones ordenadas por (provincia, nombre normalizado) y por ID
+    def norm(nombre, i):
+        t = textos[nombre]
+        return bytes(t.bloque[t.inicios[i]:t.inicios[i + 1]]).decode('utf-8')
+    loca_prov = [secciones['depto_prov'][d] for d in secciones['loca_depto']]
+    n_prov, n_depto, n_loca = len(secciones['prov_id']), len(secciones['depto_id']), len(secciones['loca_id'])
+    secciones['idx_prov_nombre'] = array('i', sorted(range(n_prov), key=lambda i: norm('prov_norm', i)))
+    secciones['idx_depto_nombre'] = array('i', sorted(range(n_depto), key=lambda i: (secciones['depto_prov'][i], norm('depto_norm', i))))
+    secciones['idx_loca_nombre'] = array('i', sorted(range(n_loca), key=lambda i: (loca_prov[i], norm('loca_norm', i))))
+    for nivel in ('prov', 'depto', 'loca'):
+        ids = secciones[f'{nivel}_id']
+        secciones[f'idx_{nivel}_id'] = array('i', sorted(range(len(ids)), key=ids.__getitem__))
+    for nombre, t in textos.items():
+        secciones[f'{nombre}_ini'] = t.inicios
+        secciones[nombre] = t.bloque
+
+    _escribir(destino, secciones, {
+        'version_formato': VERSION_FORMATO,
+        'construido': datetime.now().isoformat(timespec='seconds'),
+        'fuentes': {os.path.basename(r): hash_de_archivo(r) for r in (provincias_file, deptos_file, loca_file)},
+        'normalizacion': hash_de_normalizacion(),
+        'cantidades': {'provincias': n_prov, 'departamentos': n_depto, 'localidades': n_loca},
+    })
+    return n_prov, n_depto, n_loca
+
+def _escribir(destino, secciones, encabezado):
+    """MAGIA + largo del encabezado (uint32) + encabezado JSON + secciones alineadas a 8 bytes. Reemplazo atómico."""
+    contenido = []
+    encabezado['secciones'] = {}
+    posicion = 0
+    for nombre, datos in secciones.items():
+        crudo = datos.tobytes() if isinstance(datos, array) else bytes(datos)
+        tipo = datos.typecode if isinstance(datos, array) else 'B'
+        encabezado['secciones'][nombre] = [posicion, len(crudo), tipo]
+        relleno = -len(crudo) % ALINEACION
+        contenido.append(crudo + b'\x00' * relleno)
+        posicion += len(crudo) + relleno
+    if sys.byteorder != 'little':
+        raise RuntimeError("El formato del gazetteer es little-endian") # Los array se escriben en el orden de la máquina
+    json_encabezado = json.dumps(encabezado, ensure_ascii=False).encode('utf-8')
+    inicio_datos = len(MAGIA) + 4 + len(json_encabezado)
+    relleno_encabezado = -inicio_datos % ALINEACION
+    temporal = destino + '.tmp'
+    with open(temporal, 'wb') as f:
+        f.write(MAGIA + struct.pack('<I', len(json_encabezado) + relleno_encabezado))
+        f.write(json_encabezado + b' ' * relleno_encabezado)
+        for bloque in contenido:
+            f.write(bloque)
+    os.replace(temporal, destino)
+
+# --- Consulta ---
+class Gazetteer:
+    """Consultas sobre gazetteer_pdl.bin abierto con mmap (sin pandas)."""
+
+    def __init__(self, ruta=ARCHIVO_GAZETTEER):
+        self.ruta = ruta
+        with open(ruta, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        datos = memoryview(self._mmap)
+        if bytes(datos[:len(MAGIA)]) != MAGIA:
+            raise ValueError(f"'{ruta}' no es un gazetteer P-D-L")
+        (largo,) = struct.unpack_from('<I', datos, len(MAGIA))
+        inicio = len(MAGIA) + 4
+        self.encabezado = json.loads(bytes(datos[inicio:inicio + largo]))
+        if self.encabezado['version_formato'] != VERSION_FORMATO:
+            raise ValueError(f"'{ruta}' tiene formato {self.encabezado['version_formato']}; se esperaba {VERSION_FORMATO}. "
+                             "Volver a compilarlo con: python gazetteer.py compilar (en cp/cp2)")
+        base = inicio + largo
+        self._secciones = {}
+        for nombre, (posicion, tamano, tipo) in self.encabezado['secciones'].items():
+            seccion = datos[base + posicion:base + posicion + tamano]
+            self._secciones[nombre] = seccion if tipo == 'B' else seccion.cast(tipo)
+        cantidades = self.encabezado['cantidades']
+        self.n_provincias, self.n_departamentos, self.n_localidades = (
+            cantidades['provincias'], cantidades['departamentos'], cantidades['localidades'])
+
+    def arreglo(self, nombre):
+        """Sección cruda (memoryview sobre el mmap): por ejemplo 'loca_id' o 'loca_depto', para np.frombuffer."""
+        return self._secciones[nombre]
+
+    def _texto(self, nombre, i):
+        inicios = self._secciones[nombre + '_ini']
+        return str(self._secciones[nombre][inicios[i]:inicios[i + 1]], 'utf-8')
+
+    def textos(self, nombre):
+        """Todos los textos de una columna ('loca_nombre', 'loca_norm', ...) como lista, en orden."""
+        bloque = str(self._secciones[nombre], 'utf-8')
+        inicios = self._secciones[nombre + '_ini']
+        if bloque.isascii(): # Lo habitual: las posiciones en bytes coinciden con las de caracteres
+            return [bloque[inicios[i]:inicios[i + 1]] for i in range(len(inicios) - 1)]
+        return [self._texto(nombre, i) for i in range(len(inicios) - 1)]
+
+    # Filas por posición
+    def provincia(self, p):
+        return Provincia(self._secciones['prov_id'][p], self._texto('prov_nombre', p), self._texto('prov_norm', p))
+
+    def departamento(self, d):
+        p = self._secciones['depto_prov'][d]
+        return Departamento(self._secciones['depto_id'][d], self._secciones['prov_id'][p],
+                            self._texto('depto_nombre', d), self._texto('depto_norm', d))
+
+    def localidad(self, l):
+        d = self._secciones['loca_depto'][l]
+        p = self._secciones['depto_prov'][d]
+        return Localidad(self._secciones['loca_id'][l], self._secciones['depto_id'][d], self._secciones['prov_id'][p],
+                         self._texto('loca_nombre', l), self._texto('loca_norm', l))
+
+    # Búsquedas por ID
+    def _por_id(self, nivel, id_buscado):
+        ids = self._secciones[f'{nivel}_id']
+        indice = self._secciones[f'idx_{nivel}_id']
+        i = bisect.bisect_left(indice, id_buscado, key=ids.__getitem__)
+        return indice[i] if i < len(indice) and ids[indice[i]] == id_buscado else None
+
+    def provincia_por_id(self, id_prov):
+        p = self._por_id('prov', id_prov)
+        return None if p is None else self.provincia(p)
+
+    def departamento_por_id(self, id_depto):
+        d = self._por_id('depto', id_depto)
+        return None if d is None else self.departamento(d)
+
+    def localidad_por_id(self, id_loca):
+        l = self._por_id('loca', id_loca)
+        return None if l is None else self.localidad(l)
+
+    # Búsquedas por nombre (se normaliza con normalize_name, igual que en el pipeline)
+    def _posicion_provincia(self, nombre):
+        objetivo = normalize_name(nombre)
+        indice = self._secciones['idx_prov_nombre']
+        clave = lambda p: self._texto('prov_norm', p)
+        i = bisect.bisect_left(indice, objetivo, key=clave)
+        return indice[i] if i < len(indice) and clave(indice[i]) == objetivo else None
+
+    def provincia_por_nombre(self, nombre):
+        p = self._posicion_provincia(nombre)
+        return None if p is None else self.provincia(p)
+
+    def _rango(self, nivel, p, nombre):
+        indice = self._secciones[f'idx_{nivel}_nombre']
+        if nivel == 'depto':
+            clave = lambda d: (self._secciones['depto_prov'][d], self._texto('depto_norm', d))
+        else:
+            clave = lambda l: (self._secciones['depto_prov'][self._secciones['loca_depto'][l]], self._texto('loca_norm', l))
+        objetivo = (p, normalize_name(nombre))
+        desde = bisect.bisect_left(indice, objetivo, key=clave)
+        hasta = bisect.bisect_right(indice, objetivo, lo=desde, key=clave)
+        return [indice[i] for i in range(desde, hasta)]
+
+    def departamentos(self, provincia, nombre):
+        """Departamentos con ese nombre en la provincia (la provincia, por nombre o como Provincia)."""
+        p = self._posicion_provincia(provincia.nombre if isinstance(provincia, Provincia) else provincia)
+        return [] if p is None else [self.departamento(d) for d in self._rango('depto', p, nombre)]
+
+    def localidades(self, provincia, nombre):
+        """Localidades con ese nombre en la provincia; puede haber varias (una por departamento)."""
+        p = self._posicion_provincia(provincia.nombre if isinstance(provincia, Provincia) else provincia)
+        return [] if p is None else [self.localidad(l) for l in self._rango('loca', p, nombre)]
+
+    def resolver(self, provincia, localidad):
+        """(id_prov, id_depto, id_loca) de cada localidad con ese nombre en esa provincia."""
+        return [(l.id_prov, l.id_depto, l.id) for l in self.localidades(provincia, localidad)]
+
+    def es_vigente(self, fuentes):
+        """True si el archivo se compiló a partir de estas mismas versiones de los CSV y de normalize_name."""
+        return (self.encabezado.get('normalizacion') == hash_de_normalizacion()
+                and self.encabezado['fuentes'] == {os.path.basename(r): hash_de_archivo(r) for r in fuentes})
+
+    def cerrar(self):
+        self._secciones = {}
+        self._mmap.close()
+
+def abrir_si_vigente(ruta=ARCHIVO_GAZETTEER, fuentes=None):
+    """El Gazetteer si existe y corresponde a los CSV actuales; si no, None (hay que compilarlo o usar los CSV)."""
+    if not os.path.exists(ruta):
+        return None
+    try:
+        gazetteer = Gazetteer(ruta)
+    except (ValueError, KeyError):
+        return None
+    fuentes = fuentes or fuentes_por_defecto(os.path.dirname(ruta))
+    if not all(os.path.exists(r) for r in fuentes) or not gazetteer.es_vigente(fuentes):
+        gazetteer.cerrar()
+        return None
+    return gazetteer
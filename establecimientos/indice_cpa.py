@@ -0,0 +1,48 @@
+import time
+
+from . import cpa
+from .models import CodigoPostal, Establecimiento, VersionDatos
+
+# Índice CPA en memoria para formularios e importaciones (la lógica está en cpa.py, que no depende de Django).
+# Se arma con dos consultas (CodigoPostal y los domicilios de Establecimiento con CPA) y después cada validación
+# o autocompletado es una búsqueda en diccionarios, sin ir a la base.
+# Cada proceso (worker web) tiene su copia: los comandos de carga llaman a invalidar_indice(), que además de
+# descartar la del proceso incrementa VersionDatos('ubicaciones'); los demás procesos comparan esa versión
+# (a lo sumo cada SEGUNDOS_ENTRE_VERIFICACIONES, una consulta por clave única) y vuelven a armar el índice si cambió.
+# Los domicilios que guarda otro proceso se ven en su índice recién la próxima vez que se arma.
+
+VERSION = 'ubicaciones'
+SEGUNDOS_ENTRE_VERIFICACIONES = 30
+
+_indice = None
+_version = None
+_verificado = 0.0 # time.monotonic() de la última comparación con la versión en la base
+
+def obtener_indice():
+    global _indice, _version, _verificado
+    ahora = time.monotonic()
+    if _indice is not None and ahora - _verificado < SEGUNDOS_ENTRE_VERIFICACIONES:
+        return _indice
+    version = VersionDatos.actual(VERSION)
+    _verificado = ahora
+    if _indice is None or version != _version:
+        indice = cpa.IndiceCPA()
+        filas = CodigoPostal.objects.values_list('localidad_id', 'cp', 'cpa', 'provincia__nombre', 'localidad__nombre')
+        for fila in filas.iterator(chunk_size=5000):
+            indice.agregar(*fila)
+        domicilios = Establecimiento.objects.exclude(cpa__isnull=True).exclude(cpa='').values_list('localidad_id', 'calle', 'cpa')
+        for id_loca, calle, codigo in domicilios.iterator(chunk_size=5000):
+            indice.agregar_domicilio(id_loca, calle, codigo)
+        _indice, _version = indice, version
+    return _indice
+
+def invalidar_indice():
+    """Después de cargar códigos postales: el índice se vuelve a armar en este proceso y en los demás."""
+    global _indice
+    _indice = None
+    VersionDatos.incrementar(VERSION)
+
+def registrar_domicilio(establecimiento):
+    """Suma al índice (si ya está armado) el domicilio de un establecimiento recién guardado."""
+    if _indice is not None and establecimiento.cpa:
+        _indice.agregar_domicilio(establecimiento.localidad_id, establecimiento.calle, establecimiento.cpa)
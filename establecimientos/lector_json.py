@@ -0,0 +1,108 @@
+import gzip
+import io
+import json
+import re
+
+# Lectura incremental de archivos JSON grandes (ej. localidades.json de georef/INDEC, varios MB).
+# En lugar de json.load() del documento entero, iterar_arreglo() recorre el objeto de nivel superior y, al llegar a
+# la clave pedida, devuelve los elementos de su arreglo de a uno: cada elemento se decodifica con
+# JSONDecoder.raw_decode() sobre un búfer que se rellena de a TAMANO_BLOQUE caracteres.
+# En memoria quedan el búfer y el elemento actual, no el archivo. Los demás valores del nivel superior
+# ('cantidad', 'parametros', ...) se decodifican y se descartan.
+# abrir_json() acepta el archivo tal cual o comprimido con gzip (se detecta por el contenido, no por la extensión).
+
+TAMANO_BLOQUE = 1 << 16
+MAGIA_GZIP = b'\x1f\x8b'
+RE_ESPACIOS = re.compile(r'[ \t\n\r]*')
+RE_NUMERO_CORTADO = re.compile(r'[0-9.eE+\-]*') # Si un número llega hasta el final del búfer, puede seguir
+
+def abrir_json(ruta):
+    """Abre el archivo en modo texto UTF-8, descomprimiendo al vuelo si es un .gz."""
+    archivo = open(ruta, 'rb')
+    if archivo.peek(2)[:2] == MAGIA_GZIP:
+        archivo = gzip.GzipFile(fileobj=archivo)
+    return io.TextIOWrapper(archivo, encoding='utf-8')
+
+class _Lector:
+    def __init__(self, archivo, tamano_bloque):
+        self.archivo = archivo
+        self.tamano_bloque = tamano_bloque
+        self.decodificador = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.fin_de_archivo = False
+
+    def leer_mas(self):
+        bloque = self.archivo.read(self.tamano_bloque)
+        if not bloque:
+            self.fin_de_archivo = True
+        self.buffer = self.buffer[self.pos:] + bloque # Se descarta lo ya consumido
+        self.pos = 0
+
+    def caracter(self):
+        """El siguiente carácter que no es espacio (sin consumirlo); '' al final del archivo."""
+        while True:
+            self.pos = RE_ESPACIOS.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or self.fin_de_archivo:
+                return self.buffer[self.pos:self.pos + 1]
+            self.leer_mas()
+
+    def esperar(self, esperado):
+        encontrado = self.caracter()
+        if encontrado != esperado:
+            raise ValueError(f"JSON inesperado: se esperaba '{esperado}' y se encontró '{encontrado or 'fin del archivo'}'")
+        self.pos += 1
+
+    def valor(self):
+        """Decodifica el siguiente valor JSON completo (pidiendo más texto mientras esté cortado)."""
+        self.caracter()
+        while True:
+            try:
+                valor, fin = self.decodificador.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.fin_de_archivo:
+                    raise
+                self.leer_mas()
+                continue
+            if (not self.fin_de_archivo and isinstance(valor, (int, float))
+                    and RE_NUMERO_CORTADO.match(self.buffer, fin).end() == len(self.buffer)):
+                self.leer_mas() # '12' puede ser el comienzo de '12.5' en el próximo bloque
+                continue
+            self.pos = fin
+            return valor
+
+    def elementos(self):
+        """Los elementos del arreglo que empieza en la posición actual."""
+        self.esperar('[')
+        if self.caracter() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.valor()
+            separador = self.caracter()
+            self.pos += 1
+            if separador == ']':
+                return
+            if separador != ',':
+                raise ValueError(f"JSON inesperado: se esperaba ',' o ']' y se encontró '{separador or 'fin del archivo'}'")
+
+def iterar_arreglo(archivo, clave, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Devuelve uno a uno los elementos de documento[clave] (o del documento, si es directamente un arreglo).
+    Error si la clave no está en el objeto de nivel superior.
+    """
+    lector = _Lector(archivo, tamano_bloque)
+    if lector.caracter() == '[':
+        yield from lector.elementos()
+        return
+    lector.esperar('{')
+    while lector.caracter() != '}':
+        nombre = lector.valor()
+        lector.esperar(':')
+        if nombre == clave:
+            yield from lector.elementos()
+            return
+        lector.valor() # Otra clave del nivel superior: se descarta
+        if lector.caracter() == ',':
+            lector.pos += 1
+    raise KeyError(f"El JSON no tiene la clave '{clave}' en el nivel superior")
@@ -1,41 +1,46 @@
-import json
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from establecimientos.carga_masiva import TAMANO_LOTE, UpsertPorLotes, describir
+from establecimientos.lector_json import abrir_json, iterar_arreglo
 from establecimientos.models import Provincia, Localidad
+from establecimientos.recarga_referencia import destino
+
+# Carga por lotes: una consulta por lote para leer lo que ya existe, comparación en memoria y escritura de a --lote
+# filas (ver establecimientos/carga_masiva.py), todo en una transacción. Antes era un update_or_create por localidad.
+# El JSON se lee de a una localidad (ver establecimientos/lector_json.py), así la memoria depende del tamaño
+# del lote y no del archivo; también acepta el archivo comprimido con gzip (localidades.json.gz).
 
 class Command(BaseCommand):
     help = "Carga provincias y localidades desde archivo JSON oficial INDEC"
 
     def add_arguments(self, parser):
-        parser.add_argument('json_path', type=str, help='Ruta al archivo JSON con las localidades')
+        parser.add_argument('json_path', type=str, help='Ruta al archivo JSON con las localidades (puede estar comprimido con gzip)')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Filas por INSERT/UPDATE')
 
     def handle(self, *args, **kwargs):
         path = kwargs['json_path']
 
-        with open(path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
-        # Guardamos provincias en un dict para evitar repetidos
-        provincias_cache = {}
+        with abrir_json(path) as f, transaction.atomic():
+            provincias = UpsertPorLotes(destino(Provincia), 'codigo', ['nombre'], tamano_lote=kwargs['lote'])
+            # Las localidades existentes se leen por lote (no toda la tabla al empezar): memoria acotada por --lote
+            localidades = UpsertPorLotes(destino(Localidad), 'codigo', ['provincia_id', 'nombre'], tamano_lote=kwargs['lote'],
+                                         precargar_todo=False)
+            # Guardamos el pk de cada provincia para no consultarlo en cada localidad
+            provincias_cache = {}
 
-        for loc in data['localidades']:
-            prov_id = int(loc['provincia']['id'])
-            prov_nombre = loc['provincia']['nombre']
+            for loc in iterar_arreglo(f, 'localidades'):
+                prov_id = int(loc['provincia']['id'])
 
-            # Crear provincia si no existe
-            if prov_id not in provincias_cache:
-                provincia, _ = Provincia.objects.update_or_create(codigo=prov_id, defaults={'nombre': prov_nombre})
-                provincias_cache[prov_id] = provincia
-            else:
-                provincia = provincias_cache[prov_id]
+                # La provincia se escribe antes que sus localidades (la primera vez que aparece)
+                if prov_id not in provincias_cache:
+                    provincias.agregar(prov_id, nombre=loc['provincia']['nombre'])
+                    provincias_cache[prov_id] = provincias.pk(prov_id)
 
-            # Crear localidad
-            localidad_id = int(loc['id'])
-            nombre = loc['nombre']
+                localidades.agregar(int(loc['id']), provincia_id=provincias_cache[prov_id], nombre=loc['nombre'])
 
-            Localidad.objects.update_or_create(
-                codigo=localidad_id,
-                provincia=provincia,
-                defaults={'nombre': nombre},
-            )
+            resumen_provincias = provincias.terminar()
+            resumen_localidades = localidades.terminar()
 
+        self.stdout.write(describir(Provincia, resumen_provincias, con_velocidad=False)) # Se cargan a medida que aparecen
+        self.stdout.write(describir(Localidad, resumen_localidades))
         self.stdout.write(self.style.SUCCESS('¡Provincias y localidades cargadas correctamente!'))
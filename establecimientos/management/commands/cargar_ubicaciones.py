@@ -0,0 +1,181 @@
+import csv
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from establecimientos import cpa
+from establecimientos.carga_masiva import TAMANO_LOTE, abrir_tabla, cargar_tabla_temporal, crear_tabla_temporal, describir
+from establecimientos.gazetteer import abrir_si_vigente
+from establecimientos.indice_cpa import invalidar_indice
+from establecimientos.models import CodigoPostal, Localidad, Provincia
+from establecimientos.normalizacion import normalize_name
+from establecimientos.recarga_referencia import destino
+
+# Carga los códigos postales de la tabla final del pipeline de CP
+# (cp/cp2/tabla_final_corregida_n.csv: id_prov;nom_prov;...;id_loca;nom_loca;cp;cpa) en CodigoPostal.
+# También acepta la tabla en .parquet o .arrow (pipeline_cp.py --formato parquet|arrow): se lee de a un lote, con los
+# IDs como enteros (ver abrir_tabla en establecimientos/carga_masiva.py; hace falta pyarrow).
+# Provincia y Localidad no se tocan: son las de INDEC (cargar_localidades_json) y sus códigos no son los de la tabla
+# (id_prov/id_loca son números de fila del maestro de CP). Cada fila se asigna a una localidad existente:
+#   - provincia: por la letra del CPA de su nombre (así 'CAPITAL FEDERAL' de la tabla es la
+#     'Ciudad Autónoma de Buenos Aires' de INDEC);
+#   - localidad: por (provincia, nombre normalizado). Si el gazetteer P-D-L compilado del pipeline
+#     (cp/cp2/gazetteer_pdl.bin, ver establecimientos/gazetteer.py) está vigente, el nombre es el del maestro para el
+#     id_loca de la fila, ya normalizado al compilar, y las filas cuyo id_loca no está en el maestro (o está en otra
+#     provincia) no se cargan; si no, se normaliza el nom_loca de la tabla con normalize_name.
+# Las filas sin provincia o localidad (o con un nombre que se repite en la provincia) no se cargan: van al
+# reporte --sin-match para corregirlas a mano. Las asignadas se vuelcan a una tabla temporal (COPY FROM STDIN en
+# PostgreSQL, executemany por lotes en SQLite; ver cargar_tabla_temporal en establecimientos/carga_masiva.py) y de
+# ahí un INSERT ... SELECT ... ON CONFLICT DO UPDATE respeta el unique_together (provincia, localidad, cp) de
+# CodigoPostal sin consultar fila por fila; solo se actualizan las filas que cambian. Todo en una transacción.
+# El CPA se normaliza con cpa.parsear(): los marcadores ('Buscar CPA') y los inválidos quedan en NULL. Si una
+# localidad tiene varios CPA para el mismo CP, queda uno solo (CodigoPostal guarda un CPA por CP).
+# Uso: python manage.py cargar_ubicaciones [cp/cp2/tabla_final_corregida_n.csv|.parquet|.arrow] [--sin-match ubicaciones_sin_match.csv]
+#                                          [--gazetteer cp/cp2/gazetteer_pdl.bin]
+
+TABLA_POR_DEFECTO = settings.BASE_DIR / 'cp' / 'cp2' / 'tabla_final_corregida_n.csv'
+SIN_MATCH_POR_DEFECTO = 'ubicaciones_sin_match.csv'
+GAZETTEER_POR_DEFECTO = settings.BASE_DIR / 'cp' / 'cp2' / 'gazetteer_pdl.bin'
+TEMPORAL = 'carga_ubicaciones'
+COLUMNAS_TEMPORAL = [('provincia_id', 'bigint'), ('localidad_id', 'bigint'), ('cp', 'varchar(10)'), ('cpa', 'varchar(10)')]
+COLUMNAS_TABLA = ['id_prov', 'nom_prov', 'id_loca', 'nom_loca', 'cp', 'cpa']
+
+class Command(BaseCommand):
+    help = "Carga los códigos postales de la tabla final del pipeline de CP en las localidades de INDEC"
+
+    def add_arguments(self, parser):
+        parser.add_argument('tabla', nargs='?', default=str(TABLA_POR_DEFECTO),
+                            help="CSV separado por ';', o la misma tabla en .parquet/.arrow")
+        parser.add_argument('--sin-match', default=SIN_MATCH_POR_DEFECTO,
+                            help='CSV donde se guardan las filas que no se pudieron asignar a una localidad')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Filas por lote hacia la tabla temporal')
+        parser.add_argument('--gazetteer', default=str(GAZETTEER_POR_DEFECTO),
+                            help='Maestro P-D-L compilado (python gazetteer.py compilar en cp/cp2); se usa si está vigente')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        self.provincias = self.provincias_por_letra()
+        self.localidades = self.localidades_por_nombre()
+        if not self.provincias or not self.localidades:
+            raise CommandError("No hay provincias o localidades cargadas: primero hay que correr "
+                               "cargar_localidades_json con el JSON de INDEC.")
+        self.sin_match = [] # (fila de la tabla, motivo)
+        self.asignadas = set() # pk de las localidades que recibieron filas
+        self.gazetteer = abrir_si_vigente(options['gazetteer'])
+        if self.gazetteer is None:
+            self.stdout.write(f"Sin gazetteer vigente en '{options['gazetteer']}': se normalizan los nombres de la tabla")
+
+        try:
+            with abrir_tabla(options['tabla'], tamano_lote=options['lote']) as (columnas, filas), transaction.atomic():
+                crear_tabla_temporal(connection, TEMPORAL, COLUMNAS_TEMPORAL)
+                cargadas = cargar_tabla_temporal(connection, TEMPORAL, [c for c, _ in COLUMNAS_TEMPORAL],
+                                                 self.filas(columnas, filas), tamano_lote=options['lote'])
+                segundos_temporal = time.perf_counter() - inicio
+                resumen = self.upsert(destino(CodigoPostal), ['provincia_id', 'localidad_id', 'cp'], f"""
+                    SELECT provincia_id, localidad_id, cp, MAX(cpa) FROM {TEMPORAL}
+                    GROUP BY provincia_id, localidad_id, cp""", ['provincia_id', 'localidad_id', 'cp', 'cpa'])
+                with connection.cursor() as cursor:
+                    cursor.execute(f"DROP TABLE {TEMPORAL}")
+        except (OSError, ImportError) as e: # Tabla inexistente o ilegible, o .parquet/.arrow sin pyarrow
+            raise CommandError(str(e))
+        finally:
+            if self.gazetteer is not None:
+                self.gazetteer.cerrar()
+        invalidar_indice()
+
+        self.stdout.write(f"{cargadas} filas a la tabla temporal en {segundos_temporal:.2f} s, "
+                          f"en {len(self.asignadas)} localidades")
+        if self.sin_match:
+            self.guardar_sin_match(options['sin_match'])
+            motivos = Counter(motivo for _, motivo in self.sin_match)
+            self.stdout.write(self.style.WARNING(
+                f"{len(self.sin_match)} filas sin localidad guardadas en '{options['sin_match']}' ("
+                + ", ".join(f"{motivo}: {cantidad}" for motivo, cantidad in motivos.most_common()) + ")"))
+        self.stdout.write(describir(CodigoPostal, resumen, con_velocidad=False))
+        self.stdout.write(self.style.SUCCESS(f"Códigos postales cargados en {time.perf_counter() - inicio:.2f} s"))
+
+    def provincias_por_letra(self):
+        """Letra del CPA -> pk de la Provincia cargada."""
+        por_letra = {}
+        for pk, nombre in destino(Provincia).objects.values_list('pk', 'nombre'):
+            letra = cpa.letra_de_provincia(nombre)
+            if letra:
+                por_letra.setdefault(letra, pk)
+        return por_letra
+
+    def localidades_por_nombre(self):
+        """(pk de provincia, nombre normalizado) -> [pk de Localidad] (más de uno si el nombre se repite en la provincia)."""
+        por_nombre = defaultdict(list)
+        filas = destino(Localidad).objects.values_list('pk', 'provincia_id', 'nombre')
+        for pk, provincia_id, nombre in filas.iterator(chunk_size=10000):
+            por_nombre[provincia_id, normalize_name(nombre)].append(pk)
+        return por_nombre
+
+    def filas(self, columnas, filas):
+        """Las filas asignadas a una localidad, en el orden de COLUMNAS_TEMPORAL; las demás quedan en self.sin_match."""
+        faltantes = set(COLUMNAS_TABLA) - set(columnas)
+        if faltantes:
+            raise CommandError(f"Faltan columnas en la tabla: {', '.join(sorted(faltantes))}")
+        for fila in filas:
+            cp = str(fila['cp'] or '').strip()[:10]
+            nom_prov, nom_loca = self.nombres_del_maestro(fila)
+            if nom_loca is None:
+                self.sin_match.append((fila, 'id_loca fuera del maestro P-D-L'))
+                continue
+            provincia = self.provincias.get(cpa.letra_de_provincia(nom_prov))
+            candidatas = self.localidades.get((provincia, nom_loca), [])
+            if not cp:
+                self.sin_match.append((fila, 'sin CP'))
+            elif provincia is None:
+                self.sin_match.append((fila, 'provincia desconocida'))
+            elif not candidatas:
+                self.sin_match.append((fila, 'localidad no encontrada'))
+            elif len(candidatas) > 1:
+                self.sin_match.append((fila, 'localidad repetida en la provincia'))
+            else:
+                self.asignadas.add(candidatas[0])
+                decodificado = cpa.parsear(fila['cpa'])
+                yield provincia, candidatas[0], cp, decodificado.codigo if decodificado else None
+
+    def nombres_del_maestro(self, fila):
+        """(nombre de provincia, nombre de localidad normalizado) de la fila; (.., None) si el gazetteer no la conoce."""
+        if self.gazetteer is None:
+            return fila['nom_prov'], normalize_name(fila['nom_loca'])
+        try:
+            localidad = self.gazetteer.localidad_por_id(int(fila['id_loca']))
+        except (TypeError, ValueError):
+            localidad = None
+        if localidad is None or str(localidad.id_prov) != str(fila['id_prov']).strip():
+            return fila['nom_prov'], None
+        return self.gazetteer.provincia_por_id(localidad.id_prov).nombre, localidad.nombre_norm
+
+    def guardar_sin_match(self, ruta):
+        with open(ruta, 'w', newline='', encoding='utf-8') as f:
+            escritor = csv.writer(f, delimiter=';')
+            escritor.writerow(COLUMNAS_TABLA + ['motivo'])
+            for fila, motivo in self.sin_match:
+                escritor.writerow([fila[columna] for columna in COLUMNAS_TABLA] + [motivo])
+
+    def upsert(self, modelo, unicos, select, columnas):
+        """
+        INSERT INTO modelo (columnas) <select> ON CONFLICT (unicos) DO UPDATE de las demás columnas, solo si cambian.
+        Devuelve el resumen (recibidas, creadas, actualizadas, sin_cambios) como UpsertPorLotes.
+        """
+        tabla = modelo._meta.db_table
+        actualizar = [c for c in columnas if c not in unicos]
+        asignaciones = ', '.join(f"{c} = EXCLUDED.{c}" for c in actualizar)
+        # COALESCE para comparar también los NULL (cpa)
+        cambios = ' OR '.join(f"COALESCE({tabla}.{c}, '') <> COALESCE(EXCLUDED.{c}, '')" if c == 'cpa'
+                              else f"{tabla}.{c} <> EXCLUDED.{c}" for c in actualizar)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM ({select}) AS s")
+            recibidas = cursor.fetchone()[0]
+            antes = modelo.objects.count()
+            cursor.execute(f"INSERT INTO {tabla} ({', '.join(columnas)}) {select} "
+                           f"ON CONFLICT ({', '.join(unicos)}) DO UPDATE SET {asignaciones} WHERE {cambios}")
+            escritas = cursor.rowcount
+        creadas = modelo.objects.count() - antes
+        return {'recibidas': recibidas, 'creadas': creadas, 'actualizadas': escritas - creadas,
+                'sin_cambios': recibidas - escritas}
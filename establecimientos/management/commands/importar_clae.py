@@ -1,33 +1,67 @@
-import csv
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from establecimientos.carga_masiva import TAMANO_LOTE, UpsertPorLotes, describir
+from establecimientos.clae import JerarquiaCLAE, invalidar_jerarquia, leer_clae
 from establecimientos.models import ActividadCLAE
+from establecimientos.recarga_referencia import destino
+
+# El CSV se lee y valida entero en una pasada (ver establecimientos/clae.py) y las filas válidas se cargan
+# por lotes con INSERT ... ON CONFLICT (codigo) DO UPDATE (ver establecimientos/carga_masiva.py), en una transacción.
+# Antes era un update_or_create por fila y los errores se veían recién al fallar cada una.
+# Los códigos ya cargados sin los ceros a la izquierda ('14211') se renombran a su código completo ('014211')
+# antes de cargar, así conservan su pk (y las empresas que los referencian) en lugar de duplicarse.
+# Al terminar invalida la jerarquía en memoria de los procesos web (ver obtener_jerarquia en clae.py).
+
+MAX_ERRORES_MOSTRADOS = 20
 
 class Command(BaseCommand):
     help = 'Importa el nomenclador CLAE desde un archivo CSV'
 
     def add_arguments(self, parser):
         parser.add_argument('archivo_csv', type=str)
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Filas por INSERT')
+        parser.add_argument('--estricto', action='store_true', help='No cargar nada si alguna fila tiene errores')
 
     def handle(self, *args, **options):
-        archivo_csv = options['archivo_csv']
-        with open(archivo_csv, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            total = 0
-            for row in reader:
-                try:
-                    ActividadCLAE.objects.update_or_create(
-                        codigo=row['clae6'].strip(),
-                        defaults={
-                            'descripcion': row['clae6_desc'].strip(),
-                            'clae3': row['clae3'].strip(),
-                            'clae3_desc': row['clae3_desc'].strip(),
-                            'clae2': row['clae2'].strip(),
-                            'clae2_desc': row['clae2_desc'].strip(),
-                            'letra': row['letra'].strip(),
-                            'letra_desc': row['letra_desc'].strip(),
-                        }
-                    )
-                    total += 1
-                except Exception as e:
-                    self.stderr.write(f"Error en fila: {row} - {e}")
-        self.stdout.write(self.style.SUCCESS(f"Importación completada. {total} registros cargados."))
+        try:
+            filas, errores = leer_clae(options['archivo_csv'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for linea, problema in errores[:MAX_ERRORES_MOSTRADOS]:
+            self.stderr.write(f"Línea {linea}: {problema}")
+        if len(errores) > MAX_ERRORES_MOSTRADOS:
+            self.stderr.write(f"... y {len(errores) - MAX_ERRORES_MOSTRADOS} errores más")
+        if errores and options['estricto']:
+            raise CommandError(f"{len(errores)} filas con errores; no se cargó nada (--estricto).")
+
+        with transaction.atomic():
+            renombradas = self.completar_codigos_existentes({fila.clae6 for fila in filas})
+            carga = UpsertPorLotes(destino(ActividadCLAE), 'codigo',
+                                   ['descripcion', 'clae3', 'clae3_desc', 'clae2', 'clae2_desc', 'letra', 'letra_desc'],
+                                   tamano_lote=options['lote'])
+            for fila in filas:
+                carga.agregar(fila.clae6, descripcion=fila.clae6_desc, clae3=fila.clae3, clae3_desc=fila.clae3_desc,
+                              clae2=fila.clae2, clae2_desc=fila.clae2_desc, letra=fila.letra, letra_desc=fila.letra_desc)
+            resumen = carga.terminar()
+        invalidar_jerarquia()
+
+        jerarquia = JerarquiaCLAE(filas)
+        if renombradas:
+            self.stdout.write(f"{renombradas} códigos existentes completados con ceros a la izquierda")
+        self.stdout.write(describir(ActividadCLAE, resumen))
+        self.stdout.write(f"Jerarquía: {len(jerarquia.letras)} letras, {len(jerarquia.clae2)} clae2, "
+                          f"{len(jerarquia.clae3)} clae3, {len(jerarquia.actividades)} clae6")
+        self.stdout.write(self.style.SUCCESS(f"Importación completada. {len(filas)} registros cargados"
+                                             + (f", {len(errores)} filas con errores." if errores else ".")))
+
+    def completar_codigos_existentes(self, codigos):
+        """Renombra los códigos guardados sin ceros a la izquierda cuyo código completo viene en el archivo."""
+        modelo = destino(ActividadCLAE)
+        existentes = set(modelo.objects.values_list('codigo', flat=True))
+        cortos = [c for c in existentes if c.isdigit() and len(c) < 6 and c.zfill(6) in codigos and c.zfill(6) not in existentes]
+        objetos = list(modelo.objects.filter(codigo__in=cortos))
+        for objeto in objetos:
+            objeto.codigo = objeto.codigo.zfill(6)
+        modelo.objects.bulk_update(objetos, ['codigo'])
+        return len(objetos)
@@ -0,0 +1,70 @@
+import argparse
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from establecimientos.clae import invalidar_jerarquia
+from establecimientos.indice_cpa import invalidar_indice
+from establecimientos.models import ActividadCLAE, CodigoPostal, Localidad, Provincia
+from establecimientos.recarga_referencia import MINIMO_FILAS, RecargaEnSombra, revertir
+
+# Corre un comando de carga sobre tablas sombra y, si la nueva versión pasa la validación, la pone en uso con un
+# intercambio corto (ver establecimientos/recarga_referencia.py). Mientras carga, la web (cargar_localidades,
+# EstablecimientoForm) sigue viendo la versión completa anterior.
+# Uso: python manage.py recargar_referencia cargar_ubicaciones [cp/cp2/tabla_final_corregida_n.csv]
+#      python manage.py recargar_referencia importar_clae clae/clae_agg.csv
+#      python manage.py recargar_referencia --revertir cargar_ubicaciones   (vuelve a la versión anterior)
+
+# Tablas que escribe cada comando de carga
+MODELOS_POR_COMANDO = {
+    'cargar_localidades_json': (Provincia, Localidad),
+    'cargar_ubicaciones': (CodigoPostal,),
+    'importar_clae': (ActividadCLAE,),
+}
+
+class Command(BaseCommand):
+    help = "Recarga datos de referencia en tablas sombra y los pone en uso con un intercambio atómico"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--revertir', action='store_true', help='Volver a la versión anterior de las tablas del comando')
+        parser.add_argument('--minimo', type=float, default=MINIMO_FILAS,
+                            help='Fracción mínima de filas de la nueva versión respecto de la actual')
+        parser.add_argument('--no-intercambiar', action='store_true', help='Cargar y validar sin poner en uso')
+        parser.add_argument('comando', choices=sorted(MODELOS_POR_COMANDO))
+        parser.add_argument('argumentos', nargs=argparse.REMAINDER, help='Argumentos del comando de carga')
+
+    def handle(self, *args, **options):
+        modelos = MODELOS_POR_COMANDO[options['comando']]
+        nombres = ", ".join(modelo.__name__ for modelo in modelos)
+
+        if options['revertir']:
+            try:
+                segundos = revertir(*modelos)
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.invalidar_caches()
+            self.stdout.write(self.style.SUCCESS(f"{nombres}: de vuelta en la versión anterior "
+                                                 f"(intercambio en {segundos * 1000:.0f} ms)."))
+            return
+
+        recarga = RecargaEnSombra(*modelos, minimo=options['minimo'])
+        with recarga.en_sombra():
+            call_command(options['comando'], *options['argumentos'], stdout=self.stdout, stderr=self.stderr)
+        problemas, filas = recarga.validar()
+        for tabla, (actuales, nuevas) in filas.items():
+            self.stdout.write(f"{tabla}: {actuales} filas en uso -> {nuevas} en la nueva versión")
+        if problemas:
+            recarga.descartar()
+            raise CommandError("La nueva versión no se pone en uso:\n" + "\n".join(problemas))
+        if options['no_intercambiar']:
+            recarga.descartar()
+            self.stdout.write(self.style.SUCCESS("Validación correcta; no se puso en uso (--no-intercambiar)."))
+            return
+
+        segundos = recarga.intercambiar()
+        self.invalidar_caches()
+        self.stdout.write(self.style.SUCCESS(f"{nombres}: nueva versión en uso (intercambio en {segundos * 1000:.0f} ms); "
+                                             f"la anterior queda para --revertir."))
+
+    def invalidar_caches(self):
+        invalidar_indice()
+        invalidar_jerarquia()
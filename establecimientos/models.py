@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from ubicaciones.models import Provincia, ActividadCLAE
 
 # Tabla auxiliar para CIIU
@@ -156,5 +157,21 @@ class ActividadCLAE(models.Model):
     def __str__(self):
         return f"{self.codigo} - {self.descripcion}"
 
+# Versión de los datos de referencia (ej. 'ubicaciones'): los comandos de carga la incrementan y cada proceso web
+# la compara con la de sus cachés en memoria (índice CPA) para saber si tiene que volver a armarlas
+class VersionDatos(models.Model):
+    nombre = models.CharField(max_length=50, unique=True)
+    version = models.PositiveIntegerField(default=0)
+    actualizado = models.DateTimeField(null=True, blank=True)
 
+    def __str__(self):
+        return f"{self.nombre} v{self.version}"
+
+    @classmethod
+    def actual(cls, nombre):
+        return cls.objects.filter(nombre=nombre).values_list('version', flat=True).first() or 0
 
+    @classmethod
+    def incrementar(cls, nombre):
+        cls.objects.get_or_create(nombre=nombre)
+        cls.objects.filter(nombre=nombre).update(version=models.F('version') + 1, actualizado=timezone.now())
@@ -0,0 +1,55 @@
+import math
+import re
+import sys
+import unicodedata
+from functools import lru_cache
+
+# Normalización de nombres de provincias, localidades y calles: la usan la app (CPA, formularios) y los scripts de
+# cp/cp2 (que la importan desde acá a través de cp/cp2/normalizacion.py). No depende de Django ni de pandas.
+# Regex precompiladas, una tabla translate para las tildes del castellano y caché LRU por nombre.
+# unidecode (si está instalado) transcribe lo que la tabla no cubre; si no, se usa la descomposición Unicode,
+# que da lo mismo para las letras acentuadas latinas (el pipeline de cp/cp2 se corre con unidecode).
+
+RE_PARENTESIS = re.compile(r'\s*\(.*\)\s*')
+RE_ESPACIOS = re.compile(r'\s+')
+# Las mismas sustituciones que hace unidecode para las letras acentuadas del castellano (en minúscula)
+TILDES = str.maketrans('áéíóúüñàèìòùâêîôûäëïöç', 'aeiouunaeiouaeiouaeioc')
+
+TAMANO_CACHE = 1 << 18
+
+try:
+    from unidecode import unidecode as _a_ascii
+except ImportError:
+    def _a_ascii(texto):
+        return unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii')
+
+@lru_cache(maxsize=TAMANO_CACHE)
+def _normalizar(texto):
+    texto = texto.lower().strip()
+    # Paso 1: Corregir patrones específicos como 'a+-' a 'ñ'
+    texto = texto.replace('a+-', 'ñ')
+    # Paso 2: Eliminar contenido entre paréntesis
+    texto = RE_PARENTESIS.sub('', texto).strip()
+    # Paso 3: Quitar tildes (ñ -> n, á -> a, etc.); unidecode solo para lo que la tabla no cubre
+    texto = texto.translate(TILDES)
+    if not texto.isascii():
+        texto = _a_ascii(texto)
+    # Paso 4: Normalizar múltiples espacios
+    return RE_ESPACIOS.sub(' ', texto).strip()
+
+def es_nulo(valor):
+    """Lo mismo que pd.isna() para un valor suelto, sin importar pandas si no está cargado."""
+    if valor is None:
+        return True
+    if isinstance(valor, str):
+        return False
+    if isinstance(valor, float):
+        return math.isnan(valor)
+    pd = sys.modules.get('pandas') # pd.NA, pd.NaT, etc. solo pueden existir si pandas ya se importó
+    return pd is not None and pd.isna(valor) is True
+
+def normalize_name(name):
+    """Minúsculas, 'a+-' -> 'ñ', sin paréntesis, sin tildes y con espacios simples. Nulos -> ''."""
+    if es_nulo(name):
+        return ""
+    return _normalizar(str(name))
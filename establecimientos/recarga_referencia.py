@@ -0,0 +1,256 @@
+import time
+from contextlib import contextmanager
+
+from django.apps.registry import Apps
+from django.db import connection, models, transaction
+
+# Recarga de tablas de referencia (Provincia, Localidad, CodigoPostal, ActividadCLAE) sin tocar las tablas en uso:
+#   1. en_sombra(): por cada modelo se crea una tabla sombra '<tabla>__nueva' con la misma estructura y una copia de
+#      las filas actuales (así los pk no cambian y las FK de Establecimiento/Empresa siguen valiendo), y mientras dura
+#      el bloque destino(modelo) devuelve un modelo de la carga con Meta.db_table = la sombra: los comandos de carga
+#      (importar_clae, cargar_localidades_json, cargar_ubicaciones) escriben en destino(modelo) y no en el modelo.
+#      El modelo no se modifica (su _meta y las columnas que Django cachea siguen en la tabla en uso), así que el
+#      resto del proceso, y la web, siguen leyendo las tablas en uso, sin bloqueos.
+#   2. validar(): cantidad de filas (la nueva versión no puede tener menos de 'minimo' veces las filas actuales)
+#      e integridad de las FK en los dos sentidos (las filas que referencian a la tabla y las que ella referencia).
+#   3. intercambiar(): en una transacción corta, la tabla en uso pasa a '<tabla>__anterior' y la sombra toma su nombre.
+#      Las FK se mueven a la tabla nueva; en PostgreSQL se agregan NOT VALID (sin recorrer las tablas, ya se validaron
+#      en el paso 2) y se validan después del intercambio, sin bloquear lecturas ni escrituras.
+#      lock_timeout acota la espera por el bloqueo: si la web tiene la tabla ocupada se reintenta, en lugar de hacer
+#      esperar a las consultas que llegan detrás.
+#   4. revertir(): vuelve a la versión '__anterior' con el mismo intercambio (se guarda una sola versión anterior).
+# En SQLite el intercambio es el mismo, con las FK por nombre (legacy_alter_table) en lugar de moverlas.
+
+SUFIJO_NUEVA = '__nueva'
+SUFIJO_ANTERIOR = '__anterior'
+SUFIJO_INTERCAMBIO = '__intercambio'
+MINIMO_FILAS = 0.9     # La nueva versión debe tener al menos el 90 % de las filas actuales
+ESPERA_BLOQUEO = '3s'  # lock_timeout del intercambio en PostgreSQL
+REINTENTOS = 5
+
+_destinos = {} # modelo -> modelo de la carga sobre su tabla sombra, mientras dura en_sombra()
+
+def destino(modelo):
+    """El modelo en el que tiene que escribir un comando de carga: el de la tabla sombra si hay una recarga en curso."""
+    return _destinos.get(modelo, modelo)
+
+def _modelo_en_tabla(modelo, tabla):
+    """
+    Modelo con las columnas de 'modelo' sobre otra tabla, en un registro de apps aparte (no se mezcla con los modelos
+    del proyecto). Las FK quedan como columnas enteras con el nombre de la columna ('provincia_id').
+    """
+    atributos = {'__module__': modelo.__module__,
+                 'Meta': type('Meta', (), {'app_label': modelo._meta.app_label, 'db_table': tabla,
+                                           'managed': False, 'apps': Apps()})}
+    for campo in modelo._meta.concrete_fields:
+        if campo.is_relation:
+            atributos[campo.attname] = models.BigIntegerField(db_column=campo.column, null=campo.null)
+        else:
+            atributos[campo.name] = campo.clone()
+    return type(modelo.__name__, (models.Model,), atributos)
+
+def _q(nombre):
+    return connection.ops.quote_name(nombre)
+
+def _existe(tabla):
+    with connection.cursor() as cursor:
+        return tabla in connection.introspection.table_names(cursor)
+
+def _contar(tabla):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM {_q(tabla)}")
+        return cursor.fetchone()[0]
+
+def _crear_copia(tabla, copia):
+    """Crea 'copia' con la estructura de 'tabla' (columnas, índices, restricciones únicas) y sus filas."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {_q(copia)}")
+        if connection.vendor == 'postgresql':
+            # LIKE no copia las FK: se mueven desde la tabla en uso al intercambiar
+            cursor.execute(f"CREATE TABLE {_q(copia)} (LIKE {_q(tabla)} INCLUDING ALL)")
+            cursor.execute(f"INSERT INTO {_q(copia)} SELECT * FROM {_q(tabla)}")
+            _ajustar_secuencia(cursor, copia)
+        else:
+            cursor.execute("SELECT type, name, sql FROM sqlite_master WHERE tbl_name = %s AND sql IS NOT NULL "
+                           "ORDER BY type = 'index'", [tabla])
+            sufijo = f"__{time.time_ns()}" # Los nombres de índice son globales en SQLite
+            for tipo, nombre, sql in cursor.fetchall():
+                if tipo == 'table':
+                    cursor.execute(sql.replace(f'"{tabla}"', _q(copia), 1))
+                elif tipo == 'index':
+                    cursor.execute(sql.replace(f'"{nombre}"', _q(nombre.split('__')[0] + sufijo), 1)
+                                      .replace(f'"{tabla}"', _q(copia), 1))
+            cursor.execute(f"INSERT INTO {_q(copia)} SELECT * FROM {_q(tabla)}")
+
+def _ajustar_secuencia(cursor, tabla, columna='id'):
+    """PostgreSQL: la secuencia (identity) de la tabla sigue después del mayor id copiado."""
+    cursor.execute(f"SELECT setval(pg_get_serial_sequence(%s, %s), COALESCE(MAX({_q(columna)}), 0) + 1, false) "
+                   f"FROM {_q(tabla)}", [tabla, columna])
+
+def _referencias_entrantes(modelo):
+    """(modelo que referencia, campo FK) de cada FK hacia 'modelo' (incluye las tablas intermedias de ManyToMany)."""
+    referencias = []
+    for relacion in modelo._meta.related_objects:
+        if relacion.many_to_many:
+            intermedia = relacion.through
+            campos = [f for f in intermedia._meta.fields if f.is_relation and f.related_model is modelo]
+            referencias += [(intermedia, campo) for campo in campos]
+        elif relacion.field.concrete:
+            referencias.append((relacion.related_model, relacion.field))
+    return referencias
+
+class RecargaEnSombra:
+    def __init__(self, *modelos, minimo=MINIMO_FILAS, sufijo=SUFIJO_NUEVA):
+        """sufijo: de la versión que se va a poner en uso ('__nueva'; '__anterior' para revertir)."""
+        self.modelos = modelos
+        self.minimo = minimo
+        self.sufijo = sufijo
+        self.tablas = {modelo: modelo._meta.db_table for modelo in modelos} # Nombre real de cada tabla en uso
+
+    def sombra(self, modelo):
+        return self.tablas[modelo] + self.sufijo
+
+    def _tabla_a_validar(self, modelo):
+        """La sombra si el modelo se recarga; si no, la tabla en uso."""
+        return self.sombra(modelo) if modelo in self.tablas else modelo._meta.db_table
+
+    @contextmanager
+    def en_sombra(self):
+        """Durante el bloque, destino(modelo) lee y escribe la tabla sombra. Si el bloque falla, las sombras se borran."""
+        for modelo, tabla in self.tablas.items():
+            _crear_copia(tabla, self.sombra(modelo))
+        try:
+            for modelo in self.modelos:
+                _destinos[modelo] = _modelo_en_tabla(modelo, self.sombra(modelo))
+            yield self
+        except BaseException:
+            self.descartar()
+            raise
+        finally:
+            for modelo in self.modelos:
+                _destinos.pop(modelo, None)
+
+    def descartar(self):
+        with connection.cursor() as cursor:
+            for modelo in self.modelos:
+                cursor.execute(f"DROP TABLE IF EXISTS {_q(self.sombra(modelo))}")
+
+    def validar(self):
+        """Lista de problemas (vacía si la nueva versión se puede poner en uso) y resumen de filas por tabla."""
+        problemas, filas = [], {}
+        with connection.cursor() as cursor:
+            for modelo, tabla in self.tablas.items():
+                actuales, nuevas = _contar(tabla), _contar(self.sombra(modelo))
+                filas[tabla] = (actuales, nuevas)
+                if actuales and nuevas < actuales * self.minimo:
+                    problemas.append(f"{tabla}: {nuevas} filas en la nueva versión contra {actuales} en uso "
+                                     f"(mínimo {self.minimo:.0%}).")
+
+                # Filas de otras tablas que apuntan a filas que ya no están
+                for origen, campo in _referencias_entrantes(modelo):
+                    tabla_origen = self._tabla_a_validar(origen)
+                    cursor.execute(f"SELECT COUNT(*) FROM {_q(tabla_origen)} o WHERE o.{_q(campo.column)} IS NOT NULL "
+                                   f"AND NOT EXISTS (SELECT 1 FROM {_q(self.sombra(modelo))} n "
+                                   f"WHERE n.{_q(campo.target_field.column)} = o.{_q(campo.column)})")
+                    huerfanas = cursor.fetchone()[0]
+                    if huerfanas:
+                        problemas.append(f"{tabla_origen}.{campo.column}: {huerfanas} filas apuntan a filas de {tabla} "
+                                         f"que no están en la nueva versión.")
+
+                # FK de la nueva versión hacia filas que no existen
+                for campo in modelo._meta.fields:
+                    if not (campo.is_relation and campo.many_to_one):
+                        continue
+                    destino = self._tabla_a_validar(campo.related_model)
+                    cursor.execute(f"SELECT COUNT(*) FROM {_q(self.sombra(modelo))} n WHERE n.{_q(campo.column)} IS NOT NULL "
+                                   f"AND NOT EXISTS (SELECT 1 FROM {_q(destino)} d "
+                                   f"WHERE d.{_q(campo.target_field.column)} = n.{_q(campo.column)})")
+                    huerfanas = cursor.fetchone()[0]
+                    if huerfanas:
+                        problemas.append(f"{tabla}.{campo.column}: {huerfanas} filas de la nueva versión apuntan a "
+                                         f"filas inexistentes de {destino}.")
+        return problemas, filas
+
+    def intercambiar(self):
+        """La sombra pasa a estar en uso y la versión en uso queda como '__anterior'. Devuelve los segundos de bloqueo."""
+        tablas = list(self.tablas.values())
+        return _rotar([(tabla, tabla + SUFIJO_ANTERIOR) for tabla in tablas]
+                      + [(self.sombra(modelo), tabla) for modelo, tabla in self.tablas.items()], tablas,
+                      borrar=[tabla + SUFIJO_ANTERIOR for tabla in tablas])
+
+def revertir(*modelos):
+    """Vuelve a la versión '__anterior' de cada modelo (la que estaba en uso antes de la última recarga)."""
+    tablas = [modelo._meta.db_table for modelo in modelos]
+    faltantes = [t + SUFIJO_ANTERIOR for t in tablas if not _existe(t + SUFIJO_ANTERIOR)]
+    if faltantes:
+        raise ValueError(f"No hay versión anterior para volver: faltan {', '.join(faltantes)}")
+    problemas, _ = RecargaEnSombra(*modelos, minimo=0, sufijo=SUFIJO_ANTERIOR).validar()
+    if problemas:
+        raise ValueError("No se puede volver a la versión anterior:\n" + "\n".join(problemas))
+    return _rotar([(t, t + SUFIJO_INTERCAMBIO) for t in tablas]
+                  + [(t + SUFIJO_ANTERIOR, t) for t in tablas]
+                  + [(t + SUFIJO_INTERCAMBIO, t + SUFIJO_ANTERIOR) for t in tablas], tablas)
+
+def _rotar(renombres, tablas_en_uso, borrar=()):
+    """
+    Aplica los renombres [(de, a), ...] en una transacción corta, moviendo las FK de las tablas en uso que salen
+    a las que entran con el mismo nombre. Las tablas de 'borrar' (la versión anterior que se reemplaza) se borran
+    en la misma transacción: si el intercambio falla, siguen estando. Reintenta si no consigue el bloqueo a tiempo.
+    """
+    for intento in range(1, REINTENTOS + 1):
+        try:
+            inicio = time.perf_counter()
+            if connection.vendor == 'postgresql':
+                restricciones = _rotar_postgresql(renombres, tablas_en_uso, borrar)
+            else:
+                _rotar_sqlite(renombres, borrar)
+                restricciones = []
+            segundos = time.perf_counter() - inicio
+            break
+        except Exception as e:
+            if intento == REINTENTOS or 'lock timeout' not in str(e):
+                raise
+            time.sleep(intento)
+    # Fuera de la transacción del intercambio: VALIDATE solo toma SHARE UPDATE EXCLUSIVE (no bloquea lecturas ni escrituras)
+    with connection.cursor() as cursor:
+        for tabla, nombre in restricciones:
+            cursor.execute(f"ALTER TABLE {tabla} VALIDATE CONSTRAINT {_q(nombre)}")
+    return segundos
+
+def _rotar_postgresql(renombres, tablas_en_uso, borrar):
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"SET LOCAL lock_timeout = '{ESPERA_BLOQUEO}'")
+        for tabla in borrar:
+            cursor.execute(f"DROP TABLE IF EXISTS {_q(tabla)}")
+        # FK propias de las tablas en uso y FK de otras tablas hacia ellas. Se guardan con el nombre de la tabla
+        # (no su oid), así que al volver a crearlas después del renombre quedan en/hacia las tablas que entraron
+        cursor.execute("""
+            SELECT DISTINCT c.conrelid::regclass::text, c.conname, pg_get_constraintdef(c.oid)
+            FROM pg_constraint c
+            WHERE c.contype = 'f' AND (c.conrelid = ANY(%s::regclass[]) OR c.confrelid = ANY(%s::regclass[]))
+        """, [tablas_en_uso, tablas_en_uso])
+        restricciones = cursor.fetchall()
+        for tabla, nombre, _ in restricciones:
+            cursor.execute(f"ALTER TABLE {tabla} DROP CONSTRAINT {_q(nombre)}")
+        for de, a in renombres:
+            cursor.execute(f"ALTER TABLE {_q(de)} RENAME TO {_q(a)}")
+        for tabla, nombre, definicion in restricciones:
+            cursor.execute(f"ALTER TABLE {tabla} ADD CONSTRAINT {_q(nombre)} {definicion} NOT VALID")
+        for tabla in tablas_en_uso:
+            _ajustar_secuencia(cursor, tabla)
+    return [(tabla, nombre) for tabla, nombre, _ in restricciones]
+
+def _rotar_sqlite(renombres, borrar):
+    # Con legacy_alter_table y las FK desactivadas, RENAME no reescribe las REFERENCES de las otras tablas:
+    # siguen nombrando la tabla en uso, que ahora es la nueva
+    connection.disable_constraint_checking()
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("PRAGMA legacy_alter_table = ON")
+            for tabla in borrar:
+                cursor.execute(f"DROP TABLE IF EXISTS {_q(tabla)}")
+            for de, a in renombres:
+                cursor.execute(f"ALTER TABLE {_q(de)} RENAME TO {_q(a)}")
+            cursor.execute("PRAGMA legacy_alter_table = OFF")
+    finally:
+        connection.enable_constraint_checking()
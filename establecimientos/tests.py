@@ -1,3 +1,681 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from . import clae, cpa, gazetteer, indice_cpa, recarga_referencia
+from .carga_masiva import UpsertPorLotes
+from .forms import EstablecimientoForm
+from .lector_json import abrir_json, iterar_arreglo
+from .models import CIIU, ActividadCLAE, CodigoPostal, Establecimiento, Localidad, Provincia, VersionDatos
+from .recarga_referencia import RecargaEnSombra, destino, revertir
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError: # Sin pyarrow no se prueban los formatos columnares
+    pa = None
+
+
+class IndiceCPATests(TestCase):
+    def setUp(self):
+        indice_cpa._indice = None
+        self.provincia = Provincia.objects.create(codigo=6, nombre='Buenos Aires')
+        self.localidad = Localidad.objects.create(provincia=self.provincia, codigo=6427010, nombre='Olivos')
+        CodigoPostal.objects.create(provincia=self.provincia, localidad=self.localidad, cp='1636', cpa='B1636AAA')
+
+    def test_otro_proceso_invalida_el_indice(self):
+        indice = indice_cpa.obtener_indice()
+        self.assertTrue(indice.resolver('B1636AAA').exacto)
+
+        # Otro proceso carga códigos postales e incrementa la versión
+        CodigoPostal.objects.create(provincia=self.provincia, localidad=self.localidad, cp='1637', cpa='B1637AAA')
+        VersionDatos.incrementar(indice_cpa.VERSION)
+
+        # Dentro del intervalo no se consulta la versión: sigue el índice anterior
+        self.assertIs(indice_cpa.obtener_indice(), indice)
+        with mock.patch.object(indice_cpa, 'SEGUNDOS_ENTRE_VERIFICACIONES', 0):
+            nuevo = indice_cpa.obtener_indice()
+        self.assertIsNot(nuevo, indice)
+        self.assertTrue(nuevo.resolver('B1637AAA').exacto)
+
+    def test_sin_cambios_no_se_vuelve_a_armar(self):
+        indice = indice_cpa.obtener_indice()
+        with mock.patch.object(indice_cpa, 'SEGUNDOS_ENTRE_VERIFICACIONES', 0), self.assertNumQueries(1):
+            self.assertIs(indice_cpa.obtener_indice(), indice)
+
+
+class CPATests(SimpleTestCase):
+    def setUp(self):
+        self.indice = cpa.IndiceCPA.desde_filas([
+            (1, '1636', 'B1636AAA', 'BUENOS AIRES', 'OLIVOS'),
+            (2, '1605', 'B1605AAA', 'BUENOS AIRES', 'MUNRO'),
+            (3, '5900', None, 'CORDOBA', 'VILLA MARIA'),
+        ])
+
+    def test_parsear(self):
+        esperado = cpa.CPA('B1636AAA', 'B', '1636', 'AAA', 'BUENOS AIRES')
+        for texto in ('B1636AAA', 'b1636aaa', 'b 1636-aaa', 'B.1636.AAA', ' B1636 AAA '):
+            with self.subTest(texto):
+                self.assertEqual(cpa.parsear(texto), esperado)
+        # 'Buscar CPA' es el marcador de la tabla cuando no hay CPA; I y O no son letras de provincia
+        for texto in ('Buscar CPA', '', 'I1636AAA', 'O1636AAA', 'B1636AA', 'B163AAA', '1636', None, float('nan')):
+            with self.subTest(texto):
+                self.assertIsNone(cpa.parsear(texto))
+
+    def test_verificar_correcto(self):
+        self.assertEqual(self.indice.verificar('b 1636-aaa', 'Buenos Aires', '1636', 1), [])
+        # CPA que no está en el índice, pero su CP sí: no se puede objetar
+        self.assertEqual(self.indice.verificar('X5900ABC', 'Córdoba', '5900', 3), [])
+
+    def test_verificar_invalido(self):
+        (problema,) = self.indice.verificar('Buscar CPA')
+        self.assertIn('no es un CPA válido', problema)
+
+    def test_verificar_otra_provincia(self):
+        (problema,) = self.indice.verificar('X5900ABC', 'Buenos Aires')
+        self.assertEqual(problema, 'El CPA X5900ABC es de CORDOBA, no de Buenos Aires.')
+
+    def test_verificar_cp_que_no_corresponde(self):
+        (problema,) = self.indice.verificar('B1636AAA', 'Buenos Aires', '1900', 1)
+        self.assertEqual(problema, 'El CP 1900 no corresponde al CPA B1636AAA.')
+        # Si la localidad tiene ese CP en el índice, el CP puede no coincidir con los dígitos del CPA
+        self.indice.agregar(1, '1637', None, 'BUENOS AIRES')
+        self.assertEqual(self.indice.verificar('B1636AAA', 'Buenos Aires', '1637', 1), [])
+
+    def test_verificar_cpa_de_otra_localidad(self):
+        (problema,) = self.indice.verificar('B1636AAA', 'Buenos Aires', None, 2)
+        self.assertEqual(problema, 'El CPA B1636AAA corresponde a otra localidad (OLIVOS).')
+
+
+class FormularioCPATests(TestCase):
+    def setUp(self):
+        self.provincia = Provincia.objects.create(codigo=6, nombre='Buenos Aires')
+        self.olivos = Localidad.objects.create(provincia=self.provincia, codigo=6427010, nombre='Olivos')
+        self.munro = Localidad.objects.create(provincia=self.provincia, codigo=6427020, nombre='Munro')
+        CodigoPostal.objects.create(provincia=self.provincia, localidad=self.olivos, cp='1636', cpa='B1636AAA')
+        CodigoPostal.objects.create(provincia=self.provincia, localidad=self.munro, cp='1605', cpa=None)
+        Establecimiento.objects.create(tipo_establecimiento=1, nombre='Planta', calle='Av. San Martín', localidad=self.olivos,
+                                       provincia=self.provincia, cpa='B1636ABC', cp='1636')
+        indice_cpa._indice = None
+        self.addCleanup(setattr, indice_cpa, '_indice', None)
+
+    def formulario(self, **cambios):
+        datos = {'cuit': '20123456789', 'numero_establecimiento': 1, 'tipo_establecimiento': 1, 'descripcion': 'Depósito',
+                 'nombre': 'Depósito', 'calle': 'Corrientes', 'altura': 100, 'localidad': self.olivos.pk,
+                 'localidad_nombre': 'Olivos', 'provincia': self.provincia.pk, 'provincia_nombre': 'Buenos Aires',
+                 'tipo_organismo': 0, 'organismo': 0, 'cpa': '', 'cp': ''}
+        return EstablecimientoForm(data=datos | cambios)
+
+    def test_cpa_canonico_y_cp_completado(self):
+        formulario = self.formulario(cpa='b 1636-aaa')
+        self.assertTrue(formulario.is_valid(), formulario.errors)
+        self.assertEqual((formulario.cleaned_data['cpa'], formulario.cleaned_data['cp']), ('B1636AAA', '1636'))
+
+    def test_cp_escrito_se_respeta(self):
+        CodigoPostal.objects.create(provincia=self.provincia, localidad=self.olivos, cp='1637', cpa=None)
+        formulario = self.formulario(cpa='B1636AAA', cp='1637')
+        self.assertTrue(formulario.is_valid(), formulario.errors)
+        self.assertEqual(formulario.cleaned_data['cp'], '1637')
+
+    def test_cpa_de_la_calle_conocida(self):
+        # 'San Martin' es la misma calle que 'Av. San Martín' del establecimiento ya guardado
+        formulario = self.formulario(calle='San Martin')
+        self.assertTrue(formulario.is_valid(), formulario.errors)
+        self.assertEqual((formulario.cleaned_data['cpa'], formulario.cleaned_data['cp']), ('B1636ABC', '1636'))
+
+    def test_sin_cpa_ni_calle_conocida(self):
+        formulario = self.formulario()
+        self.assertTrue(formulario.is_valid(), formulario.errors)
+        self.assertFalse(formulario.cleaned_data['cpa'])
+
+    def test_errores_en_el_cpa(self):
+        for cambios, error in (({'cpa': 'Buscar CPA'}, 'no es un CPA válido'),
+                               ({'cpa': 'X5000ABC'}, 'es de CORDOBA'),
+                               ({'cpa': 'B1636AAA', 'cp': '1900'}, 'El CP 1900 no corresponde'),
+                               ({'cpa': 'B1636AAA', 'localidad': self.munro.pk}, 'corresponde a otra localidad')):
+            with self.subTest(cambios):
+                formulario = self.formulario(**cambios)
+                self.assertFalse(formulario.is_valid())
+                self.assertTrue(any(error in mensaje for mensaje in formulario.errors['cpa']), formulario.errors)
+
+    def test_vista_resolver_cpa(self):
+        url = reverse('resolver_cpa')
+        respuesta = self.client.get(url, {'cpa': 'b1636-aaa'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json(), {'cpa': 'B1636AAA', 'provincia': 'BUENOS AIRES', 'cp': '1636', 'exacto': True,
+                                            'localidades': [{'id': self.olivos.pk, 'nombre': 'Olivos'}]})
+        # CPA desconocido: las localidades con ese CP
+        respuesta = self.client.get(url, {'cpa': 'B1605XYZ'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertFalse(respuesta.json()['exacto'])
+        self.assertEqual(respuesta.json()['localidades'], [{'id': self.munro.pk, 'nombre': 'Munro'}])
+        for parametros in ({'cpa': 'Buscar CPA'}, {'cpa': 'I1636AAA'}, {}):
+            with self.subTest(parametros):
+                respuesta = self.client.get(url, parametros)
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertEqual(respuesta.json(), {'error': 'CPA inválido'})
+
+
+class UpsertPorLotesTests(TestCase):
+    # Cada prueba se corre con las variantes de escritura: ON CONFLICT (si la base lo soporta) o
+    # bulk_create + bulk_update, y con la tabla precargada entera o leída por lote
+    VARIANTES = [{}, {'on_conflict': False}, {'precargar_todo': False}, {'on_conflict': False, 'precargar_todo': False}]
+
+    def setUp(self):
+        CIIU.objects.create(codigo=1, descripcion='Cultivo')
+        CIIU.objects.create(codigo=2, descripcion='Cría de ganado')
+
+    def cargar(self, filas, tamano_lote=2, **opciones):
+        carga = UpsertPorLotes(CIIU, 'codigo', ['descripcion'], tamano_lote=tamano_lote, **opciones)
+        for codigo, descripcion in filas:
+            carga.agregar(codigo, descripcion=descripcion)
+        return carga, carga.terminar()
+
+    def guardadas(self):
+        return dict(CIIU.objects.values_list('codigo', 'descripcion'))
+
+    def test_nuevas_cambiadas_y_sin_cambios(self):
+        for opciones in self.VARIANTES:
+            with self.subTest(**opciones), transaction.atomic():
+                _, resumen = self.cargar([(1, 'Cultivo'), (2, 'Ganadería'), (3, 'Pesca'), (4, 'Minería')], **opciones)
+                self.assertEqual((resumen['recibidas'], resumen['creadas'], resumen['actualizadas'], resumen['sin_cambios']),
+                                 (4, 2, 1, 1))
+                self.assertEqual(self.guardadas(), {1: 'Cultivo', 2: 'Ganadería', 3: 'Pesca', 4: 'Minería'})
+                transaction.set_rollback(True)
+
+    def test_clave_repetida_queda_la_ultima(self):
+        for opciones in self.VARIANTES:
+            with self.subTest(**opciones), transaction.atomic():
+                # Repetidas dentro de un lote (3, 5) y en lotes distintos (1)
+                filas = [(3, 'Pesca'), (3, 'Acuicultura'), (1, 'Otro'), (4, 'Caza'),
+                         (1, 'Otra actividad'), (5, 'Minería'), (5, 'Explotación de minas')]
+                _, resumen = self.cargar(filas, tamano_lote=3, **opciones)
+                self.assertEqual(self.guardadas(), {1: 'Otra actividad', 2: 'Cría de ganado', 3: 'Acuicultura',
+                                                    4: 'Caza', 5: 'Explotación de minas'})
+                self.assertEqual(resumen['recibidas'], 7)
+                transaction.set_rollback(True)
+
+    def test_pk_de_filas_creadas_en_otro_lote(self):
+        for opciones in self.VARIANTES:
+            with self.subTest(**opciones), transaction.atomic():
+                carga, _ = self.cargar([], tamano_lote=1, **opciones)
+                carga.agregar(5, descripcion='Silvicultura') # Se escribe en su propio lote
+                carga.agregar(6, descripcion='Caza')
+                carga.agregar(5, descripcion='Silvicultura y extracción de madera') # Cambiada en un lote posterior
+                resumen = carga.terminar()
+                self.assertEqual(carga.pk(5), CIIU.objects.get(codigo=5).pk)
+                self.assertEqual(carga.pk(1), CIIU.objects.get(codigo=1).pk)
+                self.assertIsNone(carga.pk(99))
+                self.assertEqual(CIIU.objects.get(codigo=5).descripcion, 'Silvicultura y extracción de madera')
+                self.assertEqual((resumen['creadas'], resumen['actualizadas']), (2, 1))
+                transaction.set_rollback(True)
+
+    def test_pk_sin_filas_devueltas_por_bulk_create(self):
+        # Bases que no devuelven los pk de bulk_create: se buscan por la clave al actualizar o al pedir pk()
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            self.test_pk_de_filas_creadas_en_otro_lote()
+
+    def test_pk_escribe_lo_pendiente(self):
+        carga = UpsertPorLotes(CIIU, 'codigo', ['descripcion'], precargar_todo=False)
+        carga.agregar(7, descripcion='Pesca')
+        self.assertEqual(carga.pk(7), CIIU.objects.get(codigo=7).pk)
+
+
+class LectorJSONTests(TestCase):
+    # Elementos con números, cadenas con escapes y no ASCII, anidados y literales, que con bloques chicos
+    # quedan cortados en cualquier posición
+    DOCUMENTO = {
+        'cantidad': 3, 'parametros': {'campos': ['id', 'nombre'], 'max': 5000, 'escala': -1.5e-3},
+        'localidades': [
+            {'id': '06427010', 'nombre': 'Olivos', 'centroide': {'lat': -34.5107, 'lon': -58.4936}},
+            {'id': 1234567890123, 'nombre': 'Ñandú "El \\ Viejo"\n', 'activa': True, 'cp': None, 'codigos': []},
+            {'id': 7, 'nombre': 'São Tomé – ✓', 'valores': [0, 12.5, -3, 1e10, 100000], 'extra': {}},
+        ],
+        'total': 123456,
+    }
+
+    def test_bloques_chicos(self):
+        texto = json.dumps(self.DOCUMENTO, ensure_ascii=False, indent=1)
+        for tamano_bloque in (1, 2, 3, 7, 64):
+            with self.subTest(tamano_bloque=tamano_bloque):
+                self.assertEqual(list(iterar_arreglo(io.StringIO(texto), 'localidades', tamano_bloque)),
+                                 self.DOCUMENTO['localidades'])
+
+    def test_arreglo_en_el_nivel_superior(self):
+        texto = json.dumps([1, 22, 333, 4.25, 'x'])
+        self.assertEqual(list(iterar_arreglo(io.StringIO(texto), 'localidades', tamano_bloque=1)), [1, 22, 333, 4.25, 'x'])
+        self.assertEqual(list(iterar_arreglo(io.StringIO(' [ ] '), 'localidades', tamano_bloque=1)), [])
+
+    def test_clave_inexistente(self):
+        with self.assertRaises(KeyError):
+            list(iterar_arreglo(io.StringIO(json.dumps(self.DOCUMENTO)), 'provincias', tamano_bloque=5))
+
+    def test_gzip(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'localidades.json') # Sin .gz: se detecta por el contenido
+            with gzip.open(ruta, 'wt', encoding='utf-8') as archivo:
+                json.dump(self.DOCUMENTO, archivo, ensure_ascii=False)
+            with abrir_json(ruta) as archivo:
+                self.assertEqual(list(iterar_arreglo(archivo, 'localidades', tamano_bloque=3)),
+                                 self.DOCUMENTO['localidades'])
+
+
+def compilar_maestro(directorio, provincias, deptos, locas):
+    """provincias.csv, deptos.csv y loca.csv como los de cp/cp2, compilados en directorio/gazetteer_pdl.bin."""
+    fuentes = []
+    for nombre, encabezado, filas in (('provincias.csv', 'id_prov,nom_prov', provincias),
+                                      ('deptos.csv', 'id_depto,id_prov,nom_depto', deptos),
+                                      ('loca.csv', 'id_loca,id_depto,nom_loca', locas)):
+        ruta = os.path.join(directorio, nombre)
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write('\n'.join([encabezado] + filas) + '\n')
+        fuentes.append(ruta)
+    destino = os.path.join(directorio, gazetteer.ARCHIVO_GAZETTEER)
+    gazetteer.compilar(*fuentes, destino=destino)
+    return destino, fuentes
+
+
+class GazetteerTests(SimpleTestCase):
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+        self.ruta, self.fuentes = compilar_maestro(
+            self.directorio.name,
+            provincias=['1,BUENOS AIRES', '6,CÓRDOBA', 'x,SIN ID'],
+            deptos=['3,6,GENERAL SAN MARTIN', '1,1,VICENTE LOPEZ', '4,6,COLON'],
+            locas=['40,4,VILLA MARIA', '10,1,OLIVOS', '30,3,VILLA MARÍA', '31,3,ARROYO CABRAL'])
+        self.gazetteer = gazetteer.Gazetteer(self.ruta)
+        self.addCleanup(self.gazetteer.cerrar)
+
+    def test_cantidades_y_orden_del_merge(self):
+        # La fila sin ID entero se descarta; las localidades quedan en el orden provincia -> departamento -> archivo
+        self.assertEqual((self.gazetteer.n_provincias, self.gazetteer.n_departamentos, self.gazetteer.n_localidades), (2, 3, 4))
+        self.assertEqual(self.gazetteer.textos('loca_nombre'), ['OLIVOS', 'VILLA MARÍA', 'ARROYO CABRAL', 'VILLA MARIA'])
+
+    def test_localidades_y_resolver(self):
+        encontradas = self.gazetteer.localidades('Cordoba', 'villa maria')
+        self.assertEqual([(l.id, l.id_depto, l.id_prov, l.nombre) for l in encontradas],
+                         [(30, 3, 6, 'VILLA MARÍA'), (40, 4, 6, 'VILLA MARIA')])
+        self.assertEqual(self.gazetteer.resolver('CÓRDOBA', 'Arroyo Cabral'), [(6, 3, 31)])
+        self.assertEqual(self.gazetteer.resolver('Buenos Aires', 'Villa Maria'), [])
+        self.assertEqual(self.gazetteer.resolver('Atlántida', 'Olivos'), [])
+        self.assertEqual([d.id for d in self.gazetteer.departamentos('cordoba', 'colon')], [4])
+
+    def test_busquedas_por_id(self):
+        self.assertEqual(self.gazetteer.provincia_por_id(6), gazetteer.Provincia(6, 'CÓRDOBA', 'cordoba'))
+        self.assertEqual(self.gazetteer.departamento_por_id(1), gazetteer.Departamento(1, 1, 'VICENTE LOPEZ', 'vicente lopez'))
+        self.assertEqual(self.gazetteer.localidad_por_id(31), gazetteer.Localidad(31, 3, 6, 'ARROYO CABRAL', 'arroyo cabral'))
+        self.assertIsNone(self.gazetteer.localidad_por_id(32))
+        self.assertIsNone(self.gazetteer.provincia_por_id(0))
+
+    def test_deja_de_estar_vigente_si_cambia_una_fuente(self):
+        self.assertTrue(self.gazetteer.es_vigente(self.fuentes))
+        self.assertIsNotNone(abierto := gazetteer.abrir_si_vigente(self.ruta))
+        abierto.cerrar()
+        with open(self.fuentes[2], 'a', encoding='utf-8') as f:
+            f.write('50,1,MUNRO\n')
+        self.assertFalse(self.gazetteer.es_vigente(self.fuentes))
+        self.assertIsNone(gazetteer.abrir_si_vigente(self.ruta))
+
+    def test_archivo_que_no_es_un_gazetteer(self):
+        ruta = os.path.join(self.directorio.name, 'otro.bin')
+        with open(ruta, 'wb') as f:
+            f.write(b'otra cosa')
+        self.assertIsNone(gazetteer.abrir_si_vigente(ruta, self.fuentes))
+        self.assertIsNone(gazetteer.abrir_si_vigente(os.path.join(self.directorio.name, 'no_existe.bin')))
+
+
+class CargarUbicacionesTests(TestCase):
+    ENCABEZADO = 'id_prov;nom_prov;id_depto;nom_depto;id_loca;nom_loca;cp;cpa'
+    FILAS = [
+        '1;BUENOS AIRES;1;VICENTE LOPEZ;10;OLIVOS;1636;B1636AAA',
+        '2;CAPITAL FEDERAL;2;COMUNA 1;20;CIUDAD AUTONOMA DE BUENOS AIRES;1000;C1000AAA',
+        # La misma localidad con dos id_loca y el mismo CP: una sola fila de CodigoPostal (unique_together)
+        '6;CORDOBA;3;GENERAL SAN MARTIN;30;VILLA MARIA;5900;Buscar CPA',
+        '6;CORDOBA;4;TERCERO ARRIBA;31;VILLA MARÍA;5900;X5900ABC',
+        '6;CORDOBA;5;COLON;40;SAN JOSE;5000;',
+        '6;CORDOBA;5;COLON;41;PUEBLO INEXISTENTE;5001;',
+        '99;ATLANTIDA;6;NORTE;50;CIUDAD;1234;',
+    ]
+
+    def setUp(self):
+        buenos_aires = Provincia.objects.create(codigo=6, nombre='Buenos Aires')
+        caba = Provincia.objects.create(codigo=2, nombre='Ciudad Autónoma de Buenos Aires')
+        cordoba = Provincia.objects.create(codigo=14, nombre='Córdoba')
+        self.olivos = Localidad.objects.create(provincia=buenos_aires, codigo=6427010, nombre='Olivos')
+        self.caba = Localidad.objects.create(provincia=caba, codigo=2000010, nombre='Ciudad Autónoma de Buenos Aires')
+        self.villa_maria = Localidad.objects.create(provincia=cordoba, codigo=14042170, nombre='Villa María')
+        Localidad.objects.create(provincia=cordoba, codigo=14021010, nombre='San José')
+        Localidad.objects.create(provincia=cordoba, codigo=14098010, nombre='San José')
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+        self.sin_match = os.path.join(self.directorio.name, 'sin_match.csv')
+        self.gazetteer = os.path.join(self.directorio.name, 'gazetteer_pdl.bin') # Solo existe si el test lo compila
+
+    def cargar(self, filas):
+        ruta = os.path.join(self.directorio.name, 'tabla.csv')
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write('\n'.join([self.ENCABEZADO] + filas) + '\n')
+        salida = io.StringIO()
+        call_command('cargar_ubicaciones', ruta, sin_match=self.sin_match, gazetteer=self.gazetteer, stdout=salida)
+        return salida.getvalue()
+
+    def guardados(self):
+        return {(c.localidad_id, c.cp): c.cpa for c in CodigoPostal.objects.all()}
+
+    def test_primera_carga(self):
+        ubicaciones = list(Localidad.objects.values_list('pk', 'provincia_id', 'codigo', 'nombre'))
+        provincias = list(Provincia.objects.values_list('pk', 'codigo', 'nombre'))
+        salida = self.cargar(self.FILAS)
+
+        self.assertEqual(self.guardados(), {(self.olivos.pk, '1636'): 'B1636AAA', (self.caba.pk, '1000'): 'C1000AAA',
+                                            (self.villa_maria.pk, '5900'): 'X5900ABC'})
+        self.assertIn('creadas 3, actualizadas 0, sin cambios 0', salida)
+        # Provincias y localidades de INDEC sin tocar: ni códigos de la tabla ni filas nuevas
+        self.assertEqual(list(Localidad.objects.values_list('pk', 'provincia_id', 'codigo', 'nombre')), ubicaciones)
+        self.assertEqual(list(Provincia.objects.values_list('pk', 'codigo', 'nombre')), provincias)
+
+        with open(self.sin_match, encoding='utf-8') as f:
+            reporte = list(csv.DictReader(f, delimiter=';'))
+        self.assertEqual({(fila['nom_loca'], fila['motivo']) for fila in reporte}, {
+            ('SAN JOSE', 'localidad repetida en la provincia'), ('PUEBLO INEXISTENTE', 'localidad no encontrada'),
+            ('CIUDAD', 'provincia desconocida')})
+
+    @skipUnless(pa, 'hace falta pyarrow')
+    def test_parquet_y_arrow(self):
+        # La tabla como la escribe pipeline_cp.py --formato parquet|arrow: IDs enteros, el resto texto o nulo
+        ruta_csv = os.path.join(self.directorio.name, 'tabla.csv')
+        with open(ruta_csv, 'w', encoding='utf-8') as f:
+            f.write('\n'.join([self.ENCABEZADO] + self.FILAS) + '\n')
+        tabla = pa_csv.read_csv(ruta_csv, parse_options=pa_csv.ParseOptions(delimiter=';'), convert_options=pa_csv.ConvertOptions(
+            column_types={c: pa.int64() for c in ('id_prov', 'id_depto', 'id_loca')} | {'cp': pa.string(), 'cpa': pa.string()}))
+        esperados = {(self.olivos.pk, '1636'): 'B1636AAA', (self.caba.pk, '1000'): 'C1000AAA',
+                     (self.villa_maria.pk, '5900'): 'X5900ABC'}
+        for extension, escribir in (('.parquet', pq.write_table), ('.arrow', feather.write_feather)):
+            with self.subTest(extension):
+                CodigoPostal.objects.all().delete()
+                ruta = os.path.join(self.directorio.name, 'tabla' + extension)
+                escribir(tabla, ruta)
+                salida = io.StringIO()
+                call_command('cargar_ubicaciones', ruta, sin_match=self.sin_match, gazetteer=self.gazetteer, lote=2,
+                             stdout=salida)
+                self.assertEqual(self.guardados(), esperados)
+                self.assertIn('creadas 3', salida.getvalue())
+
+    def test_tabla_inexistente(self):
+        with self.assertRaises(CommandError):
+            call_command('cargar_ubicaciones', os.path.join(self.directorio.name, 'no_existe.parquet'),
+                         sin_match=self.sin_match, gazetteer=self.gazetteer, stdout=io.StringIO())
+
+    def test_con_gazetteer(self):
+        # Maestro P-D-L de la tabla: el id_loca 31 se llama 'VILLA MARIA' en el maestro aunque la tabla diga otra cosa
+        compilar_maestro(self.directorio.name,
+                         provincias=['1,BUENOS AIRES', '2,CAPITAL FEDERAL', '6,CORDOBA'],
+                         deptos=['1,1,VICENTE LOPEZ', '2,2,COMUNA 1', '3,6,GENERAL SAN MARTIN', '4,6,TERCERO ARRIBA', '5,6,COLON'],
+                         locas=['10,1,OLIVOS', '20,2,CIUDAD AUTONOMA DE BUENOS AIRES', '30,3,VILLA MARIA',
+                                '31,4,VILLA MARIA', '40,5,SAN JOSE', '41,5,PUEBLO INEXISTENTE'])
+        filas = [fila.replace(';31;VILLA MARÍA;', ';31;VILLA MARIA (ANTES);') for fila in self.FILAS]
+        salida = self.cargar(filas + ['1;BUENOS AIRES;1;VICENTE LOPEZ;11;OLIVOS;1637;'])
+        self.assertNotIn('Sin gazetteer', salida)
+        self.assertEqual(self.guardados(), {(self.olivos.pk, '1636'): 'B1636AAA', (self.caba.pk, '1000'): 'C1000AAA',
+                                            (self.villa_maria.pk, '5900'): 'X5900ABC'})
+        with open(self.sin_match, encoding='utf-8') as f:
+            reporte = {(fila['id_loca'], fila['motivo']) for fila in csv.DictReader(f, delimiter=';')}
+        self.assertIn(('11', 'id_loca fuera del maestro P-D-L'), reporte)
+        self.assertIn(('50', 'id_loca fuera del maestro P-D-L'), reporte)
+
+    def test_recarga_sin_cambios(self):
+        self.cargar(self.FILAS)
+        salida = self.cargar(self.FILAS)
+        self.assertIn('creadas 0, actualizadas 0, sin cambios 3', salida)
+        self.assertEqual(CodigoPostal.objects.count(), 3)
+
+    def test_cambio_de_cpa(self):
+        self.cargar(self.FILAS)
+        filas = [self.FILAS[0].replace('B1636AAA', 'B1636ABC')] + self.FILAS[1:]
+        salida = self.cargar(filas)
+        self.assertIn('creadas 0, actualizadas 1, sin cambios 2', salida)
+        self.assertEqual(self.guardados()[self.olivos.pk, '1636'], 'B1636ABC')
+
+    def test_nuevo_cp_de_una_localidad_existente(self):
+        self.cargar(self.FILAS)
+        salida = self.cargar(self.FILAS + ['1;BUENOS AIRES;1;VICENTE LOPEZ;10;OLIVOS;1637;B1637AAA'])
+        self.assertIn('creadas 1, actualizadas 0, sin cambios 3', salida)
+        self.assertEqual(self.guardados()[self.olivos.pk, '1637'], 'B1637AAA')
+
+    def test_sin_localidades_no_carga(self):
+        Localidad.objects.all().delete()
+        with self.assertRaises(CommandError):
+            self.cargar(self.FILAS)
+        self.assertFalse(CodigoPostal.objects.exists())
+
+
+class ClaeTests(TestCase):
+    ENCABEZADO = 'clae6,clae6_desc,clae3,clae3_desc,clae2,clae2_desc,letra,letra_desc'
+    FILAS = [
+        # Como en clae/clae_agg.csv: los códigos perdieron los ceros a la izquierda
+        '14211,Cría de ganado equino,14,Cría de animales,1,Agricultura y ganadería,A,AGRICULTURA',
+        '11331,Cultivo de hortalizas,11,Cultivos temporales,1,Agricultura y ganadería,A,AGRICULTURA',
+        '101011,Matanza de ganado bovino,101,Procesamiento de carne,10,Elaboración de alimentos,C,INDUSTRIA',
+    ]
+
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+        self.addCleanup(clae.invalidar_jerarquia)
+
+    def archivo(self, filas):
+        ruta = os.path.join(self.directorio.name, 'clae.csv')
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write('\n'.join([self.ENCABEZADO] + filas) + '\n')
+        return ruta
+
+    def importar(self, filas, **opciones):
+        salida, errores = io.StringIO(), io.StringIO()
+        call_command('importar_clae', self.archivo(filas), stdout=salida, stderr=errores, **opciones)
+        return salida.getvalue(), errores.getvalue()
+
+    def test_leer_completa_ceros(self):
+        filas, errores = clae.leer_clae(self.archivo(self.FILAS))
+        self.assertEqual(errores, [])
+        self.assertEqual([(f.clae6, f.clae3, f.clae2) for f in filas],
+                         [('014211', '014', '01'), ('011331', '011', '01'), ('101011', '101', '10')])
+
+    def test_leer_codigo_repetido_y_fila_invalida(self):
+        filas, errores = clae.leer_clae(self.archivo(self.FILAS + [
+            '014211,Cría de equinos (nueva),014,Cría de animales,01,Agricultura y ganadería,A,AGRICULTURA',
+            '101012,,102,Otro,10,Elaboración de alimentos,c,INDUSTRIA']))
+        self.assertEqual({f.clae6: f.clae6_desc for f in filas}['014211'], 'Cría de equinos (nueva)')
+        self.assertEqual(len(filas), 3)
+        self.assertEqual([linea for linea, _ in errores], [5, 6])
+        self.assertIn('repetido', errores[0][1])
+        self.assertIn('no pertenece a clae3', errores[1][1])
+        self.assertIn('falta la descripción', errores[1][1])
+
+    def test_importar_renombra_codigos_sin_ceros(self):
+        corto = ActividadCLAE.objects.create(codigo='14211', descripcion='Cría de ganado equino')
+        salida, _ = self.importar(self.FILAS)
+        self.assertIn('1 códigos existentes completados', salida)
+        self.assertEqual(ActividadCLAE.objects.get(codigo='014211').pk, corto.pk)
+        self.assertFalse(ActividadCLAE.objects.filter(codigo='14211').exists())
+        self.assertEqual(ActividadCLAE.objects.count(), 3)
+
+    def test_estricto_no_carga_nada(self):
+        with self.assertRaises(CommandError):
+            self.importar(self.FILAS + ['101012,Sin letra,101,Procesamiento de carne,10,Elaboración de alimentos,,'],
+                          estricto=True)
+        self.assertEqual(ActividadCLAE.objects.count(), 0)
+        # Sin --estricto se cargan las filas válidas y se informa la inválida
+        _, errores = self.importar(self.FILAS + ['101012,Sin letra,101,Procesamiento de carne,10,Elaboración de alimentos,,'])
+        self.assertIn('Línea 5', errores)
+        self.assertEqual(ActividadCLAE.objects.count(), 3)
+
+    def test_jerarquia(self):
+        self.importar(self.FILAS)
+        jerarquia = clae.obtener_jerarquia()
+        self.assertEqual(jerarquia.padres('14211'), ('A', '01', '014'))
+        self.assertIsNone(jerarquia.padres('999999'))
+        self.assertEqual(jerarquia.descripcion('A'), 'AGRICULTURA')
+        self.assertEqual(jerarquia.descripcion('01'), 'Agricultura y ganadería')
+        self.assertEqual(jerarquia.descripcion('101011'), 'Matanza de ganado bovino')
+        self.assertEqual(jerarquia.actividades_de('01'), ['011331', '014211'])
+        self.assertEqual(jerarquia.actividades_de('014'), ['014211'])
+        self.assertEqual(jerarquia.actividades_de('C'), ['101011'])
+        self.assertEqual(jerarquia.actividades_de('X'), [])
+
+    def test_jerarquia_en_cache_hasta_importar(self):
+        self.importar(self.FILAS[:2])
+        jerarquia = clae.obtener_jerarquia()
+        with self.assertNumQueries(0):
+            self.assertIs(clae.obtener_jerarquia(), jerarquia)
+        self.importar(self.FILAS)
+        self.assertEqual(sorted(clae.obtener_jerarquia().actividades), ['011331', '014211', '101011'])
+
+    def test_otro_proceso_invalida_la_jerarquia(self):
+        self.importar(self.FILAS[:2])
+        jerarquia = clae.obtener_jerarquia()
+        VersionDatos.incrementar(clae.VERSION) # como si importar_clae hubiera corrido en otro proceso
+        with mock.patch.object(clae, 'SEGUNDOS_ENTRE_VERIFICACIONES', 0):
+            self.assertIsNot(clae.obtener_jerarquia(), jerarquia)
+
+    def test_vista_actividades(self):
+        self.importar(self.FILAS)
+        respuesta = self.client.get(reverse('actividades_clae'), {'prefijo': '01'})
+        self.assertEqual([a['codigo'] for a in respuesta.json()], ['011331', '014211'])
+        respuesta = self.client.get(reverse('actividades_clae'), {'codigo': '14211'})
+        self.assertEqual(respuesta.json()['niveles'], [
+            {'codigo': 'A', 'descripcion': 'AGRICULTURA'}, {'codigo': '01', 'descripcion': 'Agricultura y ganadería'},
+            {'codigo': '014', 'descripcion': 'Cría de animales'}])
+        self.assertEqual(self.client.get(reverse('actividades_clae'), {'codigo': '999999'}).status_code, 404)
+        self.assertEqual(self.client.get(reverse('actividades_clae')).status_code, 400)
+
+
+class RecargaEnSombraTests(TransactionTestCase):
+    # TransactionTestCase: el intercambio corre en su propia transacción (en PostgreSQL, ALTER TABLE no puede
+    # correr con chequeos de FK diferidos pendientes) y la prueba de bloqueo usa una segunda conexión
+
+    def setUp(self):
+        self.provincia = Provincia.objects.create(codigo=14, nombre='Córdoba')
+        self.localidades = [Localidad.objects.create(provincia=self.provincia, codigo=14042170 + i, nombre=f'Localidad {i}')
+                            for i in range(10)]
+        CodigoPostal.objects.create(provincia=self.provincia, localidad=self.localidades[0], cp='5900', cpa='X5900ABC')
+
+    def tearDown(self):
+        # Las versiones anteriores no son tablas de Django: el flush entre pruebas no las vacía
+        with connection.cursor() as cursor:
+            for tabla in connection.introspection.table_names(cursor):
+                if tabla.endswith((recarga_referencia.SUFIJO_NUEVA, recarga_referencia.SUFIJO_ANTERIOR,
+                                   recarga_referencia.SUFIJO_INTERCAMBIO)):
+                    cursor.execute(f"DROP TABLE {connection.ops.quote_name(tabla)}")
+
+    def nombres(self):
+        return dict(Localidad.objects.values_list('codigo', 'nombre'))
+
+    def test_el_modelo_sigue_en_la_tabla_en_uso(self):
+        ActividadCLAE.objects.create(codigo='011111', descripcion='Cultivo de arroz')
+        list(ActividadCLAE.objects.filter(codigo='011111')) # Django cachea las columnas con el nombre de la tabla
+        recarga = RecargaEnSombra(ActividadCLAE)
+        with recarga.en_sombra():
+            destino(ActividadCLAE).objects.create(codigo='011112', descripcion='Cultivo de trigo')
+            self.assertFalse(ActividadCLAE.objects.filter(codigo='011112').exists())
+        self.assertIs(destino(ActividadCLAE), ActividadCLAE)
+        self.assertEqual(recarga.validar()[0], [])
+        recarga.intercambiar()
+        self.assertEqual(ActividadCLAE._meta.db_table, 'establecimientos_actividadclae')
+        self.assertEqual(sorted(ActividadCLAE.objects.values_list('codigo', flat=True)), ['011111', '011112'])
+
+    def test_recargar_referencia_despues_de_consultar(self):
+        list(ActividadCLAE.objects.filter(codigo='011111'))
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'clae.csv')
+            with open(ruta, 'w', encoding='utf-8') as f:
+                f.write('clae6,clae6_desc,clae3,clae3_desc,clae2,clae2_desc,letra,letra_desc\n'
+                        '11111,Cultivo de arroz,011,Cultivos temporales,01,Agricultura,A,Agricultura y pesca\n')
+            call_command('recargar_referencia', 'importar_clae', ruta, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(list(ActividadCLAE.objects.values_list('codigo', flat=True)), ['011111'])
+
+    def test_intercambio_y_revertir(self):
+        anteriores = self.nombres()
+        for version in (1, 2): # La segunda reemplaza a la versión anterior de la primera
+            recarga = RecargaEnSombra(Localidad)
+            with recarga.en_sombra():
+                destino(Localidad).objects.filter(codigo=14042170).update(nombre=f'Villa María v{version}')
+                destino(Localidad).objects.create(provincia_id=self.provincia.pk, codigo=14042200 + version,
+                                                  nombre=f'Nueva v{version}')
+            self.assertEqual(recarga.validar()[0], [])
+            recarga.intercambiar()
+            self.assertEqual(self.nombres()[14042170], f'Villa María v{version}')
+
+        # Los pk no cambian: el código postal sigue apuntando a la misma localidad
+        self.assertEqual(CodigoPostal.objects.get().localidad.nombre, 'Villa María v2')
+        # La secuencia sigue después de las filas copiadas
+        nueva = Localidad.objects.create(provincia=self.provincia, codigo=14042300, nombre='Después del intercambio')
+        self.assertGreater(nueva.pk, Localidad.objects.exclude(pk=nueva.pk).order_by('-pk').first().pk)
+        # Las FK hacia la tabla se movieron a la versión en uso
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CodigoPostal.objects.create(provincia=self.provincia, localidad_id=10 ** 9, cp='1000')
+
+        revertir(Localidad)
+        self.assertEqual(self.nombres()[14042170], 'Villa María v1')
+        self.assertNotIn(14042202, self.nombres())
+        revertir(Localidad) # Otra vez: vuelve a la versión 2
+        self.assertEqual(self.nombres()[14042170], 'Villa María v2')
+        self.assertNotEqual(self.nombres(), anteriores)
+
+    def test_validar_rechaza_filas_huerfanas(self):
+        recarga = RecargaEnSombra(Localidad)
+        with recarga.en_sombra():
+            destino(Localidad).objects.filter(pk=self.localidades[0].pk).delete()
+        problemas, filas = recarga.validar()
+        self.assertEqual(filas['establecimientos_localidad'], (10, 9))
+        self.assertTrue(any('establecimientos_codigopostal.localidad_id' in problema for problema in problemas))
+        recarga.descartar()
+
+    def test_minimo_de_filas(self):
+        recarga = RecargaEnSombra(Localidad, minimo=0.95)
+        with recarga.en_sombra():
+            destino(Localidad).objects.exclude(pk=self.localidades[0].pk).delete()
+        self.assertEqual(len(recarga.validar()[0]), 1)
+        recarga.descartar()
+
+    @skipUnless(connection.vendor == 'postgresql', 'lock_timeout es de PostgreSQL')
+    def test_reintenta_si_la_tabla_esta_bloqueada(self):
+        recarga = RecargaEnSombra(Localidad)
+        with recarga.en_sombra():
+            destino(Localidad).objects.filter(codigo=14042170).update(nombre='Villa María')
+        bloqueada = threading.Event()
+
+        def bloquear():
+            # Otra sesión (la conexión es por hilo) lee la tabla en uso durante 1,5 s
+            try:
+                with transaction.atomic(), connections['default'].cursor() as cursor:
+                    cursor.execute("LOCK TABLE establecimientos_localidad IN ACCESS SHARE MODE")
+                    bloqueada.set()
+                    time.sleep(1.5)
+            finally:
+                connections['default'].close()
+
+        hilo = threading.Thread(target=bloquear)
+        hilo.start()
+        self.assertTrue(bloqueada.wait(10))
+        try:
+            with mock.patch.object(recarga_referencia, 'ESPERA_BLOQUEO', '100ms'), \
+                    mock.patch.object(recarga_referencia.time, 'sleep', wraps=time.sleep) as espera:
+                recarga.intercambiar()
+        finally:
+            hilo.join()
+        self.assertGreaterEqual(espera.call_count, 1)
+        self.assertEqual(self.nombres()[14042170], 'Villa María')
@@ -9,4 +9,6 @@ urlpatterns = [
     path('eliminar/<int:id>/', views.eliminar_establecimiento, name='eliminar_establecimiento'),
     path('exito/', lambda request: render(request, 'establecimientos/exito.html'), name='exito'),
     path('ajax/cargar-localidades/', views.cargar_localidades, name='cargar_localidades'),
+    path('ajax/resolver-cpa/', views.resolver_cpa, name='resolver_cpa'),
+    path('ajax/actividades-clae/', views.actividades_clae, name='actividades_clae'),
 ]
@@ -4,6 +4,8 @@ from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from .models import Localidad
+from .clae import obtener_jerarquia
+from .indice_cpa import obtener_indice, registrar_domicilio
 
 @csrf_exempt
 def cargar_localidades(request):
@@ -15,11 +17,42 @@ def cargar_localidades(request):
     data = [{'id': loc.id, 'nombre': loc.nombre} for loc in localidades]
     return JsonResponse(data, safe=False)
 
+def resolver_cpa(request):
+    """Provincia, CP y localidades candidatas de un CPA (para autocompletar el formulario)."""
+    indice = obtener_indice()
+    resolucion = indice.resolver(request.GET.get('cpa', ''))
+    if resolucion is None:
+        return JsonResponse({'error': 'CPA inválido'}, status=400)
+    return JsonResponse({
+        'cpa': resolucion.cpa.codigo,
+        'provincia': resolucion.cpa.provincia,
+        'cp': resolucion.cpa.cp,
+        'exacto': resolucion.exacto,
+        'localidades': [{'id': i, 'nombre': indice.nombres.get(i)} for i in resolucion.localidades],
+    })
+
+def actividades_clae(request):
+    """Actividades CLAE de una letra, clae2 o clae3 (?prefijo=), o los niveles superiores de un clae6 (?codigo=)."""
+    jerarquia = obtener_jerarquia()
+    codigo = request.GET.get('codigo', '').strip()
+    if codigo:
+        padres = jerarquia.padres(codigo)
+        if padres is None:
+            return JsonResponse({'error': 'Código CLAE inexistente'}, status=404)
+        codigo = codigo.zfill(6)
+        return JsonResponse({'codigo': codigo, 'descripcion': jerarquia.descripcion(codigo),
+                             'niveles': [{'codigo': c, 'descripcion': jerarquia.descripcion(c)} for c in padres]})
+    prefijo = request.GET.get('prefijo', '').strip().upper()
+    if not prefijo:
+        return JsonResponse({'error': 'Falta prefijo o codigo'}, status=400)
+    data = [{'codigo': c, 'descripcion': jerarquia.actividades[c]} for c in jerarquia.actividades_de(prefijo)]
+    return JsonResponse(data, safe=False)
+
 def crear_establecimiento(request):
     if request.method == 'POST':
         form = EstablecimientoForm(request.POST)
         if form.is_valid():
-            form.save()
+            registrar_domicilio(form.save())
             messages.success(request, 'El establecimiento fue registrado exitosamente.')
             return redirect('lista_establecimientos')
     else:
@@ -39,7 +72,7 @@ def editar_establecimiento(request, id):
     if request.method == 'POST':
         form = EstablecimientoForm(request.POST, instance=establecimiento)
         if form.is_valid():
-            form.save()
+            registrar_domicilio(form.save())
             messages.success(request, 'El establecimiento fue actualizado correctamente.')
             return redirect('lista_establecimientos')
     else: